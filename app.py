@@ -8,19 +8,46 @@ from plotly.subplots import make_subplots
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
-from typing import Dict, Any
+import hashlib
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple, Callable
 
 # Import local modules
 from src.dashboard_utils import (
-    filter_dataframe, calculate_kpis, group_rare_categories,
+    filter_tables, build_value_index, IncrementalFilter,
+    filter_tables_incremental, semijoin_masks, compare_cohorts, join_cyclists, calculate_kpis,
+    count_unique_accidents, decode_accident_index, build_sort_permutation,
+    view_order, build_accident_lookup, search_rows, CROSSFILTER_DIMENSIONS,
+    build_dimension_codes, build_count_cube, slice_cube, data_fingerprint, group_rare_categories,
     prepare_time_series_data, prepare_stacked_bar_data,
-    prepare_severity_analysis, format_large_numbers,
+    prepare_severity_analysis, prepare_severity_intervals, format_large_numbers,
     get_unique_values_for_filters, calculate_accident_rates,
     extract_hour_from_time, prepare_severity_speed_heatmap,
     prepare_temporal_analysis, prepare_demographic_severity_analysis,
     calculate_correlation_matrix, prepare_severity_trends_data,
     prepare_environmental_analysis, create_sankey_data
 )
+from src.perf import RerunProfiler, record_cache_miss, frame_nbytes
+from src.export import EXPORT_FORMATS, open_export
+from src.chart_payload import compact_figure
+from src.intervals import BOOTSTRAP_RESAMPLES
+from src.trends import SEASON, build_trend_forecasts
+from src.risk_model import (
+    SEVERITY_CLASSES, RiskModel, feature_columns, fit_frame, is_current, model_path, odds_ratios, score_tables,
+    severity_calibration, train_risk_model
+)
+from src.prefetch import ResultCache, Prefetcher, filter_key, adjacent_filter_states
+from src.governor import (
+    MemoryGovernor, GovernedStore, TIER_BASE, TIER_INDEX, DEFAULT_BUDGET_MB, timed
+)
+from src.sampling import (
+    SAMPLE_RATES, sample_paths, filter_mask, estimate_rows, choose_sample_rate,
+    estimate_kpis, estimate_yearly_counts
+)
+from src.preprocessing import (
+    ACCIDENT_ID, ACCIDENTS_FILE, CYCLISTS_FILE, ACCIDENT_INDEX_FILE, bin_column, table_fingerprint, table_paths
+)
 
 # Page configuration
 st.set_page_config(
@@ -67,16 +94,582 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_data():
-    """Load the preprocessed data from Parquet file."""
-    parquet_path = "processed/bicycle_accidents.parquet"
-    if os.path.exists(parquet_path):
-        return pd.read_parquet(parquet_path)
+@st.cache_resource
+def get_governor() -> MemoryGovernor:
+    """
+    Memory budget shared by every cache and session. DASHBOARD_MEMORY_BUDGET_MB
+    sets the budget; past it, per-filter results and session state are dropped
+    first, then shared indexes, while the base tables are always kept.
+    """
+    budget_mb = float(os.environ.get("DASHBOARD_MEMORY_BUDGET_MB", DEFAULT_BUDGET_MB))
+    return MemoryGovernor(int(budget_mb * 1024**2))
+
+def data_version() -> Tuple:
+    """
+    Version key of the processed tables (see table_fingerprint()), cheap
+    enough to check on every rerun. Keys load_data(), the shared loaders and
+    the filter result cache, so all of them are rebuilt when main.py
+    rewrites the tables.
+    """
+    data_dir = os.environ.get("DASHBOARD_DATA_DIR", "processed")
+    return (table_fingerprint(table_paths(data_dir)),)
+
+@st.cache_resource(max_entries=1)
+def load_data(data_key: Tuple):
+    """
+    Load the preprocessed accident and cyclist tables from Parquet files.
+    
+    One copy is shared by all sessions and reruns, so the tables are
+    read-only: filtering and sections work on gathered views. Load them once
+    per rerun (render_dashboard) and pass them down rather than calling this
+    again. A new data_key (from data_version()) replaces the previous copy.
+    """
+    data_dir = os.environ.get("DASHBOARD_DATA_DIR", "processed")
+    accidents_path = os.path.join(data_dir, ACCIDENTS_FILE)
+    cyclists_path = os.path.join(data_dir, CYCLISTS_FILE)
+    if os.path.exists(accidents_path) and os.path.exists(cyclists_path):
+        accidents = pd.read_parquet(accidents_path)
+        cyclists = pd.read_parquet(cyclists_path)
+        nbytes = accidents.memory_usage(deep=True).sum() + cyclists.memory_usage(deep=True).sum()
+        record_cache_miss("load_data", nbytes)
+        get_governor().register("load_data", None, int(nbytes), tier=TIER_BASE)
+        return accidents, cyclists
     else:
-        st.error(f"Processed data file not found at {parquet_path}. Please run main.py first to process the data.")
+        st.error(f"Processed data files not found in {data_dir}. Please run main.py first to process the data.")
         st.stop()
 
+@st.cache_resource
+def load_accident_index(data_key: Tuple):
+    """
+    Load the accident_id -> Accident_Index dictionary, only needed to show
+    or export rows. Shared by all sessions, so it is read-only.
+    """
+    data_dir = os.environ.get("DASHBOARD_DATA_DIR", "processed")
+    accident_index = pd.read_parquet(os.path.join(data_dir, ACCIDENT_INDEX_FILE))
+    nbytes = int(accident_index.memory_usage(deep=True).sum())
+    record_cache_miss("load_accident_index", nbytes)
+    get_governor().register("load_accident_index", data_key, nbytes, tier=TIER_INDEX,
+                            evict=lambda: load_accident_index.clear(data_key))
+    return accident_index
+
+@st.cache_resource
+def load_samples(data_key: Tuple) -> Dict[float, pd.DataFrame]:
+    """
+    Load the stratified samples main.py draws for approximate mode (empty if
+    not built). Shared by all sessions, so the samples are read-only.
+    """
+    samples_dir = os.path.join(os.environ.get("DASHBOARD_DATA_DIR", "processed"), "samples")
+    samples = {
+        rate: pd.read_parquet(path)
+        for rate, path in zip(SAMPLE_RATES, sample_paths(samples_dir)) if os.path.exists(path)
+    }
+    nbytes = int(sum(sample.memory_usage(deep=True).sum() for sample in samples.values()))
+    record_cache_miss("load_samples", nbytes)
+    get_governor().register("load_samples", data_key, nbytes, tier=TIER_INDEX, evict=lambda: load_samples.clear(data_key))
+    return samples
+
+@dataclass(eq=False)
+class Dataset:
+    """The base tables of a rerun and their version key, passed down to the sections that use shared indexes."""
+    accidents: pd.DataFrame
+    cyclists: pd.DataFrame
+    key: Tuple
+
+# The shared loaders below are keyed on data_key; the tables they are built
+# from are passed as underscore arguments, which Streamlit does not hash
+
+@st.cache_resource
+def load_sort_permutation(data_key: Tuple, column: str, _accidents: pd.DataFrame,
+                          _cyclists: pd.DataFrame) -> Tuple[np.ndarray, int]:
+    """
+    Ascending cyclist-row order of the full dataset by one column and its
+    number of missing values, shared by all sessions.
+    """
+    accidents, cyclists = _accidents, _cyclists
+    if column in cyclists.columns or column == 'accident_index':
+        source = cyclists
+    else:
+        source = accidents[[column]].take(cyclists[ACCIDENT_ID].to_numpy())
+    (permutation, n_missing), cost_s = timed(lambda: build_sort_permutation(source, column, load_accident_index(data_key)))
+    record_cache_miss("load_sort_permutation", permutation.nbytes)
+    get_governor().register("load_sort_permutation", (data_key, column), permutation.nbytes, tier=TIER_INDEX,
+                            cost_s=cost_s, evict=lambda: load_sort_permutation.clear(data_key, column))
+    return permutation, n_missing
+
+@st.cache_resource
+def load_dimension_codes(data_key: Tuple, _accidents: pd.DataFrame) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Codes of the linked-chart dimensions over the full accident table, shared by all sessions."""
+    codes, cost_s = timed(lambda: build_dimension_codes(_accidents, CROSSFILTER_DIMENSIONS))
+    nbytes = sum(c.nbytes for c, _ in codes.values())
+    record_cache_miss("load_dimension_codes", nbytes)
+    get_governor().register("load_dimension_codes", data_key, nbytes, tier=TIER_INDEX, cost_s=cost_s,
+                            evict=lambda: load_dimension_codes.clear(data_key))
+    return codes
+
+@st.cache_resource
+def load_trend_forecasts(data_key: Tuple, _accidents: pd.DataFrame, _cyclists: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Monthly decomposition and forecasts of all accidents and every slice of
+    the full dataset, shared by all sessions and rebuilt when the data changes.
+    """
+    forecasts, cost_s = timed(lambda: build_trend_forecasts(_accidents, _cyclists))
+    nbytes = frame_nbytes(forecasts)
+    record_cache_miss("load_trend_forecasts", nbytes)
+    get_governor().register("load_trend_forecasts", data_key, nbytes, tier=TIER_INDEX, cost_s=cost_s,
+                            evict=lambda: load_trend_forecasts.clear(data_key))
+    return forecasts
+
+@st.cache_resource
+def load_risk_model(data_key: Tuple, _accidents: pd.DataFrame, _cyclists: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Severity risk model of the full dataset and its probabilities for every
+    cyclist (row i is cyclist i of the unfiltered table), shared by all
+    sessions. Uses the model main.py saved when it was trained on these
+    tables with the current features (is_current()), else trains one
+    streaming from the Parquet tables.
+    """
+    data_dir = os.environ.get("DASHBOARD_DATA_DIR", "processed")
+    accidents, cyclists = _accidents, _cyclists
+    def build() -> Dict[str, Any]:
+        path = model_path(data_dir)
+        accidents_path, cyclists_path = table_paths(data_dir)[:2]
+        model = RiskModel.load(path) if os.path.exists(path) else None
+        if model is None or not is_current(model, accidents_path, cyclists_path):
+            model = train_risk_model(accidents_path, cyclists_path)
+        return {'model': model, 'proba': score_tables(model, accidents, cyclists).astype(np.float32)}
+    risk, cost_s = timed(build)
+    nbytes = risk['proba'].nbytes + risk['model'].weights.nbytes
+    record_cache_miss("load_risk_model", nbytes)
+    get_governor().register("load_risk_model", data_key, nbytes, tier=TIER_INDEX, cost_s=cost_s,
+                            evict=lambda: load_risk_model.clear(data_key))
+    return risk
+
+@st.cache_resource
+def load_accident_lookup(data_key: Tuple) -> pd.Index:
+    """Hash index from Accident_Index to accident_id, shared by all sessions."""
+    lookup, cost_s = timed(lambda: build_accident_lookup(load_accident_index(data_key)))
+    record_cache_miss("load_accident_lookup", lookup.memory_usage(deep=True))
+    get_governor().register("load_accident_lookup", data_key, lookup.memory_usage(deep=True), tier=TIER_INDEX,
+                            cost_s=cost_s, evict=lambda: load_accident_lookup.clear(data_key))
+    return lookup
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """Filter results shared by all sessions, filled by reruns and by the prefetcher."""
+    return ResultCache(
+        max_entries=int(os.environ.get("DASHBOARD_RESULT_CACHE_ENTRIES", "64")),
+        governor=get_governor(),
+        name="filter_results"
+    )
+
+def payload_nbytes(value: Any) -> int:
+    """
+    Rough size of a figure property: array bytes, string lengths and 8 bytes
+    per scalar. Long lists are extrapolated from their first items.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes if value.dtype != object else 8 * value.size
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(key) + payload_nbytes(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        head = value[:64]
+        return int(sum(payload_nbytes(item) for item in head) * len(value) / len(head)) if head else 0
+    return 8
+
+def figure_nbytes(fig: go.Figure) -> int:
+    """
+    Estimated size of a cached figure, from the arrays and properties it
+    holds; serialising it again just to measure it would cost as much as a
+    cache miss saves.
+    """
+    return payload_nbytes([trace._props for trace in fig.data]) + payload_nbytes(fig.layout._props)
+
+@st.cache_resource
+def get_figure_cache() -> ResultCache:
+    """Built Plotly figures shared by all sessions, keyed by chart and data fingerprint."""
+    return ResultCache(
+        max_entries=int(os.environ.get("DASHBOARD_FIGURE_CACHE_ENTRIES", "256")),
+        governor=get_governor(),
+        name="figures",
+        sizeof=figure_nbytes
+    )
+
+def plot_cached(name: str, data: Any, build: Callable[[Any], go.Figure], **chart_kwargs):
+    """
+    Show a Plotly chart, reusing the figure built for the same data before.
+    
+    build(data) must depend only on data; name identifies the chart, so
+    two charts drawn from the same data need different names, and a name
+    drawn more than once per rerun needs a per-call suffix. Unchanged
+    charts skip the px/go construction and validation, which is most of a
+    chart's cost. chart_kwargs are passed to st.plotly_chart; the element
+    key defaults to the name and fingerprint, since charts that build
+    identical figures would otherwise get the same auto-generated ID.
+    """
+    fingerprint = data_fingerprint(data)
+    fig, _ = get_figure_cache().get_or_compute((name, fingerprint), lambda: build(data))
+    chart_kwargs.setdefault('key', f"{name}:{fingerprint}")
+    return st.plotly_chart(fig, **chart_kwargs)
+
+def interval_resamples() -> int:
+    """Bootstrap resamples for severity-rate intervals: 0 unless the sidebar asks for them."""
+    return BOOTSTRAP_RESAMPLES if st.session_state.get('bootstrap_intervals', False) else 0
+
+def add_rate_intervals(fig: go.Figure, intervals: pd.DataFrame, error_bars: bool = False) -> go.Figure:
+    """
+    Attach the intervals of a severity-rate chart to its traces, in place.
+    
+    intervals comes from prepare_severity_intervals() or an '_intervals'
+    entry of a prepare_* result. Heatmaps (groups on y, severities on x)
+    and per-severity bar traces (groups on x) get the Wilson interval, the
+    bootstrap one if present, and the group size in their hover; with
+    error_bars, bars also draw the Wilson interval.
+    """
+    if intervals.empty:
+        return fig
+    group, severity = intervals.columns[:2]
+    stats = ['low', 'high', 'total'] + [col for col in ('boot_low', 'boot_high') if col in intervals.columns]
+    table = intervals.set_index([group, severity])[stats]
+    hover = "95% CI %{customdata[0]:.1f}–%{customdata[1]:.1f}%"
+    if 'boot_low' in stats:
+        hover += "<br>Bootstrap %{customdata[3]:.1f}–%{customdata[4]:.1f}%"
+    hover += "<br>n = %{customdata[2]:,}<extra></extra>"
+    for trace in fig.data:
+        if trace.type == 'heatmap':
+            cells = pd.MultiIndex.from_product([list(trace.y), list(trace.x)])
+            trace.customdata = table.reindex(cells).to_numpy().reshape(len(trace.y), len(trace.x), len(stats))
+            trace.hovertemplate = "%{y}, %{x}: %{z:.1f}%<br>" + hover
+        elif trace.type == 'bar' and trace.name in table.index.get_level_values(1):
+            rows = table.reindex(pd.MultiIndex.from_arrays([list(trace.x), [trace.name] * len(trace.x)]))
+            trace.customdata = rows.to_numpy()
+            trace.hovertemplate = f"{trace.name}<br>" + "%{x}: %{y:.1f}%<br>" + hover
+            if error_bars:
+                trace.error_y = dict(type='data', symmetric=False,
+                                     array=rows['high'].to_numpy() - trace.y,
+                                     arrayminus=trace.y - rows['low'].to_numpy())
+    return fig
+
+@st.cache_resource
+def get_prefetcher() -> Prefetcher:
+    """
+    Background worker precomputing the filter states next to each session's
+    current one. DASHBOARD_PREFETCH_BUDGET_S is the CPU seconds it may spend
+    after each rerun (0 disables prefetching).
+    """
+    return Prefetcher(max_workers=1, budget_s=float(os.environ.get("DASHBOARD_PREFETCH_BUDGET_S", "1.0")))
+
+def session_token() -> str:
+    """Identifier of this browser session, used to own its prefetch batches and stored state."""
+    if 'session_token' not in st.session_state:
+        st.session_state.session_token = uuid.uuid4().hex
+    return st.session_state.session_token
+
+@st.cache_resource
+def get_session_store() -> GovernedStore:
+    """
+    Large per-session state (filter engines, Data Explorer order, linked-chart
+    cube), kept here rather than in st.session_state so that the governor can
+    account for it and evict it; an evicted value is rebuilt on next use.
+    """
+    return GovernedStore(get_governor(), "session_state")
+
+def get_session_value(name: str) -> Optional[Any]:
+    """This session's stored value, or None if unset or evicted."""
+    return get_session_store().get((session_token(), name))
+
+def set_session_value(name: str, value: Any, cost_s: float = 0.0):
+    """Store (or re-account, after an in-place update) one of this session's values."""
+    get_session_store().put((session_token(), name), value, cost_s=cost_s)
+
+@st.cache_resource
+def load_value_index(data_key: Tuple, _accidents: pd.DataFrame, _cyclists: pd.DataFrame):
+    """Inverted value -> row positions index of both tables, shared by all sessions."""
+    value_index = (build_value_index(_accidents), build_value_index(_cyclists))
+    nbytes = frame_nbytes(value_index)
+    record_cache_miss("load_value_index", nbytes)
+    get_governor().register("load_value_index", data_key, nbytes, tier=TIER_INDEX,
+                            evict=lambda: load_value_index.clear(data_key))
+    return value_index
+
+def new_filter_engines(
+    accidents: pd.DataFrame,
+    cyclists: pd.DataFrame,
+    data_key: Tuple
+) -> Tuple[IncrementalFilter, IncrementalFilter]:
+    """A fresh (accidents, cyclists) pair of IncrementalFilter engines."""
+    accident_index, cyclist_index = load_value_index(data_key, accidents, cyclists)
+    return IncrementalFilter(len(accidents), accident_index), IncrementalFilter(len(cyclists), cyclist_index)
+
+def session_filter_engines(
+    accidents: pd.DataFrame,
+    cyclists: pd.DataFrame,
+    data_key: Tuple,
+    state_key: str = 'filter_engines'
+) -> Tuple[IncrementalFilter, IncrementalFilter]:
+    """This session's filter engines, which keep the previous rerun's filter masks."""
+    engines = get_session_value(state_key)
+    if engines is None or (engines[0].n_rows, engines[1].n_rows) != (len(accidents), len(cyclists)):
+        engines = new_filter_engines(accidents, cyclists, data_key)
+        set_session_value(state_key, engines)
+    return engines
+
+def cohort_masks(
+    accidents: pd.DataFrame,
+    cyclists: pd.DataFrame,
+    data_key: Tuple,
+    filters: Dict[str, Any],
+    state_key: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """(accident mask, cyclist mask) of one comparison cohort, evaluated incrementally."""
+    engines = session_filter_engines(accidents, cyclists, data_key, state_key)
+    masks = semijoin_masks(engines[0].apply(**filters), engines[1].apply(**filters), cyclists[ACCIDENT_ID].to_numpy())
+    set_session_value(state_key, engines)  # the engines hold one mask per active filter
+    return masks
+
+def compute_filter_result(
+    accidents: pd.DataFrame,
+    cyclists: pd.DataFrame,
+    filters: Dict[str, Any],
+    engines: Optional[Tuple[IncrementalFilter, IncrementalFilter]] = None
+) -> Dict[str, Any]:
+    """
+    Filter both tables and compute the KPIs for one filter state.
+    
+    With engines, only the filters that changed since the engines' last call
+    are re-evaluated. Row positions are kept instead of the filtered frames,
+    so a cached result is a few int32 arrays and the frames are rebuilt with
+    one gather.
+    """
+    if engines is not None:
+        filtered_accidents, filtered_cyclists = filter_tables_incremental(accidents, cyclists, engines, **filters)
+    else:
+        filtered_accidents, filtered_cyclists = filter_tables(accidents, cyclists, **filters)
+    return {
+        'accidents': filtered_accidents.index.to_numpy(dtype=np.int32),
+        'cyclists': filtered_cyclists.index.to_numpy(dtype=np.int32),
+        'kpis': calculate_kpis(filtered_accidents, filtered_cyclists) if len(filtered_accidents) else None
+    }
+
+def prefetch_adjacent_states(
+    accidents: pd.DataFrame,
+    cyclists: pd.DataFrame,
+    filters: Dict[str, Any],
+    unique_values: Dict,
+    data_key: tuple
+):
+    """Queue the filter states one interaction away for background computation."""
+    year_bounds = (int(accidents['year'].min()), int(accidents['year'].max())) if 'year' in accidents.columns else None
+    options = {
+        'severity': unique_values.get('severity', []),
+        'gender': unique_values.get('gender', []),
+        'age_groups': unique_values.get('age_grp', []),
+        'road_conditions': unique_values.get('road_conditions', []),
+        'weather_conditions': unique_values.get('weather_conditions', []),
+        'light_conditions': unique_values.get('light_conditions', []),
+    }
+    # The batch gets its own engines: consecutive states differ by one or two
+    # toggles, so after the first each is a cheap delta
+    engines = new_filter_engines(accidents, cyclists, data_key)
+    jobs = [
+        (data_key + (filter_key(state),), lambda state=state: compute_filter_result(accidents, cyclists, state, engines))
+        for state in adjacent_filter_states(filters, options, year_bounds)
+    ]
+    get_prefetcher().schedule(session_token(), jobs, get_result_cache())
+
+def get_profiler() -> RerunProfiler:
+    """
+    Return this session's rerun profiler.
+
+    Profiling is opt-in: set DASHBOARD_PERF=1 in the environment or open the
+    dashboard with ?perf=1. Set DASHBOARD_PERF_LOG to a file path to also
+    append every rerun to a JSON Lines log on the server.
+    """
+    enabled = os.environ.get("DASHBOARD_PERF") == "1" or st.query_params.get("perf") == "1"
+    if 'perf_profiler' not in st.session_state:
+        st.session_state.perf_profiler = RerunProfiler(
+            enabled=enabled,
+            log_path=os.environ.get("DASHBOARD_PERF_LOG")
+        )
+    profiler = st.session_state.perf_profiler
+    profiler.enabled = enabled
+    return profiler
+
+def run_section(profiler: RerunProfiler, tab: str, section, df: pd.DataFrame, **kwargs):
+    """Render a dashboard section, timing it under 'tab/section' when profiling."""
+    with profiler.section(f"{tab}/{section.__name__}", rows=len(df)):
+        section(df, **kwargs)
+
+def request_allocation_profile():
+    """Button callback: profile allocations during the rerun it triggers."""
+    st.session_state.profile_allocations = True
+
+def display_perf_panel(profiler: RerunProfiler, rerun: Dict[str, Any]):
+    """Show the current rerun's timing breakdown and rolling percentiles."""
+    with st.expander("⏱️ Performance (debug)", expanded=False):
+        st.write(f"**This rerun:** {rerun['total_ms']:,.0f} ms")
+        st.dataframe(pd.DataFrame(rerun['sections']), width="stretch", hide_index=True)
+        
+        st.button(
+            "Profile allocations for one rerun",
+            on_click=request_allocation_profile,
+            help="Re-runs the dashboard with tracemalloc enabled (slower) and ranks the worst allocators"
+        )
+        if 'allocations' in rerun:
+            st.write("**Worst allocators this rerun** (MB)")
+            allocations = pd.DataFrame(rerun['allocations'])
+            byte_columns = [c for c in allocations.columns if c.endswith('_bytes')]
+            allocations[byte_columns] = (allocations[byte_columns].astype(float) / 1024**2).round(2)
+            allocations.columns = [c.replace('_bytes', '_mb') for c in allocations.columns]
+            st.dataframe(allocations, width="stretch", hide_index=True)
+        
+        usage = get_governor().usage()
+        st.write(
+            f"**Cache memory:** {usage['used_bytes'] / 1024**2:,.1f} of {usage['budget_bytes'] / 1024**2:,.0f} MB "
+            f"({usage['evictions']:,} evictions)"
+        )
+        figures = get_figure_cache().stats()
+        st.caption(f"Figure cache: {figures['entries']:,} figures, {figures['hits']:,} hits, {figures['misses']:,} misses")
+        results, prefetch = get_result_cache().stats(), get_prefetcher().stats()
+        st.caption(
+            f"Filter results: {results['entries']:,} cached, {results['hits']:,} hits, {results['misses']:,} misses, "
+            f"{results['prefetched']:,} prefetched, {prefetch['failures']:,} prefetch failures"
+            + (f" (last: {prefetch['last_error']})" if prefetch['last_error'] else "")
+        )
+        st.dataframe(
+            pd.DataFrame([
+                {'cache': name, 'tier': row['tier'], 'entries': row['entries'], 'mb': round(row['bytes'] / 1024**2, 2)}
+                for name, row in sorted(usage['caches'].items(), key=lambda item: -item[1]['bytes'])
+            ]),
+            width="stretch", hide_index=True
+        )
+        
+        st.write(f"**Rolling percentiles** (last {len(profiler.history)} reruns)")
+        st.dataframe(pd.DataFrame(profiler.section_percentiles()), width="stretch", hide_index=True)
+        
+        st.download_button(
+            label="Download performance log (JSONL)",
+            data=profiler.export_jsonl(),
+            file_name="dashboard_perf_log.jsonl",
+            mime="application/json"
+        )
+
+def approximate_results(samples: Dict[float, pd.DataFrame], filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Estimate the KPIs and yearly accident counts from a stratified sample.
+    
+    The filtered size is first estimated on the smallest sample, then the
+    smallest rate expected to leave enough filtered rows is used. Returns
+    None when the filtered data is small enough to compute exactly.
+    """
+    smallest = samples[min(samples)]
+    rate = choose_sample_rate(estimate_rows(smallest, filter_mask(smallest, filters)), list(samples))
+    if rate is None:
+        return None
+    sample = samples[rate]
+    mask = filter_mask(sample, filters)
+    return {'rate': rate, 'kpis': estimate_kpis(sample, mask), 'yearly': estimate_yearly_counts(sample, mask)}
+
+def display_estimates(estimate: Dict[str, Any]):
+    """Show sample estimates with 95% confidence intervals while exact results are computed."""
+    kpis = estimate['kpis']
+    st.caption(
+        f"≈ Approximate: estimated from a {estimate['rate']:.0%} stratified sample "
+        f"({kpis['sample_rows']:,} rows) with 95% confidence intervals. Exact results are loading..."
+    )
+    cards = [
+        ('total_accidents', "Total Accidents"), ('total_casualties', "Total Casualties"),
+        ('total_vehicles', "Vehicles Involved"), ('avg_casualties_per_accident', "Avg Casualties/Accident"),
+        ('fatal_accidents', "Fatal Accidents"), ('serious_accidents', "Serious Accidents"),
+        ('slight_accidents', "Slight Accidents")
+    ]
+    columns = st.columns(4) + st.columns(4)
+    for column, (key, label) in zip(columns, cards):
+        low, high = kpis['intervals'][key]
+        if key == 'avg_casualties_per_accident':
+            value, bounds = f"{kpis[key]:.2f}", f"{low:.2f} – {high:.2f}"
+        else:
+            value, bounds = format_large_numbers(kpis[key]), f"{format_large_numbers(low)} – {format_large_numbers(high)}"
+        with column:
+            st.markdown(
+                f"""
+                <div class="kpi-container">
+                    <div class="kpi-value">≈{value}</div>
+                    <div class="kpi-label">{label}<br>95% CI {bounds}</div>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+    
+    def build(yearly: pd.DataFrame) -> go.Figure:
+        fig = go.Figure([
+            go.Scatter(x=yearly['year'], y=yearly['high'], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'),
+            go.Scatter(x=yearly['year'], y=yearly['low'], mode='lines', line=dict(width=0), fill='tonexty',
+                       fillcolor='rgba(31, 119, 180, 0.2)', name='95% CI'),
+            go.Scatter(x=yearly['year'], y=yearly['count'], mode='lines+markers', name='Estimate')
+        ])
+        fig.update_layout(title="Estimated Bicycle Accidents by Year", xaxis_title="Year",
+                          yaxis_title="Number of Accidents", height=350)
+        return fig
+    plot_cached("estimates/yearly", estimate['yearly'], build, width="stretch")
+
+def display_comparison(comparison: Dict[str, pd.DataFrame], labels: Tuple[str, str]):
+    """Show two cohorts side by side: KPIs and aggregates with absolute numbers and deltas."""
+    st.markdown('<div class="section-header">Cohort Comparison</div>', unsafe_allow_html=True)
+    
+    kpi_labels = {
+        'total_accidents': "Total Accidents", 'total_casualties': "Total Casualties",
+        'total_vehicles': "Vehicles Involved", 'fatal_accidents': "Fatal Accidents",
+        'serious_accidents': "Serious Accidents", 'slight_accidents': "Slight Accidents",
+        'avg_casualties_per_accident': "Avg Casualties/Accident"
+    }
+    kpis = comparison['kpis']
+    columns = st.columns(4) + st.columns(4)
+    for column, (key, label) in zip(columns, kpi_labels.items()):
+        row = kpis.loc[key]
+        if key == 'avg_casualties_per_accident':
+            values = f"{row[labels[0]]:.2f} vs {row[labels[1]]:.2f}"
+            delta = f"{row['Delta']:+.2f}"
+        else:
+            values = f"{format_large_numbers(row[labels[0]])} vs {format_large_numbers(row[labels[1]])}"
+            delta = f"{row['Delta']:+,.0f}"
+        if pd.notna(row['Delta %']):
+            delta += f" ({row['Delta %']:+.1f}%)"
+        with column:
+            st.metric(label, values, delta)
+    
+    def grouped_bars(name: str, title: str, x_label: str):
+        data = comparison[name]
+        long = data[list(labels)].reset_index().melt(id_vars=name, var_name='Cohort', value_name='Count')
+        
+        def build(spec: Tuple[pd.DataFrame, str, str]) -> go.Figure:
+            long, title, x_label = spec
+            fig = px.bar(long, x=long.columns[0], y='Count', color='Cohort', barmode='group', title=title,
+                         labels={long.columns[0]: x_label})
+            fig.update_layout(height=350)
+            return fig
+        plot_cached(f"comparison/grouped_bars/{name}", (long, title, x_label), build, width="stretch")
+        st.dataframe(data, width="stretch")
+    
+    tab1, tab2, tab3 = st.tabs(["Severity", "Time", "Demographics"])
+    with tab1:
+        grouped_bars('severity', "Cyclists by Severity", "Severity")
+    with tab2:
+        yearly = comparison['year'][list(labels)].reset_index().melt(id_vars='year', var_name='Cohort', value_name='Accidents')
+        def build(yearly: pd.DataFrame) -> go.Figure:
+            fig = px.line(yearly, x='year', y='Accidents', color='Cohort', markers=True, title="Accidents by Year")
+            fig.update_layout(height=350)
+            return fig
+        plot_cached("comparison/yearly", yearly, build, width="stretch")
+        grouped_bars('day_of_week', "Accidents by Day of Week", "Day of Week")
+    with tab3:
+        col1, col2 = st.columns(2)
+        with col1:
+            grouped_bars('gender', "Cyclists by Gender", "Gender")
+        with col2:
+            grouped_bars('age_grp', "Cyclists by Age Group", "Age Group")
+
 def display_kpis(kpis: Dict[str, Any]):
     """Display KPIs in a formatted grid."""
     col1, col2, col3, col4 = st.columns(4)
@@ -172,9 +765,16 @@ def display_kpis(kpis: Dict[str, Any]):
             unsafe_allow_html=True
         )
 
-def create_sidebar_filters(df: pd.DataFrame, unique_values: Dict):
-    """Create sidebar filters for the dashboard."""
-    st.sidebar.header(" Data Filters")
+def create_sidebar_filters(df: pd.DataFrame, unique_values: Dict, key: Optional[str] = None, header: str = " Data Filters"):
+    """
+    Create sidebar filters for the dashboard.
+    
+    A key prefix gives the widgets their own identity, for a second filter set.
+    """
+    st.sidebar.header(header)
+    
+    def widget_key(name: str) -> Optional[str]:
+        return f"{key}_{name}" if key else None
     
     # Year range filter
     if 'year' in df.columns:
@@ -184,7 +784,8 @@ def create_sidebar_filters(df: pd.DataFrame, unique_values: Dict):
             min_value=min_year,
             max_value=max_year,
             value=(min_year, max_year),
-            step=1
+            step=1,
+            key=widget_key("year_range")
         )
     else:
         year_range = None
@@ -194,7 +795,8 @@ def create_sidebar_filters(df: pd.DataFrame, unique_values: Dict):
     severity_filter = st.sidebar.multiselect(
         "Accident Severity",
         options=severity_options,
-        default=severity_options
+        default=severity_options,
+        key=widget_key("severity")
     )
     
     # Gender filter
@@ -202,7 +804,8 @@ def create_sidebar_filters(df: pd.DataFrame, unique_values: Dict):
     gender_filter = st.sidebar.multiselect(
         "Gender",
         options=gender_options,
-        default=gender_options
+        default=gender_options,
+        key=widget_key("gender")
     )
     
     # Age group filter
@@ -210,7 +813,8 @@ def create_sidebar_filters(df: pd.DataFrame, unique_values: Dict):
     age_filter = st.sidebar.multiselect(
         "Age Group",
         options=age_options,
-        default=age_options
+        default=age_options,
+        key=widget_key("age_groups")
     )
     
     # Road conditions filter
@@ -218,7 +822,8 @@ def create_sidebar_filters(df: pd.DataFrame, unique_values: Dict):
     road_cond_filter = st.sidebar.multiselect(
         "Road Conditions",
         options=road_cond_options,
-        default=road_cond_options
+        default=road_cond_options,
+        key=widget_key("road_conditions")
     )
     
     # Weather conditions filter
@@ -226,7 +831,8 @@ def create_sidebar_filters(df: pd.DataFrame, unique_values: Dict):
     weather_filter = st.sidebar.multiselect(
         "Weather Conditions",
         options=weather_options,
-        default=weather_options
+        default=weather_options,
+        key=widget_key("weather_conditions")
     )
     
     # Light conditions filter
@@ -234,7 +840,8 @@ def create_sidebar_filters(df: pd.DataFrame, unique_values: Dict):
     light_filter = st.sidebar.multiselect(
         "Light Conditions",
         options=light_options,
-        default=light_options
+        default=light_options,
+        key=widget_key("light_conditions")
     )
     
     return {
@@ -254,18 +861,19 @@ def create_time_series_chart(df: pd.DataFrame):
     # Time series by year
     yearly_data = prepare_time_series_data(df, 'year')
     
-    fig = px.line(
-        yearly_data, 
-        x='year', 
-        y='count',
-        title="Bicycle Accidents by Year",
-        labels={'count': 'Number of Accidents', 'year': 'Year'},
-        markers=True
-    )
-    fig.update_layout(height=400, showlegend=False)
-    fig.update_traces(line=dict(width=3), marker=dict(size=6))
-    
-    st.plotly_chart(fig, width="stretch")
+    def build(yearly_data) -> go.Figure:
+        fig = px.line(
+            yearly_data, 
+            x='year', 
+            y='count',
+            title="Bicycle Accidents by Year",
+            labels={'count': 'Number of Accidents', 'year': 'Year'},
+            markers=True
+        )
+        fig.update_layout(height=400, showlegend=False)
+        fig.update_traces(line=dict(width=3), marker=dict(size=6))
+        return compact_figure(fig)
+    plot_cached("time_series/yearly", yearly_data, build, width="stretch")
 
 def create_severity_charts(df: pd.DataFrame):
     """Create severity analysis charts."""
@@ -277,15 +885,17 @@ def create_severity_charts(df: pd.DataFrame):
         # Severity distribution
         if 'severity' in df.columns:
             severity_counts = df['severity'].value_counts()
-            fig = px.pie(
-                values=severity_counts.values,
-                names=severity_counts.index,
-                title="Accident Severity Distribution",
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, width="stretch")
+            def build(severity_counts) -> go.Figure:
+                fig = px.pie(
+                    values=severity_counts.values,
+                    names=severity_counts.index,
+                    title="Accident Severity Distribution",
+                    color_discrete_sequence=px.colors.qualitative.Set3
+                )
+                fig.update_traces(textposition='inside', textinfo='percent+label')
+                fig.update_layout(height=400)
+                return fig
+            plot_cached("severity/distribution", severity_counts, build, width="stretch")
     
     with col2:
         # Severity by weather conditions
@@ -296,16 +906,20 @@ def create_severity_charts(df: pd.DataFrame):
             
             severity_weather = prepare_severity_analysis(df_temp, 'weather_conditions')
             if not severity_weather.empty:
-                fig = px.bar(
-                    severity_weather.reset_index(),
-                    x='weather_conditions',
-                    y=['Slight', 'Serious', 'Fatal'],
-                    title="Accident Severity by Weather Conditions (%)",
-                    labels={'value': 'Percentage', 'weather_conditions': 'Weather Conditions'},
-                    barmode='stack'
-                )
-                fig.update_layout(height=400, xaxis_tickangle=45)
-                st.plotly_chart(fig, width="stretch")
+                weather_intervals = prepare_severity_intervals(df_temp, 'weather_conditions', interval_resamples())
+                def build(data) -> go.Figure:
+                    severity_weather, weather_intervals = data
+                    fig = px.bar(
+                        severity_weather.reset_index(),
+                        x='weather_conditions',
+                        y=['Slight', 'Serious', 'Fatal'],
+                        title="Accident Severity by Weather Conditions (%)",
+                        labels={'value': 'Percentage', 'weather_conditions': 'Weather Conditions'},
+                        barmode='stack'
+                    )
+                    fig.update_layout(height=400, xaxis_tickangle=45)
+                    return add_rate_intervals(fig, weather_intervals)
+                plot_cached("severity/by_weather", (severity_weather, weather_intervals), build, width="stretch")
 
 def create_demographic_charts(df: pd.DataFrame):
     """Create demographic analysis charts."""
@@ -317,33 +931,37 @@ def create_demographic_charts(df: pd.DataFrame):
         # Gender distribution
         if 'gender' in df.columns:
             gender_counts = calculate_accident_rates(df, 'gender')
-            fig = px.bar(
-                gender_counts,
-                x='gender',
-                y='count',
-                title="Accidents by Gender",
-                text='percentage',
-                labels={'count': 'Number of Accidents', 'gender': 'Gender'}
-            )
-            fig.update_traces(texttemplate='%{text}%', textposition='outside')
-            fig.update_layout(height=400, showlegend=False)
-            st.plotly_chart(fig, width="stretch")
+            def build(gender_counts) -> go.Figure:
+                fig = px.bar(
+                    gender_counts,
+                    x='gender',
+                    y='count',
+                    title="Accidents by Gender",
+                    text='percentage',
+                    labels={'count': 'Number of Accidents', 'gender': 'Gender'}
+                )
+                fig.update_traces(texttemplate='%{text}%', textposition='outside')
+                fig.update_layout(height=400, showlegend=False)
+                return fig
+            plot_cached("demographics/gender", gender_counts, build, width="stretch")
     
     with col2:
         # Age group distribution
         if 'age_grp' in df.columns:
             age_counts = calculate_accident_rates(df, 'age_grp')
-            fig = px.bar(
-                age_counts,
-                x='age_grp',
-                y='count',
-                title="Accidents by Age Group",
-                text='percentage',
-                labels={'count': 'Number of Accidents', 'age_grp': 'Age Group'}
-            )
-            fig.update_traces(texttemplate='%{text}%', textposition='outside')
-            fig.update_layout(height=400, showlegend=False, xaxis_tickangle=45)
-            st.plotly_chart(fig, width="stretch")
+            def build(age_counts) -> go.Figure:
+                fig = px.bar(
+                    age_counts,
+                    x='age_grp',
+                    y='count',
+                    title="Accidents by Age Group",
+                    text='percentage',
+                    labels={'count': 'Number of Accidents', 'age_grp': 'Age Group'}
+                )
+                fig.update_traces(texttemplate='%{text}%', textposition='outside')
+                fig.update_layout(height=400, showlegend=False, xaxis_tickangle=45)
+                return fig
+            plot_cached("demographics/age_group", age_counts, build, width="stretch")
 
 def create_conditions_analysis(df: pd.DataFrame):
     """Create road and environmental conditions analysis."""
@@ -358,17 +976,19 @@ def create_conditions_analysis(df: pd.DataFrame):
             df_temp['road_conditions'] = group_rare_categories(df_temp['road_conditions'], min_count=50)
             road_counts = calculate_accident_rates(df_temp, 'road_conditions')
             
-            fig = px.bar(
-                road_counts,
-                x='road_conditions',
-                y='count',
-                title="Accidents by Road Conditions",
-                text='percentage',
-                labels={'count': 'Number of Accidents', 'road_conditions': 'Road Conditions'}
-            )
-            fig.update_traces(texttemplate='%{text}%', textposition='outside')
-            fig.update_layout(height=400, showlegend=False, xaxis_tickangle=45)
-            st.plotly_chart(fig, width="stretch")
+            def build(road_counts) -> go.Figure:
+                fig = px.bar(
+                    road_counts,
+                    x='road_conditions',
+                    y='count',
+                    title="Accidents by Road Conditions",
+                    text='percentage',
+                    labels={'count': 'Number of Accidents', 'road_conditions': 'Road Conditions'}
+                )
+                fig.update_traces(texttemplate='%{text}%', textposition='outside')
+                fig.update_layout(height=400, showlegend=False, xaxis_tickangle=45)
+                return fig
+            plot_cached("conditions/road", road_counts, build, width="stretch")
     
     with col2:
         # Light conditions
@@ -377,17 +997,19 @@ def create_conditions_analysis(df: pd.DataFrame):
             df_temp['light_conditions'] = group_rare_categories(df_temp['light_conditions'], min_count=50)
             light_counts = calculate_accident_rates(df_temp, 'light_conditions')
             
-            fig = px.bar(
-                light_counts,
-                x='light_conditions',
-                y='count',
-                title="Accidents by Light Conditions",
-                text='percentage',
-                labels={'count': 'Number of Accidents', 'light_conditions': 'Light Conditions'}
-            )
-            fig.update_traces(texttemplate='%{text}%', textposition='outside')
-            fig.update_layout(height=400, showlegend=False, xaxis_tickangle=45)
-            st.plotly_chart(fig, width="stretch")
+            def build(light_counts) -> go.Figure:
+                fig = px.bar(
+                    light_counts,
+                    x='light_conditions',
+                    y='count',
+                    title="Accidents by Light Conditions",
+                    text='percentage',
+                    labels={'count': 'Number of Accidents', 'light_conditions': 'Light Conditions'}
+                )
+                fig.update_traces(texttemplate='%{text}%', textposition='outside')
+                fig.update_layout(height=400, showlegend=False, xaxis_tickangle=45)
+                return fig
+            plot_cached("conditions/light", light_counts, build, width="stretch")
 
 def create_temporal_analysis(df: pd.DataFrame):
     """Create temporal patterns analysis."""
@@ -399,15 +1021,17 @@ def create_temporal_analysis(df: pd.DataFrame):
         # Day of week analysis
         if 'day_of_week' in df.columns:
             dow_data = prepare_time_series_data(df, 'day_of_week')
-            fig = px.bar(
-                dow_data,
-                x='day_of_week',
-                y='count',
-                title="Accidents by Day of Week",
-                labels={'count': 'Number of Accidents', 'day_of_week': 'Day of Week'}
-            )
-            fig.update_layout(height=400, showlegend=False, xaxis_tickangle=45)
-            st.plotly_chart(fig, width="stretch")
+            def build(dow_data) -> go.Figure:
+                fig = px.bar(
+                    dow_data,
+                    x='day_of_week',
+                    y='count',
+                    title="Accidents by Day of Week",
+                    labels={'count': 'Number of Accidents', 'day_of_week': 'Day of Week'}
+                )
+                fig.update_layout(height=400, showlegend=False, xaxis_tickangle=45)
+                return fig
+            plot_cached("temporal/day_of_week", dow_data, build, width="stretch")
     
     with col2:
         # Monthly patterns
@@ -416,18 +1040,211 @@ def create_temporal_analysis(df: pd.DataFrame):
             month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
                           'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
             
-            fig = px.line(
-                x=month_names,
-                y=[month_counts.get(i, 0) for i in range(1, 13)],
-                title="Accidents by Month",
-                labels={'x': 'Month', 'y': 'Number of Accidents'},
-                markers=True
+            def build(month_counts) -> go.Figure:
+                fig = px.line(
+                    x=month_names,
+                    y=[month_counts.get(i, 0) for i in range(1, 13)],
+                    title="Accidents by Month",
+                    labels={'x': 'Month', 'y': 'Number of Accidents'},
+                    markers=True
+                )
+                fig.update_layout(height=400, showlegend=False)
+                fig.update_traces(line=dict(width=3), marker=dict(size=6))
+                return fig
+            plot_cached("temporal/month", month_counts, build, width="stretch")
+
+# Names of the forecast slices' dimensions in the selector
+SLICE_LABELS = {
+    'all': 'All', 'severity': 'Severity', 'road_conditions': 'Road conditions',
+    'weather_conditions': 'Weather', 'light_conditions': 'Light', 'age_grp': 'Age group', 'gender': 'Gender'
+}
+
+def create_trend_forecasts(df: pd.DataFrame, data: Optional[Dataset] = None):
+    """
+    Create the seasonal decomposition and forecast view.
+    
+    Every slice's series is decomposed and forecast together, once per
+    dataset (load_trend_forecasts); for views of the dashboard tables the
+    sidebar filters do not apply. Any other frame is modelled directly.
+    """
+    st.markdown('<div class="section-header"> Trend Decomposition and Forecast</div>', unsafe_allow_html=True)
+    
+    if data is not None and ACCIDENT_ID in df.columns and 'severity' not in df.columns:
+        forecasts = load_trend_forecasts(data.key, data.accidents, data.cyclists)
+        st.caption("Fitted on the whole dataset; the sidebar filters do not apply to this view.")
+    else:
+        forecasts = build_trend_forecasts(df)
+    series = forecasts['series']
+    if series.empty:
+        st.info("Monthly series not available")
+        return
+    
+    names = [
+        str(value) if dimension == 'all' else f"{SLICE_LABELS.get(dimension, dimension)}: {value}"
+        for dimension, value in zip(series['dimension'], series['value'])
+    ]
+    row = st.selectbox("Series", range(len(names)), format_func=names.__getitem__, key="forecast_series")
+    
+    chart = (
+        names[row], forecasts['months'], forecasts['counts'][row], forecasts['trend'][row],
+        forecasts['forecast_months'], forecasts['forecast'][row], forecasts['low'][row], forecasts['high'][row]
+    )
+    def build(chart) -> go.Figure:
+        name, months, counts, trend, forecast_months, forecast, low, high = chart
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=months, y=counts, mode='lines', name='Monthly accidents',
+                                 line=dict(width=1, color='lightblue')))
+        fig.add_trace(go.Scatter(x=months, y=trend, mode='lines', name='Trend',
+                                 line=dict(width=3, color='darkblue')))
+        fig.add_trace(go.Scatter(x=forecast_months, y=high, mode='lines', line=dict(width=0),
+                                 showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=forecast_months, y=low, mode='lines', line=dict(width=0),
+                                 fill='tonexty', fillcolor='rgba(255, 127, 14, 0.2)', name='95% interval'))
+        fig.add_trace(go.Scatter(x=forecast_months, y=forecast, mode='lines', name='Forecast',
+                                 line=dict(width=2, color='darkorange')))
+        fig.update_layout(
+            title=f"{name}: Monthly Accidents, Trend and {len(forecast_months)}-Month Forecast",
+            xaxis_title="Month",
+            yaxis_title="Number of Accidents",
+            height=400
+        )
+        return compact_figure(fig)
+    plot_cached("forecast/series", chart, build, width='stretch')
+    
+    # Next-horizon totals of every slice against the last observed months
+    horizon = forecasts['forecast'].shape[1]
+    recent = forecasts['counts'][:, -horizon:].sum(axis=1)
+    expected = forecasts['forecast'].sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.where(recent > 0, (expected / recent - 1) * 100, np.nan)
+    summary = pd.DataFrame({
+        'Series': names,
+        f'Last {horizon} months': recent.astype(np.int64),
+        f'Forecast next {horizon}': expected.round(0),
+        'Change (%)': change.round(1),
+        'Seasonal swing (peak - trough)': np.ptp(forecasts['seasonal'][:, :SEASON], axis=1).round(1)
+    })
+    st.write(f"**Forecasts for all {len(summary)} series** (next {horizon} months)")
+    st.dataframe(summary, width='stretch', hide_index=True)
+
+def explorer_order(
+    df: pd.DataFrame,
+    sort_column: Optional[str],
+    descending: bool,
+    query: str,
+    data: Optional[Dataset]
+) -> np.ndarray:
+    """
+    Row positions of the Data Explorer view, sorted and searched.
+    
+    For views of the dashboard tables (data given), the index holds full
+    cyclist positions and the shared permutations and lookup index are used;
+    any other frame is sorted and searched directly. The result is kept in the session
+    until the view, sort or search changes.
+    """
+    indexed = data is not None
+    positions = df.index.to_numpy() if indexed else np.arange(len(df))
+    key = (hashlib.blake2b(positions.tobytes(), digest_size=16).hexdigest(), sort_column, descending, query)
+    cached = get_session_value('explorer_order')
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    
+    order = np.arange(len(df))
+    if sort_column is not None:
+        if indexed:
+            permutation, n_missing = load_sort_permutation(data.key, sort_column, data.accidents, data.cyclists)
+        else:
+            permutation, n_missing = build_sort_permutation(df, sort_column)
+        order = view_order(permutation, positions, descending, n_missing)
+    if query.strip():
+        matches = search_rows(df, query, load_accident_lookup(data.key) if indexed else None)
+        order = order[np.isin(order, matches)]
+    set_session_value('explorer_order', (key, order))
+    return order
+
+def store_crossfilter_selection(dimension: str, widget_key: str):
+    """Chart selection callback: keep the selected labels of one linked chart."""
+    points = st.session_state[widget_key]['selection']['points']
+    selections = st.session_state.setdefault('crossfilter_selections', {})
+    if points:
+        selections[dimension] = sorted({point['x'] for point in points})
+    else:
+        selections.pop(dimension, None)
+    st.session_state.crossfilter_changed = dimension
+
+def clear_crossfilter_selections():
+    """Button callback: drop every linked-chart selection."""
+    st.session_state.crossfilter_selections = {}
+    st.session_state.crossfilter_changed = None
+
+def create_crossfilter_charts(df: pd.DataFrame, data: Optional[Dataset] = None):
+    """
+    Create linked charts: selecting bars in one filters the others.
+    
+    Counts come from a cube of accidents by weather, year and hour, built
+    once per sidebar filter state from precomputed dimension codes. A chart
+    selection only slices the cube, and only the charts other than the one
+    clicked are recomputed.
+    """
+    st.markdown('<div class="section-header">Linked Charts</div>', unsafe_allow_html=True)
+    st.markdown("**Analysis:** Click or box-select bars to filter the other charts (double-click to clear a chart).")
+    
+    # Views of the dashboard accident table use the shared codes; other frames are coded directly
+    if data is not None and ACCIDENT_ID in df.columns and 'severity' not in df.columns:
+        dimension_codes, positions = load_dimension_codes(data.key, data.accidents), df.index.to_numpy()
+    else:
+        dimension_codes, positions = build_dimension_codes(df, CROSSFILTER_DIMENSIONS), None
+    dimensions = list(dimension_codes)
+    
+    cube_key = (positions is None, hashlib.blake2b(df.index.to_numpy().tobytes(), digest_size=16).hexdigest())
+    cached = get_session_value('crossfilter_cube')
+    if cached is None or cached[0] != cube_key:
+        cached = (cube_key, build_count_cube(dimension_codes, positions), None)
+    cube_key, cube, previous = cached
+    
+    selected = st.session_state.get('crossfilter_selections', {})
+    selections = {
+        dimension: np.isin(dimension_codes[dimension][1], selected[dimension]) if dimension in selected else None
+        for dimension in dimensions
+    }
+    counts = slice_cube(cube, dimensions, selections, previous=previous,
+                        changed=st.session_state.pop('crossfilter_changed', None))
+    set_session_value('crossfilter_cube', (cube_key, cube, counts))
+    
+    in_selection = cube
+    for axis, dimension in enumerate(dimensions):
+        if selections[dimension] is not None:
+            in_selection = np.compress(selections[dimension], in_selection, axis=axis)
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.metric("Accidents in selection", f"{int(in_selection.sum()):,}", help="Accidents matching every chart selection")
+    with col2:
+        st.button("Clear chart selections", on_click=clear_crossfilter_selections, disabled=not selected)
+    
+    titles = {'weather_conditions': "Weather Conditions", 'year': "Year", 'hour': "Hour of Day"}
+    columns = st.columns(len(dimensions))
+    for column, dimension in zip(columns, dimensions):
+        labels = dimension_codes[dimension][1]
+        chosen = selections[dimension] if selections[dimension] is not None else np.ones(len(labels), dtype=bool)
+        
+        def build(spec: Tuple[np.ndarray, np.ndarray, np.ndarray, str]) -> go.Figure:
+            labels, bar_counts, chosen, title = spec
+            fig = go.Figure(go.Bar(x=labels, y=bar_counts, marker_color=np.where(chosen, '#1f77b4', 'lightgray')))
+            fig.update_layout(title=title, height=350, dragmode='select', margin=dict(t=50, b=40))
+            return fig
+        widget_key = f"crossfilter_{dimension}"
+        with column:
+            plot_cached(
+                "crossfilter/bars",
+                (labels, counts[dimension], chosen, f"Accidents by {titles.get(dimension, dimension)}"),
+                build,
+                width="stretch",
+                key=widget_key,
+                on_select=lambda d=dimension, k=widget_key: store_crossfilter_selection(d, k),
+                selection_mode=('points', 'box')
             )
-            fig.update_layout(height=400, showlegend=False)
-            fig.update_traces(line=dict(width=3), marker=dict(size=6))
-            st.plotly_chart(fig, width="stretch")
 
-def create_data_explorer(df: pd.DataFrame):
+def create_data_explorer(df: pd.DataFrame, data: Optional[Dataset] = None):
     """Create interactive data explorer section."""
     st.markdown('<div class="section-header">📊 Data Explorer</div>', unsafe_allow_html=True)
     
@@ -438,7 +1255,7 @@ def create_data_explorer(df: pd.DataFrame):
         st.write("**Dataset Summary:**")
         st.write(f"- Total Records: {len(df):,}")
         st.write(f"- Date Range: {df['year'].min()} - {df['year'].max()}")
-        st.write(f"- Unique Accidents: {df['accident_index'].nunique():,}" if 'accident_index' in df.columns else "")
+        st.write(f"- Unique Accidents: {count_unique_accidents(df):,}" if {'accident_index', ACCIDENT_ID} & set(df.columns) else "")
         st.write(f"- Missing Data: {df.isnull().sum().sum():,} values")
     
     with col2:
@@ -451,8 +1268,16 @@ def create_data_explorer(df: pd.DataFrame):
     # Raw data viewer
     st.subheader("📋 Raw Data Viewer")
     
+    # Accident_Index strings are decoded from accident_id for shown and exported rows only
+    decodable = ACCIDENT_ID in df.columns and 'accident_index' not in df.columns
+    
+    def with_accident_index(rows: pd.DataFrame) -> pd.DataFrame:
+        if decodable and 'accident_index' in display_columns:
+            return decode_accident_index(rows, load_accident_index(data.key if data is not None else data_version()))
+        return rows
+    
     # Select columns to display
-    available_columns = df.columns.tolist()
+    available_columns = (['accident_index'] if decodable else []) + [col for col in df.columns if col != ACCIDENT_ID]
     display_columns = st.multiselect(
         "Select columns to display:",
         options=available_columns,
@@ -463,7 +1288,22 @@ def create_data_explorer(df: pd.DataFrame):
         # Pagination
         rows_per_page = st.select_slider("Rows per page:", [10, 25, 50, 100], value=25)
         
-        total_rows = len(df)
+        # Sort and search. The row order of a view is computed once from the
+        # precomputed permutation and kept in the session, so each page is a slice.
+        sort_col1, sort_col2, sort_col3 = st.columns([2, 1, 3])
+        with sort_col1:
+            sort_column = st.selectbox("Sort by:", ['(none)'] + available_columns)
+        with sort_col2:
+            descending = st.checkbox("Descending", value=False)
+        with sort_col3:
+            query = st.text_input("Search (Accident_Index or text):", value="")
+        order = explorer_order(df, None if sort_column == '(none)' else sort_column, descending, query,
+                               data if decodable else None)
+        
+        total_rows = len(order)
+        if total_rows == 0:
+            st.info("No rows match the search.")
+            return
         total_pages = (total_rows - 1) // rows_per_page + 1
         
         page = st.number_input(
@@ -477,22 +1317,24 @@ def create_data_explorer(df: pd.DataFrame):
         end_idx = min(start_idx + rows_per_page, total_rows)
         
         st.dataframe(
-            df[display_columns].iloc[start_idx:end_idx],
+            with_accident_index(df.iloc[order[start_idx:end_idx]])[display_columns],
             width="stretch",
             hide_index=True
         )
         
         st.write(f"Showing rows {start_idx + 1} to {end_idx} of {total_rows}")
         
-        # Download filtered data
-        if st.button("Download Filtered Data as CSV"):
-            csv = df[display_columns].to_csv(index=False)
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name="filtered_bicycle_accidents.csv",
-                mime="text/csv"
-            )
+        # Download filtered data. The file is written in batches to a temporary
+        # file only when the button is clicked, without a rerun.
+        export_format = st.selectbox("Export format:", list(EXPORT_FORMATS))
+        extension, mime = EXPORT_FORMATS[export_format]
+        st.download_button(
+            label=f"Download Filtered Data ({export_format})",
+            data=lambda: open_export(df, export_format, transform=lambda rows: with_accident_index(rows)[display_columns], order=order),
+            file_name=f"filtered_bicycle_accidents.{extension}",
+            mime=mime,
+            on_click="ignore"
+        )
 
 def create_advanced_severity_analysis(df: pd.DataFrame):
     """Create advanced severity analysis visualizations."""
@@ -506,16 +1348,20 @@ def create_advanced_severity_analysis(df: pd.DataFrame):
         
         heatmap_data = prepare_severity_speed_heatmap(df)
         if not heatmap_data.empty:
-            fig = px.imshow(
-                heatmap_data.values,
-                labels=dict(x="Severity", y="Speed Limit (mph)", color="Percentage"),
-                x=heatmap_data.columns,
-                y=heatmap_data.index,
-                title="Accident Severity by Speed Limit (%)",
-                color_continuous_scale="Reds"
-            )
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, width='stretch')
+            speed_intervals = prepare_severity_intervals(df, bin_column(df, 'speed_band'), interval_resamples())
+            def build(data) -> go.Figure:
+                heatmap_data, speed_intervals = data
+                fig = px.imshow(
+                    heatmap_data.values,
+                    labels=dict(x="Severity", y="Speed Limit (mph)", color="Percentage"),
+                    x=heatmap_data.columns,
+                    y=heatmap_data.index,
+                    title="Accident Severity by Speed Limit (%)",
+                    color_continuous_scale="Reds"
+                )
+                fig.update_layout(height=400)
+                return add_rate_intervals(fig, speed_intervals)
+            plot_cached("advanced_severity/speed_heatmap", (heatmap_data, speed_intervals), build, width='stretch')
         else:
             st.info("Insufficient data for speed limit vs severity analysis")
     
@@ -525,15 +1371,17 @@ def create_advanced_severity_analysis(df: pd.DataFrame):
         
         severity_trends = prepare_severity_trends_data(df)
         if not severity_trends.empty:
-            fig = px.area(
-                severity_trends,
-                x='year',
-                y=['Slight', 'Serious', 'Fatal'],
-                title="Accident Severity Trends by Year",
-                labels={'value': 'Number of Accidents', 'year': 'Year'}
-            )
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, width='stretch')
+            def build(severity_trends) -> go.Figure:
+                fig = px.area(
+                    severity_trends,
+                    x='year',
+                    y=['Slight', 'Serious', 'Fatal'],
+                    title="Accident Severity Trends by Year",
+                    labels={'value': 'Number of Accidents', 'year': 'Year'}
+                )
+                fig.update_layout(height=400)
+                return fig
+            plot_cached("advanced_severity/trends", severity_trends, build, width='stretch')
         else:
             st.info("Insufficient data for severity trends analysis")
 
@@ -541,7 +1389,7 @@ def create_environmental_conditions_analysis(df: pd.DataFrame):
     """Create environmental conditions analysis."""
     st.markdown('<div class="section-header">Environmental Conditions Analysis</div>', unsafe_allow_html=True)
     
-    env_data = prepare_environmental_analysis(df)
+    env_data = prepare_environmental_analysis(df, n_resamples=interval_resamples())
     
     col1, col2 = st.columns(2)
     
@@ -550,17 +1398,20 @@ def create_environmental_conditions_analysis(df: pd.DataFrame):
         st.markdown("**Analysis:** Reveals which weather conditions lead to more severe accidents. Poor weather often increases accident severity.")
         
         if 'weather_severity' in env_data:
-            weather_data = env_data['weather_severity']
-            fig = px.bar(
-                weather_data.reset_index(),
-                x='weather_conditions',
-                y=['Slight', 'Serious', 'Fatal'],
-                title="Accident Severity by Weather Conditions (%)",
-                labels={'value': 'Percentage', 'weather_conditions': 'Weather Conditions'},
-                barmode='stack'
-            )
-            fig.update_layout(height=400, xaxis_tickangle=45)
-            st.plotly_chart(fig, width='stretch')
+            weather_data = env_data['weather_severity'], env_data['weather_severity_intervals']
+            def build(data) -> go.Figure:
+                weather_data, weather_intervals = data
+                fig = px.bar(
+                    weather_data.reset_index(),
+                    x='weather_conditions',
+                    y=['Slight', 'Serious', 'Fatal'],
+                    title="Accident Severity by Weather Conditions (%)",
+                    labels={'value': 'Percentage', 'weather_conditions': 'Weather Conditions'},
+                    barmode='stack'
+                )
+                fig.update_layout(height=400, xaxis_tickangle=45)
+                return add_rate_intervals(fig, weather_intervals)
+            plot_cached("environment/weather_severity", weather_data, build, width='stretch')
         else:
             st.info("Weather vs severity data not available")
     
@@ -569,17 +1420,20 @@ def create_environmental_conditions_analysis(df: pd.DataFrame):
         st.markdown("**Analysis:** Compares accident severity between different lighting conditions. Darkness often increases severity risk.")
         
         if 'light_severity' in env_data:
-            light_data = env_data['light_severity']
-            fig = px.imshow(
-                light_data.values,
-                labels=dict(x="Severity", y="Light Conditions", color="Percentage"),
-                x=light_data.columns,
-                y=light_data.index,
-                title="Accident Severity by Light Conditions (%)",
-                color_continuous_scale="Blues"
-            )
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, width='stretch')
+            light_data = env_data['light_severity'], env_data['light_severity_intervals']
+            def build(data) -> go.Figure:
+                light_data, light_intervals = data
+                fig = px.imshow(
+                    light_data.values,
+                    labels=dict(x="Severity", y="Light Conditions", color="Percentage"),
+                    x=light_data.columns,
+                    y=light_data.index,
+                    title="Accident Severity by Light Conditions (%)",
+                    color_continuous_scale="Blues"
+                )
+                fig.update_layout(height=400)
+                return add_rate_intervals(fig, light_intervals)
+            plot_cached("environment/light_severity", light_data, build, width='stretch')
         else:
             st.info("Light conditions vs severity data not available")
     
@@ -589,16 +1443,18 @@ def create_environmental_conditions_analysis(df: pd.DataFrame):
     
     if 'road_type_severity' in env_data:
         road_data = env_data['road_type_severity']
-        fig = px.bar(
-            road_data.reset_index(),
-            x='road_type',
-            y=['Slight', 'Serious', 'Fatal'],
-            title="Accident Count by Road Type and Severity",
-            labels={'value': 'Number of Accidents', 'road_type': 'Road Type'},
-            barmode='group'
-        )
-        fig.update_layout(height=400, xaxis_tickangle=45)
-        st.plotly_chart(fig, width='stretch')
+        def build(road_data) -> go.Figure:
+            fig = px.bar(
+                road_data.reset_index(),
+                x='road_type',
+                y=['Slight', 'Serious', 'Fatal'],
+                title="Accident Count by Road Type and Severity",
+                labels={'value': 'Number of Accidents', 'road_type': 'Road Type'},
+                barmode='group'
+            )
+            fig.update_layout(height=400, xaxis_tickangle=45)
+            return fig
+        plot_cached("environment/road_type_severity", road_data, build, width='stretch')
     else:
         st.info("Road type vs severity data not available")
 
@@ -606,7 +1462,7 @@ def create_temporal_patterns_analysis(df: pd.DataFrame):
     """Create temporal patterns analysis."""
     st.markdown('<div class="section-header">Temporal Patterns Analysis</div>', unsafe_allow_html=True)
     
-    temporal_data = prepare_temporal_analysis(df)
+    temporal_data = prepare_temporal_analysis(df, n_resamples=interval_resamples())
     
     col1, col2 = st.columns(2)
     
@@ -618,16 +1474,18 @@ def create_temporal_patterns_analysis(df: pd.DataFrame):
             hourly_data = temporal_data['hourly']
             
             # Create polar chart for hourly distribution
-            fig = px.line_polar(
-                hourly_data,
-                r='count',
-                theta='hour',
-                line_close=True,
-                title="24-Hour Accident Distribution"
-            )
-            fig.update_traces(fill='toself')
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, width='stretch')
+            def build(hourly_data) -> go.Figure:
+                fig = px.line_polar(
+                    hourly_data,
+                    r='count',
+                    theta='hour',
+                    line_close=True,
+                    title="24-Hour Accident Distribution"
+                )
+                fig.update_traces(fill='toself')
+                fig.update_layout(height=400)
+                return fig
+            plot_cached("temporal_patterns/hourly", hourly_data, build, width='stretch')
         else:
             st.info("Hourly distribution data not available")
     
@@ -636,17 +1494,20 @@ def create_temporal_patterns_analysis(df: pd.DataFrame):
         st.markdown("**Analysis:** Compares accident severity patterns between weekdays and weekends. Different activity patterns can affect severity.")
         
         if 'weekend_vs_weekday' in temporal_data:
-            weekend_data = temporal_data['weekend_vs_weekday'].reset_index()
-            fig = px.bar(
-                weekend_data,
-                x='day_type',
-                y=['Slight', 'Serious', 'Fatal'],
-                title="Accident Severity: Weekday vs Weekend (%)",
-                labels={'value': 'Percentage', 'day_type': 'Day Type'},
-                barmode='group'
-            )
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, width="stretch")
+            weekend_data = temporal_data['weekend_vs_weekday'].reset_index(), temporal_data['weekend_vs_weekday_intervals']
+            def build(data) -> go.Figure:
+                weekend_data, weekend_intervals = data
+                fig = px.bar(
+                    weekend_data,
+                    x='day_type',
+                    y=['Slight', 'Serious', 'Fatal'],
+                    title="Accident Severity: Weekday vs Weekend (%)",
+                    labels={'value': 'Percentage', 'day_type': 'Day Type'},
+                    barmode='group'
+                )
+                fig.update_layout(height=400)
+                return add_rate_intervals(fig, weekend_intervals, error_bars=True)
+            plot_cached("temporal_patterns/weekend", weekend_data, build, width="stretch")
         else:
             st.info("Weekday vs weekend data not available")
     
@@ -656,32 +1517,34 @@ def create_temporal_patterns_analysis(df: pd.DataFrame):
     
     if 'monthly_trends' in temporal_data:
         monthly_data = temporal_data['monthly_trends']
-        fig = go.Figure()
+        def build(monthly_data) -> go.Figure:
+            fig = go.Figure()
         
-        fig.add_trace(go.Scatter(
-            x=monthly_data['month'],
-            y=monthly_data['count'],
-            mode='lines',
-            name='Monthly Accidents',
-            line=dict(width=1, color='lightblue'),
-            opacity=0.6
-        ))
+            fig.add_trace(go.Scatter(
+                x=monthly_data['month'],
+                y=monthly_data['count'],
+                mode='lines',
+                name='Monthly Accidents',
+                line=dict(width=1, color='lightblue'),
+                opacity=0.6
+            ))
         
-        fig.add_trace(go.Scatter(
-            x=monthly_data['month'],
-            y=monthly_data['rolling_avg'],
-            mode='lines',
-            name='3-Month Rolling Average',
-            line=dict(width=3, color='darkblue')
-        ))
+            fig.add_trace(go.Scatter(
+                x=monthly_data['month'],
+                y=monthly_data['rolling_avg'],
+                mode='lines',
+                name='3-Month Rolling Average',
+                line=dict(width=3, color='darkblue')
+            ))
         
-        fig.update_layout(
-            title="Monthly Accident Trends with Rolling Average",
-            xaxis_title="Month",
-            yaxis_title="Number of Accidents",
-            height=400
-        )
-        st.plotly_chart(fig, width='stretch')
+            fig.update_layout(
+                title="Monthly Accident Trends with Rolling Average",
+                xaxis_title="Month",
+                yaxis_title="Number of Accidents",
+                height=400
+            )
+            return compact_figure(fig)
+        plot_cached("temporal_patterns/monthly", monthly_data, build, width='stretch')
     else:
         st.info("Monthly trends data not available")
 
@@ -689,7 +1552,7 @@ def create_demographics_analysis(df: pd.DataFrame):
     """Create demographics analysis."""
     st.markdown('<div class="section-header">Demographics Analysis</div>', unsafe_allow_html=True)
     
-    demo_data = prepare_demographic_severity_analysis(df)
+    demo_data = prepare_demographic_severity_analysis(df, n_resamples=interval_resamples())
     
     col1, col2 = st.columns(2)
     
@@ -698,17 +1561,20 @@ def create_demographics_analysis(df: pd.DataFrame):
         st.markdown("**Analysis:** Heat map showing severity risk by age group. Young and elderly cyclists may show different risk patterns.")
         
         if 'age_severity_heatmap' in demo_data:
-            age_data = demo_data['age_severity_heatmap']
-            fig = px.imshow(
-                age_data.values,
-                labels=dict(x="Severity", y="Age Group", color="Percentage"),
-                x=age_data.columns,
-                y=age_data.index,
-                title="Accident Severity by Age Group (%)",
-                color_continuous_scale="Oranges"
-            )
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, width='stretch')
+            age_data = demo_data['age_severity_heatmap'], demo_data['age_severity_heatmap_intervals']
+            def build(data) -> go.Figure:
+                age_data, age_intervals = data
+                fig = px.imshow(
+                    age_data.values,
+                    labels=dict(x="Severity", y="Age Group", color="Percentage"),
+                    x=age_data.columns,
+                    y=age_data.index,
+                    title="Accident Severity by Age Group (%)",
+                    color_continuous_scale="Oranges"
+                )
+                fig.update_layout(height=400)
+                return add_rate_intervals(fig, age_intervals)
+            plot_cached("demographics_analysis/age_severity", age_data, build, width='stretch')
         else:
             st.info("Age vs severity data not available")
     
@@ -718,16 +1584,18 @@ def create_demographics_analysis(df: pd.DataFrame):
         
         if 'gender_road_conditions' in demo_data:
             gender_data = demo_data['gender_road_conditions']
-            fig = px.bar(
-                gender_data.reset_index(),
-                x='gender',
-                y=gender_data.columns,
-                title="Road Conditions by Gender (%)",
-                labels={'value': 'Percentage', 'gender': 'Gender'},
-                barmode='group'
-            )
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, width='stretch')
+            def build(gender_data) -> go.Figure:
+                fig = px.bar(
+                    gender_data.reset_index(),
+                    x='gender',
+                    y=gender_data.columns,
+                    title="Road Conditions by Gender (%)",
+                    labels={'value': 'Percentage', 'gender': 'Gender'},
+                    barmode='group'
+                )
+                fig.update_layout(height=400)
+                return fig
+            plot_cached("demographics_analysis/gender_road", gender_data, build, width='stretch')
         else:
             st.info("Gender vs road conditions data not available")
     
@@ -737,20 +1605,22 @@ def create_demographics_analysis(df: pd.DataFrame):
     
     if 'age_gender_time' in demo_data:
         time_data = demo_data['age_gender_time']
-        fig = px.line(
-            time_data,
-            x='hour',
-            y='count',
-            color='gender',
-            title="Accident Timing by Gender",
-            labels={'count': 'Number of Accidents', 'hour': 'Hour of Day'}
-        )
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, width='stretch')
+        def build(time_data) -> go.Figure:
+            fig = px.line(
+                time_data,
+                x='hour',
+                y='count',
+                color='gender',
+                title="Accident Timing by Gender",
+                labels={'count': 'Number of Accidents', 'hour': 'Hour of Day'}
+            )
+            fig.update_layout(height=400)
+            return compact_figure(fig)
+        plot_cached("demographics_analysis/time_by_gender", time_data, build, width='stretch')
     else:
         st.info("Time patterns by gender data not available")
 
-def create_multidimensional_analysis(df: pd.DataFrame):
+def create_multidimensional_analysis(df: pd.DataFrame, data: Optional[Dataset] = None):
     """Create multi-dimensional analysis."""
     st.markdown('<div class="section-header">Multi-Dimensional Analysis</div>', unsafe_allow_html=True)
     
@@ -762,17 +1632,19 @@ def create_multidimensional_analysis(df: pd.DataFrame):
         
         corr_data = calculate_correlation_matrix(df)
         if not corr_data.empty:
-            fig = px.imshow(
-                corr_data.values,
-                labels=dict(x="Variables", y="Variables", color="Correlation"),
-                x=corr_data.columns,
-                y=corr_data.index,
-                title="Correlation Matrix of Key Variables",
-                color_continuous_scale="RdBu",
-                range_color=[-1, 1]
-            )
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, width='stretch')
+            def build(corr_data) -> go.Figure:
+                fig = px.imshow(
+                    corr_data.values,
+                    labels=dict(x="Variables", y="Variables", color="Correlation"),
+                    x=corr_data.columns,
+                    y=corr_data.index,
+                    title="Correlation Matrix of Key Variables",
+                    color_continuous_scale="RdBu",
+                    range_color=[-1, 1]
+                )
+                fig.update_layout(height=400)
+                return fig
+            plot_cached("multidimensional/correlation", corr_data, build, width='stretch')
         else:
             st.info("Correlation matrix data not available")
     
@@ -782,27 +1654,29 @@ def create_multidimensional_analysis(df: pd.DataFrame):
         
         sankey_data = create_sankey_data(df)
         if sankey_data and len(sankey_data.get('nodes', [])) > 0:
-            fig = go.Figure(data=[go.Sankey(
-                node=dict(
-                    pad=15,
-                    thickness=20,
-                    line=dict(color="black", width=0.5),
-                    label=sankey_data['nodes'],
-                    color="blue"
-                ),
-                link=dict(
-                    source=sankey_data['sources'],
-                    target=sankey_data['targets'],
-                    value=sankey_data['values']
-                )
-            )])
+            def build(sankey_data) -> go.Figure:
+                fig = go.Figure(data=[go.Sankey(
+                    node=dict(
+                        pad=15,
+                        thickness=20,
+                        line=dict(color="black", width=0.5),
+                        label=sankey_data['nodes'],
+                        color="blue"
+                    ),
+                    link=dict(
+                        source=sankey_data['sources'],
+                        target=sankey_data['targets'],
+                        value=sankey_data['values']
+                    )
+                )])
             
-            fig.update_layout(
-                title_text="Accident Flow: Road Type → Weather → Severity",
-                font_size=10,
-                height=400
-            )
-            st.plotly_chart(fig, width='stretch')
+                fig.update_layout(
+                    title_text="Accident Flow: Road Type → Weather → Severity",
+                    font_size=10,
+                    height=400
+                )
+                return fig
+            plot_cached("multidimensional/sankey", sankey_data, build, width='stretch')
         else:
             st.info("Insufficient data for accident flow analysis")
     
@@ -812,59 +1686,112 @@ def create_multidimensional_analysis(df: pd.DataFrame):
     
     # Create a risk score analysis
     if all(col in df.columns for col in ['speed_limit', 'severity_numeric', 'number_of_casualties']):
-        df_risk = df.copy()
-        df_risk = df_risk.dropna(subset=['speed_limit'])
-        
-        # Create risk categories
-        speed_bins = [0, 30, 50, 70, 100]
-        speed_labels = ['Low Speed (≤30)', 'Medium Speed (31-50)', 'High Speed (51-70)', 'Very High Speed (>70)']
+        # Risk categories (BIN_SCHEMES['speed_category']), stored by preprocess()
+        speed_category = bin_column(df, 'speed_category')
         
         try:
-            df_risk['speed_category'] = pd.cut(df_risk['speed_limit'], bins=speed_bins, labels=speed_labels, include_lowest=True)
-            
-            risk_analysis = df_risk.groupby('speed_category').agg({
+            risk_analysis = df.groupby(speed_category, observed=True).agg({
                 'severity_numeric': 'mean',
                 'number_of_casualties': 'mean',
-                'accident_index': 'count'
+                'accident_id': 'count'
             }).round(2)
             
             risk_analysis.columns = ['Avg Severity Score', 'Avg Casualties', 'Total Accidents']
             
-            fig = make_subplots(specs=[[{"secondary_y": True}]])
-            
-            fig.add_trace(
-                go.Bar(
-                    x=risk_analysis.index,
-                    y=risk_analysis['Total Accidents'],
-                    name="Total Accidents",
-                    marker_color='lightblue'
-                ),
-                secondary_y=False
-            )
+            def build(risk_analysis) -> go.Figure:
+                fig = make_subplots(specs=[[{"secondary_y": True}]])
             
-            fig.add_trace(
-                go.Scatter(
-                    x=risk_analysis.index,
-                    y=risk_analysis['Avg Severity Score'],
-                    mode='lines+markers',
-                    name="Avg Severity Score",
-                    line=dict(color='red', width=3),
-                    marker=dict(size=8)
-                ),
-                secondary_y=True
-            )
+                fig.add_trace(
+                    go.Bar(
+                        x=risk_analysis.index,
+                        y=risk_analysis['Total Accidents'],
+                        name="Total Accidents",
+                        marker_color='lightblue'
+                    ),
+                    secondary_y=False
+                )
             
-            fig.update_xaxes(title_text="Speed Category")
-            fig.update_yaxes(title_text="Number of Accidents", secondary_y=False)
-            fig.update_yaxes(title_text="Average Severity Score", secondary_y=True)
-            fig.update_layout(title_text="Risk Analysis by Speed Category", height=400)
+                fig.add_trace(
+                    go.Scatter(
+                        x=risk_analysis.index,
+                        y=risk_analysis['Avg Severity Score'],
+                        mode='lines+markers',
+                        name="Avg Severity Score",
+                        line=dict(color='red', width=3),
+                        marker=dict(size=8)
+                    ),
+                    secondary_y=True
+                )
             
-            st.plotly_chart(fig, width='stretch')
+                fig.update_xaxes(title_text="Speed Category")
+                fig.update_yaxes(title_text="Number of Accidents", secondary_y=False)
+                fig.update_yaxes(title_text="Average Severity Score", secondary_y=True)
+                fig.update_layout(title_text="Risk Analysis by Speed Category", height=400)
+                return fig
+            plot_cached("multidimensional/risk", risk_analysis, build, width='stretch')
         except Exception as e:
             st.info("Risk factor analysis not available due to data limitations")
+    
+    create_risk_model_analysis(df, data)
 
-def main():
-    """Main dashboard application."""
+def create_risk_model_analysis(df: pd.DataFrame, data: Optional[Dataset] = None):
+    """
+    Create the severity risk model view: predicted against observed severity
+    by segment of the current selection.
+    
+    For views of the dashboard tables the model is trained once per dataset
+    and every cyclist scored once (load_risk_model); a rerun only gathers
+    the selection's probabilities. Any other frame gets a model of its own.
+    """
+    st.subheader("Severity Risk Model")
+    st.markdown("**Analysis:** A multinomial logistic model of each cyclist's severity from road, weather and light "
+                "conditions, age, gender, speed limit and time. Segments where observed severity departs from the "
+                "prediction are riskier (or safer) than their conditions alone explain.")
+    
+    if 'severity' not in df.columns or df.empty:
+        st.info("Severity risk model not available")
+        return
+    if data is not None and ACCIDENT_ID in df.columns:
+        risk = load_risk_model(data.key, data.accidents, data.cyclists)
+        model, proba = risk['model'], risk['proba'][df.index.to_numpy()]
+    else:
+        model = fit_frame(df)
+        proba = model.predict_proba(df)
+    
+    col1, col2 = st.columns([1, 2])
+    segments = list(feature_columns(df, model.features))
+    by = col1.selectbox("Segment by", segments, key="risk_model_segment",
+                        format_func=lambda f: SLICE_LABELS.get(f, f.replace('_', ' ').title()))
+    severity = col1.radio("Severity", SEVERITY_CLASSES[1:], index=1, key="risk_model_severity", horizontal=True)
+    
+    calibration = severity_calibration(df, proba, by)[['rows', f'observed_{severity}', f'predicted_{severity}']]
+    def build(calibration) -> go.Figure:
+        _, observed, predicted = calibration.columns
+        labels = calibration.index.astype(str)
+        fig = go.Figure([
+            go.Bar(x=labels, y=calibration[observed], name="Observed", marker_color='indianred',
+                   customdata=calibration['rows'], hovertemplate="%{x}: %{y:.2f}% of %{customdata:,} cyclists"),
+            go.Bar(x=labels, y=calibration[predicted], name="Predicted", marker_color='lightslategray',
+                   hovertemplate="%{x}: %{y:.2f}%")
+        ])
+        fig.update_layout(title=f"{observed.split('_')[1]} Share: Observed vs Predicted", barmode='group',
+                          xaxis_title=calibration.index.name.replace('_', ' ').title(),
+                          yaxis_title="Cyclists (%)", height=400)
+        return fig
+    with col2:
+        plot_cached("multidimensional/risk_model", calibration, build, width='stretch')
+    
+    ratios = odds_ratios(model, severity)
+    with col1:
+        st.write(f"**Odds of {severity} vs Slight** (against each factor's most common level)")
+        st.dataframe(ratios[ratios['feature'] == by].drop(columns='feature').round({'odds_ratio': 2}),
+                     width='stretch', hide_index=True)
+    metrics = model.metrics
+    st.caption(f"Trained on {metrics['rows']:,} cyclists; log loss {metrics['log_loss']:.4f} against "
+               f"{metrics['baseline_log_loss']:.4f} for the overall severity shares alone.")
+
+def render_dashboard(profiler: RerunProfiler):
+    """Render the dashboard, timing its sections with the given profiler."""
     # Title and description
     st.markdown('<div class="main-header">🚴‍♂️ Great Britain Bicycle Accidents Dashboard (1979-2018)</div>', unsafe_allow_html=True)
     
@@ -875,60 +1802,138 @@ def main():
     """)
     
     # Load data
-    with st.spinner("Loading data..."):
-        df = load_data()
+    with profiler.section("load_data", cache_name="load_data") as section:
+        with st.spinner("Loading data..."):
+            data_key = data_version()
+            accidents, cyclists = load_data(data_key)
+        section['rows'] = len(accidents)
+    data = Dataset(accidents, cyclists, data_key)
     
     # Get unique values for filters
-    unique_values = get_unique_values_for_filters(df)
+    unique_values = {**get_unique_values_for_filters(accidents), **get_unique_values_for_filters(cyclists)}
     
     # Create sidebar filters
-    filters = create_sidebar_filters(df, unique_values)
+    filters = create_sidebar_filters(accidents, unique_values)
+    profiler.set_context(filters=filters)
+    
+    # Apply filters to each table at its own grain. Results are cached by
+    # filter state, and states next to this one are precomputed in the
+    # background, so the next nudge of a filter is usually a cache hit.
+    # Comparison mode: a second filter set, and both cohorts computed in one
+    # pass instead of rendering two full dashboards
+    compare = st.sidebar.toggle(
+        "Compare two cohorts",
+        value=False,
+        help="Add a second filter set and show both cohorts side by side"
+    )
+    if compare:
+        filters_b = create_sidebar_filters(accidents, unique_values, key="cohort_b", header=" Cohort B Filters")
+        profiler.set_context(filters_b=filters_b)
+        labels = ("Cohort A", "Cohort B")
+        with profiler.section("compare_cohorts", rows=len(accidents) + len(cyclists)):
+            comparison = compare_cohorts(
+                accidents, cyclists,
+                cohort_masks(accidents, cyclists, data_key, filters, 'filter_engines'),
+                cohort_masks(accidents, cyclists, data_key, filters_b, 'filter_engines_b'),
+                labels=labels
+            )
+        display_comparison(comparison, labels)
+        return
     
-    # Apply filters to data
-    filtered_df = filter_dataframe(df, **filters)
+    approximate = st.sidebar.toggle(
+        "Approximate mode",
+        value=False,
+        help="Show estimates from a stratified sample straight away, then replace them with exact results"
+    )
+    st.sidebar.toggle(
+        "Bootstrap intervals",
+        value=False,
+        key="bootstrap_intervals",
+        help=f"Add percentile bootstrap intervals ({BOOTSTRAP_RESAMPLES:,} resamples) to the 95% Wilson "
+             "intervals shown when hovering severity-rate charts"
+    )
+    get_prefetcher().cancel(session_token())  # the user has moved on; stop the previous batch
+    
+    # In approximate mode, a filter state that is not cached yet first shows
+    # sample estimates; they are replaced once the exact results below are ready
+    kpi_slot = st.empty()
+    if approximate and data_key + (filter_key(filters),) not in get_result_cache():
+        with profiler.section("approximate_results", cache_name="load_samples") as section:
+            samples = load_samples(data_key)
+            estimate = approximate_results(samples, filters) if samples else None
+            section['sample_rate'] = estimate['rate'] if estimate else None
+        if not samples:
+            st.sidebar.caption("No samples found; run main.py to build them.")
+        elif estimate is not None:
+            with kpi_slot.container():
+                display_estimates(estimate)
+    
+    with profiler.section("filter_results", rows=len(accidents) + len(cyclists)) as section:
+        result, hit = get_result_cache().get_or_compute(
+            data_key + (filter_key(filters),),
+            lambda: compute_filter_result(accidents, cyclists, filters,
+                                          session_filter_engines(accidents, cyclists, data_key))
+        )
+        filtered_accidents = accidents.iloc[result['accidents']]
+        filtered_cyclists = cyclists.iloc[result['cyclists']]
+        section['cache'] = 'hit' if hit else 'miss'
+        section['rows_out'] = len(filtered_accidents)
+    if not hit and get_session_value('filter_engines') is not None:
+        set_session_value('filter_engines', get_session_value('filter_engines'))  # re-account the updated masks
+    prefetch_adjacent_states(accidents, cyclists, filters, unique_values, data_key)
     
     # Check if filtered data is empty
-    if len(filtered_df) == 0:
+    if len(filtered_accidents) == 0:
+        kpi_slot.empty()
         st.warning("No data matches the current filters. Please adjust your selections.")
         return
     
-    # Calculate and display KPIs
-    kpis = calculate_kpis(filtered_df)
-    display_kpis(kpis)
+    with kpi_slot.container():
+        display_kpis(result['kpis'])
+    
+    # Sections that need cyclist columns (severity, gender, age) get one row
+    # per cyclist; accident-level sections use the accident table directly
+    with profiler.section("join_cyclists", rows=len(filtered_cyclists)):
+        filtered_df = join_cyclists(accidents, filtered_cyclists)
     
     # Create tabs for different analysis sections
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
         "Time Trends", 
         "Severity", 
         "Demographics", 
         "Conditions", 
         "Advanced Analysis",
+        "Linked Charts",
         "Data Explorer"
     ])
     
     with tab1:
-        create_time_series_chart(filtered_df)
-        create_temporal_analysis(filtered_df)
+        run_section(profiler, "Time Trends", create_time_series_chart, filtered_accidents)
+        run_section(profiler, "Time Trends", create_temporal_analysis, filtered_accidents)
+        run_section(profiler, "Time Trends", create_trend_forecasts, filtered_accidents, data=data)
     
     with tab2:
-        create_severity_charts(filtered_df)
+        run_section(profiler, "Severity", create_severity_charts, filtered_df)
     
     with tab3:
-        create_demographic_charts(filtered_df)
+        run_section(profiler, "Demographics", create_demographic_charts, filtered_df)
     
     with tab4:
-        create_conditions_analysis(filtered_df)
+        run_section(profiler, "Conditions", create_conditions_analysis, filtered_accidents)
     
     with tab5:
         # Advanced Analysis Tab
-        create_advanced_severity_analysis(filtered_df)
-        create_environmental_conditions_analysis(filtered_df)
-        create_temporal_patterns_analysis(filtered_df)
-        create_demographics_analysis(filtered_df)
-        create_multidimensional_analysis(filtered_df)
+        run_section(profiler, "Advanced Analysis", create_advanced_severity_analysis, filtered_df)
+        run_section(profiler, "Advanced Analysis", create_environmental_conditions_analysis, filtered_df)
+        run_section(profiler, "Advanced Analysis", create_temporal_patterns_analysis, filtered_df)
+        run_section(profiler, "Advanced Analysis", create_demographics_analysis, filtered_df)
+        run_section(profiler, "Advanced Analysis", create_multidimensional_analysis, filtered_df, data=data)
     
     with tab6:
-        create_data_explorer(filtered_df)
+        run_section(profiler, "Linked Charts", create_crossfilter_charts, filtered_accidents, data=data)
+    
+    with tab7:
+        run_section(profiler, "Data Explorer", create_data_explorer, filtered_df, data=data)
     
     # Footer
     st.markdown("---")
@@ -937,5 +1942,17 @@ def main():
     **Tech Stack:** Streamlit, Plotly, Pandas
 """)
 
+def main():
+    """Main dashboard application."""
+    profiler = get_profiler()
+    profiler.start_rerun(profile_allocations=st.session_state.pop('profile_allocations', False))
+    try:
+        render_dashboard(profiler)
+    finally:
+        rerun = profiler.finish_rerun()
+    
+    if rerun:
+        display_perf_panel(profiler, rerun)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,325 @@
+# benchmark.py
+"""
+Benchmark suite for the ETL pipeline, dashboard helpers and dashboard sections.
+
+Synthetic Accidents/Bikers CSVs are generated at each requested scale, then
+every ETL stage, every src.dashboard_utils function and every create_*
+section of app.py is timed. Results are appended to a JSON history and
+compared with the previous run to flag regressions.
+
+Usage:
+    python benchmark.py --scales 100k 1M
+    python benchmark.py --scales 10M --suites etl --threshold 0.3
+"""
+import os
+import sys
+import argparse
+import inspect
+import tempfile
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src import dashboard_utils, eda, intervals
+from src.etl import load_csv, load_accidents_bikers, intern_accident_index, iter_merged_batches, merge_frames, merge_accidents_bikers
+from src.preprocessing import (
+    preprocess, preprocess_to_tables, normalise, save_tables, save_parquet, table_paths, compare_tables
+)
+from src.utils import load_parquet
+from src.perf import MB, measure, new_run, load_history, append_history, find_regressions, allocation_profiling
+from src.sampling import stratified_sample, filter_mask, estimate_kpis
+from src.risk_model import train_risk_model, score_tables
+from src.synthetic import parse_scale, ensure_synthetic_csvs
+
+DEFAULT_SCALES = ['100k', '1M', '10M', '50M']
+SUITES = ['etl', 'dashboard', 'app']
+
+# Representative sidebar selection: a year window plus a few narrowed multiselects
+SAMPLE_FILTERS = {
+    'year_range': (1990, 2010),
+    'severity': ['Slight', 'Serious', 'Fatal'],
+    'gender': ['Male', 'Female'],
+    'road_conditions': ['Dry', 'Wet']
+}
+
+_TABLES: Dict[int, Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]] = {}
+
+
+def tables(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Accident table, cyclist table and accident_index dictionary, normalised once per frame."""
+    if id(df) not in _TABLES:
+        _TABLES.clear()
+        _TABLES[id(df)] = normalise(df)
+    return _TABLES[id(df)]
+
+
+# Second cohort for compare_cohorts: the 1980s
+COHORT_B_FILTERS = {'year_range': (1980, 1989)}
+
+
+def cohort_masks(df: pd.DataFrame, filters: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """(accident mask, cyclist mask) of the tables of df under filters."""
+    accidents, cyclists = tables(df)[:2]
+    filtered_accidents, filtered_cyclists = dashboard_utils.filter_tables(accidents, cyclists, **filters)
+    accident_mask = np.zeros(len(accidents), dtype=bool)
+    accident_mask[filtered_accidents.index] = True
+    cyclist_mask = np.zeros(len(cyclists), dtype=bool)
+    cyclist_mask[filtered_cyclists.index] = True
+    return accident_mask, cyclist_mask
+
+
+def filter_then_nudge(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """SAMPLE_FILTERS through fresh IncrementalFilter engines, then the same with one more year."""
+    accidents, cyclists = tables(df)[:2]
+    engines = (
+        dashboard_utils.IncrementalFilter(len(accidents), dashboard_utils.build_value_index(accidents)),
+        dashboard_utils.IncrementalFilter(len(cyclists), dashboard_utils.build_value_index(cyclists))
+    )
+    dashboard_utils.filter_tables_incremental(accidents, cyclists, engines, **SAMPLE_FILTERS)
+    nudged = {**SAMPLE_FILTERS, 'year_range': (1990, 2011)}
+    return dashboard_utils.filter_tables_incremental(accidents, cyclists, engines, **nudged)
+
+
+# Arguments for each dashboard_utils function, given the preprocessed frame
+DASHBOARD_CASES: Dict[str, Callable[[pd.DataFrame], Any]] = {
+    'filter_dataframe': lambda df: dashboard_utils.filter_dataframe(df, **SAMPLE_FILTERS),
+    'filter_tables': lambda df: dashboard_utils.filter_tables(*tables(df)[:2], **SAMPLE_FILTERS),
+    'build_value_index': lambda df: dashboard_utils.build_value_index(tables(df)[0]),
+    'filter_tables_incremental': filter_then_nudge,
+    'semijoin_masks': lambda df: dashboard_utils.semijoin_masks(
+        *cohort_masks(df, SAMPLE_FILTERS), tables(df)[1]['accident_id'].to_numpy()
+    ),
+    'compare_cohorts': lambda df: dashboard_utils.compare_cohorts(
+        *tables(df)[:2], cohort_masks(df, SAMPLE_FILTERS), cohort_masks(df, COHORT_B_FILTERS)
+    ),
+    'join_cyclists': lambda df: dashboard_utils.join_cyclists(*tables(df)[:2]),
+    'calculate_kpis': lambda df: dashboard_utils.calculate_kpis(*tables(df)[:2]),
+    'count_unique_accidents': lambda df: dashboard_utils.count_unique_accidents(tables(df)[1]),
+    'decode_accident_index': lambda df: dashboard_utils.decode_accident_index(tables(df)[0].head(100), tables(df)[2]),
+    'build_sort_permutation': lambda df: dashboard_utils.build_sort_permutation(df, 'date'),
+    'view_order': lambda df: dashboard_utils.view_order(
+        dashboard_utils.build_sort_permutation(df, 'date')[0], np.arange(0, len(df), 2)
+    ),
+    'build_accident_lookup': lambda df: dashboard_utils.build_accident_lookup(tables(df)[2]),
+    'search_rows': lambda df: dashboard_utils.search_rows(df, 'wet'),
+    'build_dimension_codes': lambda df: dashboard_utils.build_dimension_codes(tables(df)[0]),
+    'build_count_cube': lambda df: dashboard_utils.build_count_cube(dashboard_utils.build_dimension_codes(tables(df)[0])),
+    'slice_cube': lambda df: dashboard_utils.slice_cube(
+        dashboard_utils.build_count_cube(dashboard_utils.build_dimension_codes(tables(df)[0])),
+        dashboard_utils.CROSSFILTER_DIMENSIONS,
+        {'hour': np.arange(24) >= 17}
+    ),
+    'data_fingerprint': lambda df: dashboard_utils.data_fingerprint(df),
+    'group_rare_categories': lambda df: dashboard_utils.group_rare_categories(df['weather_conditions'], min_count=500),
+    'prepare_time_series_data': lambda df: [
+        dashboard_utils.prepare_time_series_data(df, freq) for freq in ('year', 'month', 'day_of_week')
+    ],
+    'prepare_stacked_bar_data': lambda df: dashboard_utils.prepare_stacked_bar_data(df, 'age_grp', 'severity'),
+    'prepare_correlation_data': lambda df: dashboard_utils.prepare_correlation_data(df),
+    'get_top_categories': lambda df: dashboard_utils.get_top_categories(df, 'road_type'),
+    'severity_counts': lambda df: dashboard_utils.severity_counts(df, 'weather_conditions'),
+    'severity_percentages': lambda df: dashboard_utils.severity_percentages(
+        dashboard_utils.severity_counts(df, 'weather_conditions')
+    ),
+    'prepare_severity_analysis': lambda df: dashboard_utils.prepare_severity_analysis(df, 'weather_conditions'),
+    'prepare_severity_intervals': lambda df: dashboard_utils.prepare_severity_intervals(
+        df, 'age_grp', n_resamples=intervals.BOOTSTRAP_RESAMPLES
+    ),
+    'format_large_numbers': lambda df: dashboard_utils.format_large_numbers(len(df)),
+    'get_unique_values_for_filters': lambda df: dashboard_utils.get_unique_values_for_filters(df),
+    'calculate_accident_rates': lambda df: dashboard_utils.calculate_accident_rates(df, 'gender'),
+    'extract_hour_from_time': lambda df: dashboard_utils.extract_hour_from_time(df),
+    'prepare_severity_speed_heatmap': lambda df: dashboard_utils.prepare_severity_speed_heatmap(df),
+    'prepare_temporal_analysis': lambda df: dashboard_utils.prepare_temporal_analysis(df),
+    'prepare_demographic_severity_analysis': lambda df: dashboard_utils.prepare_demographic_severity_analysis(df),
+    'calculate_correlation_matrix': lambda df: dashboard_utils.calculate_correlation_matrix(df),
+    'prepare_severity_trends_data': lambda df: dashboard_utils.prepare_severity_trends_data(df),
+    'prepare_environmental_analysis': lambda df: dashboard_utils.prepare_environmental_analysis(df),
+    'create_sankey_data': lambda df: dashboard_utils.create_sankey_data(df),
+}
+
+
+def public_functions(module) -> List[str]:
+    """List the public functions defined in a module."""
+    return [
+        name for name, obj in inspect.getmembers(module, inspect.isfunction)
+        if obj.__module__ == module.__name__ and not name.startswith('_')
+    ]
+
+
+def run_case(run: Dict[str, Any], case: str, rows: int, func: Callable, *args, **kwargs) -> Any:
+    """Measure one case, record it in the run and print a progress line."""
+    try:
+        result, metrics = measure(func, *args, **kwargs)
+    except Exception as e:
+        run['results'].append({'case': case, 'rows': rows, 'error': repr(e)})
+        print(f"  {case:<55} FAILED: {e!r}")
+        return None
+
+    run['results'].append({'case': case, 'rows': rows, **metrics})
+    print(f"  {case:<55} {metrics['wall_time_s']:>10.3f}s {metrics['peak_rss_mb']:>10.1f} MB peak")
+    return result
+
+
+def benchmark_etl(run: Dict[str, Any], rows: int, accidents_path: str, bikers_path: str, work_dir: str) -> pd.DataFrame:
+    """Time every stage of the main.py pipeline and return the preprocessed frame."""
+    accidents = run_case(run, 'etl.load_csv[accidents]', rows, load_csv, accidents_path)
+    bikers = run_case(run, 'etl.load_csv[bikers]', rows, load_csv, bikers_path)
+    run_case(run, 'etl.load_accidents_bikers', rows, load_accidents_bikers, accidents_path, bikers_path)
+    run_case(run, 'etl.merge_frames', rows, merge_frames, accidents, bikers)
+    interned = run_case(run, 'etl.intern_accident_index', rows, intern_accident_index, accidents, bikers)
+    if interned:
+        run_case(run, 'etl.merge_frames[accident_id]', rows, merge_frames, *interned[:2])
+    del interned
+    del accidents, bikers
+
+    df = run_case(run, 'etl.merge_accidents_bikers', rows, merge_accidents_bikers, accidents_path, bikers_path)
+    df_clean = run_case(run, 'preprocessing.preprocess', rows, preprocess, df)
+    del df
+
+    parquet_path = os.path.join(work_dir, "bicycle_accidents.parquet")
+    run_case(run, 'preprocessing.save_parquet', rows, save_parquet, df_clean, parquet_path)
+    run_case(run, 'utils.load_parquet', rows, load_parquet, parquet_path)
+    tables = run_case(run, 'preprocessing.normalise', rows, normalise, df_clean) or (None, None, None)
+    run_case(run, 'preprocessing.save_tables', rows, save_tables, *tables, work_dir)
+    if tables[0] is not None:
+        sample = run_case(run, 'sampling.stratified_sample', rows, stratified_sample, tables[0], tables[1], 0.01)
+        if sample is not None:
+            run_case(run, 'sampling.estimate_kpis', rows, estimate_kpis, sample, filter_mask(sample, SAMPLE_FILTERS))
+        model = run_case(run, 'risk_model.train_risk_model', rows, train_risk_model, *table_paths(work_dir)[:2])
+        if model is not None:
+            run_case(run, 'risk_model.score_tables', rows, score_tables, model, tables[0], tables[1])
+    del tables
+    chunked_dir = os.path.join(work_dir, "chunked")
+    if run_case(run, 'preprocessing.preprocess_to_tables', rows, preprocess_to_tables,
+                iter_merged_batches(accidents_path, bikers_path), chunked_dir) is not None:
+        # --chunked must write the same tables as the in-memory path
+        for difference in compare_tables(work_dir, chunked_dir):
+            print(f"  Chunked output mismatch: {difference}")
+
+    for plot in (eda.accidents_over_time, eda.severity_distribution, eda.accidents_by_gender_age):
+        save_path = os.path.join(work_dir, f"{plot.__name__}.png")
+        run_case(run, f'eda.{plot.__name__}', rows, plot, df_clean, save_path=save_path)
+
+    jobs = run_case(run, 'eda.build_plot_jobs', rows, eda.build_plot_jobs, df_clean, output_dir=work_dir,
+                    per_severity=True, condition_columns=['road_conditions', 'weather_conditions', 'light_conditions'])
+    if jobs:
+        run_case(run, 'eda.render_plots', rows, eda.render_plots, jobs)
+
+    return df_clean
+
+
+def dashboard_cases(df: pd.DataFrame) -> List[Tuple[str, Callable, tuple]]:
+    """Build (case, callable, args) for every public function in src.dashboard_utils."""
+    missing = sorted(set(public_functions(dashboard_utils)) - set(DASHBOARD_CASES))
+    if missing:
+        print(f"  No benchmark case for: {', '.join(missing)}")
+    return [(f'dashboard_utils.{name}', case, (df,)) for name, case in DASHBOARD_CASES.items()]
+
+
+def app_cases(df: pd.DataFrame) -> List[Tuple[str, Callable, tuple]]:
+    """Build (case, callable, args) for every create_* section of app.py."""
+    from streamlit.logger import set_log_level
+    set_log_level('error')  # bare mode warns on every element call
+    # Time figure construction on every repeat rather than figure cache hits
+    os.environ["DASHBOARD_FIGURE_CACHE_ENTRIES"] = "0"
+    import app
+    set_log_level('error')  # again for the loggers created by the import
+
+    filtered_df = dashboard_utils.filter_dataframe(df)
+    unique_values = dashboard_utils.get_unique_values_for_filters(df)
+    cases = [('app.display_kpis', app.display_kpis, (dashboard_utils.calculate_kpis(filtered_df),))]
+    for name in public_functions(app):
+        if name == 'create_sidebar_filters':
+            cases.append((f'app.{name}', getattr(app, name), (df, unique_values)))
+        elif name.startswith('create_'):
+            cases.append((f'app.{name}', getattr(app, name), (filtered_df,)))
+    return cases
+
+
+def profile_allocations(run: Dict[str, Any], rows: int, cases: List[Tuple[str, Callable, tuple]]):
+    """
+    Re-run cases under tracemalloc, separately from the timed runs, and store
+    each case's peak allocation plus a ranked report of the worst allocators.
+    """
+    peaks = {}
+    with allocation_profiling() as profiler:
+        for case, func, args in cases:
+            try:
+                if case.startswith('dashboard_utils.'):
+                    func(*args)  # already tracked by @track_allocations
+                else:
+                    with profiler.track(case):
+                        func(*args)
+            except Exception as e:
+                print(f"  {case:<55} FAILED under profiling: {e!r}")
+                continue
+            # The outermost record of a call is appended last
+            if profiler.records and profiler.records[-1]['name'] == case:
+                peaks[case] = profiler.records[-1]['peak_bytes']
+
+    for result in run['results']:
+        if result['rows'] == rows and result['case'] in peaks:
+            result['alloc_peak_mb'] = round(peaks[result['case']] / MB, 2)
+    run.setdefault('allocation_reports', {})[str(rows)] = profiler.report(top=50)
+    print(f"\n  Worst allocators at {rows:,} rows:")
+    print("  " + profiler.format_report(top=15).replace("\n", "\n  "))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', nargs='+', default=DEFAULT_SCALES, help="Row counts such as 100k 1M 10M 50M")
+    parser.add_argument('--suites', nargs='+', default=SUITES, choices=SUITES, help="Which groups of cases to run")
+    parser.add_argument('--data-dir', default="data/synthetic", help="Where synthetic CSVs are generated and reused")
+    parser.add_argument('--history', default="processed/benchmark_history.json", help="JSON file runs are appended to")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Relative slowdown flagged as a regression")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--label', help="Free-text label stored with the run, e.g. a git revision")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit with status 1 if regressions are found")
+    parser.add_argument('--profile-allocations', action='store_true',
+                        help="Also profile dashboard and app cases with tracemalloc and rank the worst allocators")
+    args = parser.parse_args(argv)
+
+    run = new_run(args.label)
+    with tempfile.TemporaryDirectory() as work_dir:
+        for scale in args.scales:
+            rows = parse_scale(scale)
+            print(f"\n=== {rows:,} accidents ===")
+            print("Generating synthetic data...")
+            accidents_path, bikers_path = ensure_synthetic_csvs(args.data_dir, rows, args.seed)
+
+            if 'etl' in args.suites:
+                df = benchmark_etl(run, rows, accidents_path, bikers_path, work_dir)
+            else:
+                df = preprocess(merge_accidents_bikers(accidents_path, bikers_path))
+
+            cases = []
+            if 'dashboard' in args.suites:
+                cases += dashboard_cases(df)
+            if 'app' in args.suites:
+                cases += app_cases(df)
+            for case, func, case_args in cases:
+                run_case(run, case, rows, func, *case_args)
+            if args.profile_allocations and cases:
+                profile_allocations(run, rows, cases)
+            del df, cases
+
+    history = load_history(args.history)
+    regressions = find_regressions(run, history, args.threshold)
+    append_history(args.history, run)
+    print(f"\nResults appended to {args.history}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}:")
+        for r in regressions:
+            print(f"  {r['case']} @ {r['rows']:,} rows: {r['previous_s']:.3f}s -> {r['current_s']:.3f}s (x{r['slowdown']})")
+        if args.fail_on_regression:
+            return 1
+    else:
+        print("No regressions against the previous run.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+# loadtest.py
+"""
+Headless load test for the Streamlit dashboard.
+
+Drives app.py with Streamlit's AppTest: each virtual user is an independent
+session that loads the dashboard and then performs scripted interactions
+(moving the year slider, toggling sidebar multiselects, paging the Data
+Explorer). Users run concurrently in threads of one process, sharing the
+Streamlit caches exactly as sessions on one server do. Streamlit renders
+every tab on each rerun, so tab switches need no separate action.
+
+For each concurrency level the harness reports rerun latency percentiles,
+throughput and process memory, and writes a JSON report. Before the levels,
+every single-severity filter is rerun once (check_single_severity()); the
+exit status is 1 if any of those reruns fails.
+
+Usage:
+    python loadtest.py --users 1 2 4 8 --actions 10
+    python loadtest.py --synthetic-rows 1M --users 1 4 16
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from typing import Any, Callable, Dict, List
+
+from src.perf import PeakRSSSampler, MB, environment_info, _percentile
+from src.synthetic import parse_scale, ensure_synthetic_csvs
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def build_synthetic_tables(rows: int, data_dir: str, seed: int = 0) -> str:
+    """Run the ETL on synthetic CSVs and return the directory holding the processed tables."""
+    from src.etl import merge_accidents_bikers
+    from src.preprocessing import preprocess, normalise, save_tables, ACCIDENT_INDEX_FILE
+
+    accidents_path, bikers_path = ensure_synthetic_csvs(data_dir, rows, seed)
+    tables_dir = os.path.dirname(accidents_path)
+    if not os.path.exists(os.path.join(tables_dir, ACCIDENT_INDEX_FILE)):
+        save_tables(*normalise(preprocess(merge_accidents_bikers(accidents_path, bikers_path))), tables_dir)
+    return tables_dir
+
+
+# Scripted interactions. Each takes the session and a random generator,
+# changes one widget and returns a short description of what it did.
+
+def move_year_slider(at, rng: random.Random) -> str:
+    slider = at.sidebar.slider[0]
+    lo, hi = slider.min, slider.max
+    start = rng.randint(lo, hi)
+    end = rng.randint(start, hi)
+    slider.set_value((start, end))
+    return f"year_range={start}-{end}"
+
+
+def toggle_multiselect(at, rng: random.Random) -> str:
+    widget = rng.choice(list(at.sidebar.multiselect))
+    option = rng.choice(widget.options)
+    if option in widget.value and len(widget.value) > 1:
+        widget.unselect(option)
+        return f"unselect {widget.label}={option}"
+    widget.select(option)
+    return f"select {widget.label}={option}"
+
+
+def reset_filters(at, rng: random.Random) -> str:
+    for widget in at.sidebar.multiselect:
+        widget.set_value(widget.options)
+    slider = at.sidebar.slider[0]
+    slider.set_value((slider.min, slider.max))
+    return "reset filters"
+
+
+def change_explorer_page(at, rng: random.Random) -> str:
+    page = at.number_input[0]
+    value = rng.randint(int(page.min), int(page.max))
+    page.set_value(value)
+    return f"explorer page={value}"
+
+
+def change_rows_per_page(at, rng: random.Random) -> str:
+    widget = at.select_slider[0]
+    value = rng.choice(widget.options)
+    widget.set_value(int(value))
+    return f"rows per page={value}"
+
+
+ACTIONS: List[Callable] = [
+    move_year_slider, toggle_multiselect, toggle_multiselect, toggle_multiselect,
+    change_explorer_page, change_rows_per_page, reset_filters
+]
+
+
+def virtual_user(user_id: int, actions: int, seed: int, timeout: float, samples: List[Dict[str, Any]], lock: threading.Lock):
+    """Run one scripted session, appending a latency sample per rerun."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed * 1000 + user_id)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    for step in range(actions + 1):
+        try:
+            action = "initial load" if step == 0 else rng.choice(ACTIONS)(at, rng)
+        except (IndexError, ValueError) as e:
+            # Widget not rendered in this state (e.g. empty selection)
+            action, at = f"reset after {e!r}", AppTest.from_file(APP_PATH, default_timeout=timeout)
+        start = time.perf_counter()
+        error = None
+        try:
+            at.run()
+            if at.exception:
+                error = at.exception[0].message
+        except Exception as e:
+            error = repr(e)
+        sample = {
+            'user': user_id,
+            'step': step,
+            'action': action,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 2),
+            'error': error
+        }
+        with lock:
+            samples.append(sample)
+
+
+def serialise_script_parsing() -> None:
+    """
+    Parse the script in one thread at a time.
+
+    AppTest compiles the script afresh on every run, and Streamlit's magic
+    pass parses it with ast.parse, which is not thread-safe in CPython 3.11
+    ("AST constructor recursion depth mismatch"). Concurrent users would
+    otherwise record spurious errors. On a server the script is compiled
+    once and cached, so holding a lock here does not skew latencies.
+    """
+    from streamlit.runtime.scriptrunner import magic
+
+    add_magic, lock = magic.add_magic, threading.Lock()
+    if getattr(add_magic, 'serialised', False):
+        return
+
+    def locked_add_magic(code: str, script_path: str) -> Any:
+        with lock:
+            return add_magic(code, script_path)
+
+    locked_add_magic.serialised = True
+    magic.add_magic = locked_add_magic
+
+
+def warm_up(timeout: float) -> None:
+    """Run the script once in a single session, filling the shared caches as a server's first user does."""
+    from streamlit.testing.v1 import AppTest
+    AppTest.from_file(APP_PATH, default_timeout=timeout).run()
+
+
+def check_single_severity(timeout: float) -> List[str]:
+    """
+    Rerun the dashboard filtered to each severity alone, over all years and
+    over short ranges at the start, middle and end, and return the errors
+    raised. One severity makes several charts build identical figures,
+    which once broke the rerun.
+    """
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.run()
+    errors = [f"initial load: {e.message}" for e in at.exception]
+    severity_options = next(w for w in at.sidebar.multiselect if w.label == "Accident Severity").options
+    first, last = int(at.sidebar.slider[0].min), int(at.sidebar.slider[0].max)
+    middle = (first + last) // 2
+    ranges = [(first, last), (first, first + 1), (middle, middle + 1), (last, last)]
+    for option in severity_options:
+        for years in [(start, min(end, last)) for start, end in ranges]:
+            # Widgets are looked up again after each run; the old ones no longer apply values
+            next(w for w in at.sidebar.multiselect if w.label == "Accident Severity").set_value([option])
+            at.sidebar.slider[0].set_value(years)
+            at.run()
+            errors += [f"severity={option} years={years[0]}-{years[1]}: {e.message}" for e in at.exception]
+    return errors
+
+
+def run_level(users: int, actions: int, seed: int, timeout: float) -> Dict[str, Any]:
+    """Run one concurrency level and summarise its samples."""
+    samples: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=virtual_user, args=(u, actions, seed, timeout, samples, lock), daemon=True)
+        for u in range(users)
+    ]
+
+    with PeakRSSSampler(interval=0.05) as sampler:
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall_time = time.perf_counter() - start
+
+    latencies = sorted(s['latency_ms'] for s in samples)
+    errors = [s for s in samples if s['error']]
+    return {
+        'users': users,
+        'reruns': len(samples),
+        'errors': len(errors),
+        'first_error': errors[0]['error'] if errors else None,
+        'wall_time_s': round(wall_time, 2),
+        'throughput_rps': round(len(samples) / wall_time, 2) if wall_time else None,
+        'p50_ms': round(_percentile(latencies, 50), 1),
+        'p90_ms': round(_percentile(latencies, 90), 1),
+        'p95_ms': round(_percentile(latencies, 95), 1),
+        'p99_ms': round(_percentile(latencies, 99), 1),
+        'max_ms': latencies[-1] if latencies else None,
+        'rss_start_mb': round(sampler.start_rss / MB, 1),
+        'peak_rss_mb': round(sampler.peak_rss / MB, 1),
+        'rss_end_mb': round(sampler.end_rss / MB, 1),
+        'samples': samples
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', nargs='+', type=int, default=[1, 2, 4, 8], help="Concurrency levels to run")
+    parser.add_argument('--actions', type=int, default=10, help="Interactions per virtual user after the initial load")
+    parser.add_argument('--tables-dir', help="Directory of processed accident/cyclist tables to serve (defaults to processed/)")
+    parser.add_argument('--synthetic-rows', help="Serve synthetic data of this size instead, e.g. 1M")
+    parser.add_argument('--data-dir', default="data/synthetic", help="Where synthetic data is generated and reused")
+    parser.add_argument('--timeout', type=float, default=300, help="Seconds allowed per rerun")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default="processed/loadtest_report.json", help="JSON report path")
+    args = parser.parse_args(argv)
+
+    if args.synthetic_rows:
+        print(f"Preparing synthetic data ({args.synthetic_rows} accidents)...")
+        os.environ["DASHBOARD_DATA_DIR"] = build_synthetic_tables(parse_scale(args.synthetic_rows), args.data_dir, args.seed)
+    elif args.tables_dir:
+        os.environ["DASHBOARD_DATA_DIR"] = args.tables_dir
+
+    from streamlit.logger import set_log_level
+    set_log_level('error')
+
+    serialise_script_parsing()
+    print("Warming up...")
+    warm_up(args.timeout)
+    filter_errors = check_single_severity(args.timeout)
+    for error in filter_errors:
+        print(f"  Single-severity check failed: {error[:200]}")
+    levels = []
+    print(f"{'Users':>6}{'Reruns':>8}{'Errors':>8}{'Rerun/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Peak RSS MB':>13}")
+    for users in args.users:
+        level = run_level(users, args.actions, args.seed, args.timeout)
+        levels.append(level)
+        print(
+            f"{users:>6}{level['reruns']:>8}{level['errors']:>8}{level['throughput_rps']:>9.2f}"
+            f"{level['p50_ms']:>9.0f}{level['p95_ms']:>9.0f}{level['p99_ms']:>9.0f}{level['peak_rss_mb']:>13.1f}"
+        )
+        if level['first_error']:
+            print(f"      first error: {level['first_error'][:200]}")
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'tables_dir': os.environ.get("DASHBOARD_DATA_DIR"),
+        'actions_per_user': args.actions,
+        'single_severity_errors': filter_errors,
+        'environment': environment_info(),
+        'levels': levels
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+    return 1 if filter_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,144 @@
 # main.py
-from src.etl import merge_accidents_bikers
-from src.preprocessing import preprocess, save_parquet
-from src.eda import accidents_over_time, severity_distribution, accidents_by_gender_age
 import os
+import argparse
+
+import pandas as pd
+
+from src import dashboard_utils, eda, etl, preprocessing, risk_model, sampling
+from src.etl import load_accidents_bikers, intern_accident_index, iter_merged_batches, merge_frames, ACCIDENTS_SCHEMA, BIKERS_SCHEMA
+from src.preprocessing import preprocess, preprocess_to_tables, normalise, save_tables, table_paths
+from src.eda import build_plot_jobs, render_plots
+from src.sampling import SAMPLE_RATES, sample_paths, save_samples
+from src.risk_model import model_path, train_risk_model
+from src.perf import RunReport
+from src.pipeline import Stage, FRAME, OBJECT, FILES, run_pipeline
 
 # Paths
 accidents_path = "data/Accidents.csv"
 bikers_path = "data/Bikers.csv"
-parquet_path = "processed/bicycle_accidents.parquet"
+tables_dir = "processed"
+output_paths = table_paths(tables_dir)
+samples_dir = "processed/samples"
+risk_model_path = model_path(tables_dir)
+plots_dir = "processed"
+cache_dir = "processed/.cache"
+report_path = "processed/run_report.json"
+report_history_path = "processed/run_reports.jsonl"
+
+parser = argparse.ArgumentParser(description="Build the processed dataset and EDA plots.")
+parser.add_argument('--force', action='store_true', help="Ignore cached stage outputs and rerun everything")
+parser.add_argument('--chunked', action='store_true',
+                    help="Preprocess out of core, batch by batch, for datasets larger than RAM")
+parser.add_argument('--block-mb', type=int, default=64, help="MB of Accidents.csv per batch in --chunked mode")
+args = parser.parse_args()
+
+
+# ---------------------------
+# Stages
+# ---------------------------
+
+def load_stage():
+    print("Reading CSV files...")
+    accidents, bikers = load_accidents_bikers(accidents_path, bikers_path)
+    # Accident_Index strings are interned once here; everything downstream joins on integers
+    accidents, bikers, accident_index = intern_accident_index(accidents, bikers)
+    return {'accidents': accidents, 'bikers': bikers, 'accident_index': accident_index}
+
+def merge_stage(raw):
+    print("Merging datasets...")
+    df = merge_frames(raw['accidents'], raw['bikers'])
+    print(f"Combined dataset shape: {df.shape}")
+    return df
+
+def preprocess_stage(df):
+    print("Preprocessing data...")
+    return preprocess(df)
+
+def persist_stage(df_clean, raw):
+    print(f"Saving accident and cyclist tables to {tables_dir}/ ...")
+    accidents, cyclists, accident_index = normalise(df_clean, accident_index=raw['accident_index'])
+    print(f"{len(accidents):,} accidents, {len(cyclists):,} cyclists")
+    return save_tables(accidents, cyclists, accident_index, tables_dir)
+
+def persist_chunked_stage():
+    print(f"Preprocessing in batches into {tables_dir}/ ...")
+    batches = iter_merged_batches(accidents_path, bikers_path, block_size=args.block_mb * 1024**2)
+    preprocess_to_tables(batches, tables_dir)
+    return output_paths
+
+def aggregate_parquet_stage(paths):
+    # Only the columns the plots aggregate over are read back; year is
+    # gathered onto cyclist rows by accident_id (the accident row position)
+    years = pd.read_parquet(paths[0], columns=['year'])['year'].to_numpy()
+    df_clean = pd.read_parquet(paths[1], columns=['accident_id', 'severity', 'gender', 'age_grp'])
+    df_clean['year'] = years[df_clean['accident_id'].to_numpy()]
+    return aggregate_stage(df_clean)
+
+def sample_stage(paths):
+    print(f"Drawing stratified samples for approximate mode into {samples_dir}/ ...")
+    accidents, cyclists = pd.read_parquet(paths[0]), pd.read_parquet(paths[1])
+    return save_samples(accidents, cyclists, samples_dir, rates=SAMPLE_RATES)
+
+def model_stage(paths):
+    print(f"Training the severity risk model into {risk_model_path} ...")
+    model = train_risk_model(paths[0], paths[1])
+    print(f"Log loss {model.metrics['log_loss']:.4f} (class frequencies alone: {model.metrics['baseline_log_loss']:.4f})")
+    return [model.save(risk_model_path)]
 
+def aggregate_stage(df_clean):
+    print("Computing EDA aggregates...")
+    return build_plot_jobs(df_clean, output_dir=plots_dir)
 
-# ETL
-print("Merging datasets...")
-df = merge_accidents_bikers(accidents_path, bikers_path)
-print(f"Combined dataset shape: {df.shape}")
+def plot_stage(plot_jobs):
+    print("Rendering EDA plots...")
+    return render_plots(plot_jobs)
 
-# Preprocessing
-print("Preprocessing data...")
-df_clean = preprocess(df)
-print("Preprocessing complete.")
 
-# Save processed Parquet
-print(f"Saving processed dataset to {parquet_path} ...")
-save_parquet(df_clean, parquet_path)
-print("Parquet file saved.")
+# Each stage is keyed on its input files, the source of the code it runs and
+# its parameters; unchanged stages are skipped and only what is downstream of
+# a change is recomputed.
+in_memory_stages = [
+    Stage('load', load_stage, kind=FRAME,
+          code=[etl.load_csv_arrow, etl.load_accidents_bikers, etl.intern_accident_index, load_stage],
+          params={'accidents_schema': ACCIDENTS_SCHEMA, 'bikers_schema': BIKERS_SCHEMA},
+          input_files=[accidents_path, bikers_path]),
+    Stage('merge', merge_stage, inputs=['load'], kind=FRAME, code=[etl.merge_frames, merge_stage]),
+    Stage('preprocess', preprocess_stage, inputs=['merge'], kind=FRAME, code=[preprocessing]),
+    Stage('persist', persist_stage, inputs=['preprocess', 'load'], kind=FILES,
+          code=[preprocessing.normalise, preprocessing.save_tables, persist_stage], output_files=output_paths),
+    Stage('aggregate', aggregate_stage, inputs=['preprocess'], kind=OBJECT, code=[eda],
+          params={'output_dir': plots_dir}),
+]
+# Out-of-core variant: merge, preprocess and write one batch at a time
+chunked_stages = [
+    Stage('persist', persist_chunked_stage, kind=FILES,
+          code=[etl.iter_merged_batches, etl.merge_frames, preprocessing, persist_chunked_stage],
+          params={'accidents_schema': ACCIDENTS_SCHEMA, 'bikers_schema': BIKERS_SCHEMA},
+          input_files=[accidents_path, bikers_path], output_files=output_paths),
+    Stage('aggregate', aggregate_parquet_stage, inputs=['persist'], kind=OBJECT,
+          code=[eda, aggregate_parquet_stage], params={'output_dir': plots_dir}),
+]
+stages = (chunked_stages if args.chunked else in_memory_stages) + [
+    Stage('sample', sample_stage, inputs=['persist'], kind=FILES,
+          code=[sampling, dashboard_utils.join_cyclists, sample_stage],
+          params={'rates': SAMPLE_RATES}, output_files=sample_paths(samples_dir)),
+    Stage('model', model_stage, inputs=['persist'], kind=FILES, code=[risk_model, model_stage],
+          output_files=[risk_model_path]),
+    Stage('plot', plot_stage, inputs=['aggregate'], kind=FILES, code=[eda]),
+]
 
+report = RunReport("main.py")
+status = run_pipeline(stages, cache_dir=cache_dir, report=report, force=args.force)
 
-# Generate and save plots
-print("Generating EDA plots...")
-accidents_over_time(df_clean)
-severity_distribution(df_clean)
-accidents_by_gender_age(df_clean)
-print("All plots saved to processed/ folder.")
+report.metrics['input_mb'] = round(sum(os.path.getsize(p) for p in (accidents_path, bikers_path)) / 1024**2, 1)
+report.metrics['output_mb'] = round(sum(os.path.getsize(p) for p in output_paths) / 1024**2, 1)
+report.metrics['stages_cached'] = sum(s == 'cached' for s in status.values())
 
 # ---------------------------
 # Done
 # ---------------------------
+report.write_json(report_path, history_path=report_history_path)
+print()
+print(report.summary())
+print(f"Run report written to {report_path}")
 print("Pipeline complete. Dataset and plots are ready.")
@@ -0,0 +1,135 @@
+# src/chart_payload.py
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Points per line beyond which it is decimated: about the pixel width of a
+# full-width chart, so dropping the rest changes nothing visible
+SCREEN_POINTS = 2_000
+# Lines longer than this are drawn with WebGL (Scattergl) instead of SVG
+WEBGL_POINTS = 1_000
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Positions of the points kept by Largest-Triangle-Three-Buckets decimation.
+
+    The first and last points are kept; the others are split into
+    threshold - 2 equal buckets, and from each bucket the point forming the
+    largest triangle with the previously kept point and the mean of the next
+    bucket is kept. Peaks and troughs survive, unlike with striding or
+    averaging. Points with a missing y are never chosen from a bucket that
+    has any other.
+
+    Args:
+        x: Numeric x values, sorted
+        y: y values
+        threshold: Number of points to keep
+
+    Returns:
+        Sorted int64 positions into x and y
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        following = slice(stop, edges[bucket + 2]) if bucket + 2 < len(edges) else slice(n - 1, n)
+        next_x = x[following].mean()
+        finite = y[following][np.isfinite(y[following])]
+        next_y = finite.mean() if len(finite) else y[previous]
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(np.nan_to_num(areas, nan=-1.0)))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def axis_values(values: Any) -> np.ndarray:
+    """
+    Values of an x or y column in the most compact form Plotly sends as a typed array.
+
+    Dates and periods become float milliseconds since the epoch (what a date
+    axis takes as numbers), floats become float32, integers stay integers
+    (Plotly narrows them itself). Anything else is returned as an array
+    unchanged.
+    """
+    if isinstance(values, (pd.Series, pd.Index)) and isinstance(values.dtype, pd.PeriodDtype):
+        values = values.dt.to_timestamp() if isinstance(values, pd.Series) else values.to_timestamp()
+    array = np.asarray(values)
+    if np.issubdtype(array.dtype, np.datetime64):
+        return array.astype('datetime64[ms]').astype(np.int64).astype(np.float64)
+    if np.issubdtype(array.dtype, np.floating):
+        return array.astype(np.float32)
+    return array
+
+
+def take_points(props: Dict[str, Any], kept: np.ndarray, n_points: int) -> Dict[str, Any]:
+    """
+    Keep only the given points in every per-point array of a trace's properties.
+
+    Per-point arrays are those with one entry per point, at any depth
+    (customdata, text, hovertext, marker.color, error_y.array, ...); other
+    properties are left alone.
+    """
+    taken = {}
+    for name, value in props.items():
+        if isinstance(value, dict):
+            value = take_points(value, kept, n_points)
+        elif isinstance(value, (np.ndarray, list, tuple)) and len(value) == n_points:
+            value = np.asarray(value)[kept] if isinstance(value, np.ndarray) else [value[i] for i in kept]
+        taken[name] = value
+    return taken
+
+
+def compact_figure(
+    fig: go.Figure,
+    max_points: int = SCREEN_POINTS,
+    webgl_points: Optional[int] = WEBGL_POINTS
+) -> go.Figure:
+    """
+    Shrink the data a figure's line traces send to the browser, in place.
+
+    For every scatter or scattergl trace: x and y are converted by
+    axis_values(), so they serialise as binary typed arrays rather than JSON
+    lists (an x axis of dates becomes a date axis of epoch milliseconds); a
+    numeric line longer than max_points is decimated with lttb_indices(),
+    along with its other per-point arrays (take_points()), so hover data
+    stays with its point; and an SVG line still longer than webgl_points is
+    redrawn as Scattergl. Other traces are left alone.
+
+    Example:
+        fig = compact_figure(px.line(monthly, x='month', y='count'))
+    """
+    traces = []
+    for trace in fig.data:
+        if trace.type not in ('scatter', 'scattergl') or trace.x is None or trace.y is None:
+            traces.append(trace)
+            continue
+        x_dates = np.issubdtype(np.asarray(trace.x).dtype, np.datetime64)
+        x, y = axis_values(trace.x), axis_values(trace.y)
+        props = trace.to_plotly_json()
+        props.pop('type', None)
+        props['x'], props['y'] = x, y
+        if len(x) > max_points and np.issubdtype(x.dtype, np.number) and np.issubdtype(y.dtype, np.number):
+            props = take_points(props, lttb_indices(x, y, max_points), len(x))
+        if x_dates:
+            fig.update_xaxes(type='date')
+        if trace.type == 'scattergl' or (webgl_points is not None and len(props['x']) > webgl_points):
+            trace = go.Scattergl(props, skip_invalid=True)
+        else:
+            trace = go.Scatter(props)
+        traces.append(trace)
+    fig.data = []
+    fig.add_traces(traces)
+    return fig
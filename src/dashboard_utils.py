@@ -1,8 +1,14 @@
 # src/dashboard_utils.py
+import hashlib
 import pandas as pd
 import numpy as np
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Iterable, Union
 
+from src.perf import track_allocations
+from src.intervals import rate_intervals
+from src.preprocessing import ACCIDENT_ID, PROCESSED_SCHEMA, SEVERITY_MAP, WEEKEND_DAYS, bin_column
+
+@track_allocations
 def filter_dataframe(
     df: pd.DataFrame,
     year_range: Optional[Tuple[int, int]] = None,
@@ -34,7 +40,7 @@ def filter_dataframe(
     filtered_df = df.copy()
     
     # Filter by year range
-    if year_range:
+    if year_range and 'year' in filtered_df.columns:
         min_year, max_year = year_range
         filtered_df = filtered_df[
             (filtered_df['year'] >= min_year) & 
@@ -58,27 +64,608 @@ def filter_dataframe(
     
     return filtered_df
 
-def calculate_kpis(df: pd.DataFrame) -> Dict[str, Any]:
+@track_allocations
+def filter_tables(
+    accidents: pd.DataFrame,
+    cyclists: pd.DataFrame,
+    **filters
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Apply dashboard filters to the normalised accident and cyclist tables.
+    
+    Each filter is applied to the table holding its column, so accident-level
+    conditions are tested once per accident. An accident is kept when at least
+    one of its cyclists passes the cyclist-level filters, and a cyclist is kept
+    only if their accident passes.
+    
+    Args:
+        accidents: Accident table, one row per accident_id in id order
+        cyclists: Cyclist table with an accident_id column
+        **filters: Keyword arguments of filter_dataframe
+    
+    Returns:
+        Tuple of (filtered accidents, filtered cyclists)
+    """
+    filtered_accidents = filter_dataframe(accidents, **filters)
+    filtered_cyclists = filter_dataframe(cyclists, **filters)
+    
+    accident_kept = np.zeros(len(accidents), dtype=bool)
+    accident_kept[filtered_accidents[ACCIDENT_ID].to_numpy()] = True
+    filtered_cyclists = filtered_cyclists[accident_kept[filtered_cyclists[ACCIDENT_ID].to_numpy()]]
+    
+    has_cyclist = np.bincount(filtered_cyclists[ACCIDENT_ID].to_numpy(), minlength=len(accidents)) > 0
+    filtered_accidents = filtered_accidents[has_cyclist[filtered_accidents[ACCIDENT_ID].to_numpy()]]
+    
+    return filtered_accidents, filtered_cyclists
+
+# Keyword of each filter_dataframe filter -> column it tests
+FILTER_COLUMNS = {
+    'year_range': 'year',
+    'severity': 'severity',
+    'gender': 'gender',
+    'age_groups': 'age_grp',
+    'road_conditions': 'road_conditions',
+    'weather_conditions': 'weather_conditions',
+    'road_type': 'road_type',
+    'light_conditions': 'light_conditions'
+}
+
+@track_allocations
+def build_value_index(df: pd.DataFrame) -> Dict[str, Dict[Any, np.ndarray]]:
+    """
+    Build an inverted index from each filterable column's values to row positions.
+    
+    Missing values are left out, as isin() never matches them.
+    
+    Args:
+        df: Table to index
+    
+    Returns:
+        Dictionary of column -> {value: int32 row positions}
+    """
+    value_index = {}
+    for column in FILTER_COLUMNS.values():
+        if column not in df.columns:
+            continue
+        codes, uniques = pd.factorize(df[column])
+        order = np.argsort(codes, kind='stable').astype(np.int32)
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes[codes >= 0], minlength=len(uniques)))])
+        first = int((codes < 0).sum())  # missing values (code -1) sort first
+        value_index[column] = {
+            value: order[first + bounds[i]:first + bounds[i + 1]] for i, value in enumerate(uniques)
+        }
+    return value_index
+
+class IncrementalFilter:
+    """
+    Evaluate filter_dataframe selections on one table by difference from the last call.
+    
+    Keeps one component mask per filter and, per row, the number of filters
+    rejecting it. When a selection changes, only the rows holding the added
+    or removed values are touched: narrowing clears them from the component
+    (refining the result), widening sets them (a union with the difference).
+    The year range is handled as the set of years it covers. Turning a filter
+    on or off (an empty multiselect means no filter) rebuilds that one mask.
+    
+    Keep one instance per session and table; it is not thread-safe.
+    
+    Example:
+        engine = IncrementalFilter(len(df), build_value_index(df))
+        mask = engine.apply(year_range=(1990, 2000), gender=['Male'])
+        mask = engine.apply(year_range=(1990, 2001), gender=['Male'])  # touches 2001 only
+    """
+    
+    def __init__(self, n_rows: int, value_index: Dict[str, Dict[Any, np.ndarray]]):
+        self.n_rows = n_rows
+        self.value_index = value_index
+        self.rows_touched = 0
+        self._selections: Dict[str, Optional[frozenset]] = {}
+        self._masks: Dict[str, np.ndarray] = {}
+        self._rejections = np.zeros(n_rows, dtype=np.int8)
+    
+    def _selection(self, name: str, value: Any) -> Optional[frozenset]:
+        """Values of the filter's column that pass, or None when the filter is off."""
+        if not value:
+            return None
+        if name == 'year_range':
+            low, high = value
+            return frozenset(year for year in self.value_index['year'] if low <= year <= high)
+        return frozenset(value)
+    
+    def _rows(self, column: str, values: Iterable) -> np.ndarray:
+        index = self.value_index[column]
+        parts = [index[v] for v in values if v in index]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int32)
+    
+    def _update(self, name: str, new: Optional[frozenset]) -> None:
+        column = FILTER_COLUMNS[name]
+        old = self._selections.get(name)
+        mask = self._masks.get(name)
+        if old is not None and new is not None:
+            added = self._rows(column, new - old)
+            removed = self._rows(column, old - new)
+            mask[added] = True
+            mask[removed] = False
+            self._rejections[added] -= 1
+            self._rejections[removed] += 1
+            self.rows_touched += len(added) + len(removed)
+        else:
+            if mask is not None:
+                self._rejections -= ~mask
+                del self._masks[name]
+            if new is not None:
+                mask = np.zeros(self.n_rows, dtype=bool)
+                mask[self._rows(column, new)] = True
+                self._rejections += ~mask
+                self._masks[name] = mask
+                self.rows_touched += self.n_rows
+        self._selections[name] = new
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the per-row state (the value index is shared and not counted)."""
+        return self._rejections.nbytes + sum(mask.nbytes for mask in self._masks.values())
+    
+    def apply(self, **filters) -> np.ndarray:
+        """
+        Update the component masks to new selections and return the combined mask.
+        
+        Args:
+            **filters: Keyword arguments of filter_dataframe
+        
+        Returns:
+            Boolean mask of rows passing every filter
+        """
+        for name, value in filters.items():
+            if FILTER_COLUMNS.get(name) not in self.value_index:
+                continue
+            new = self._selection(name, value)
+            if name in self._selections and new == self._selections[name]:
+                continue
+            self._update(name, new)
+        return self._rejections == 0
+
+@track_allocations
+def filter_tables_incremental(
+    accidents: pd.DataFrame,
+    cyclists: pd.DataFrame,
+    engines: Tuple[IncrementalFilter, IncrementalFilter],
+    **filters
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    filter_tables() evaluated with a pair of IncrementalFilter engines.
+    
+    Args:
+        accidents: Accident table, one row per accident_id in id order
+        cyclists: Cyclist table with an accident_id column
+        engines: (accident engine, cyclist engine) kept from the previous call
+        **filters: Keyword arguments of filter_dataframe
+    
+    Returns:
+        Tuple of (filtered accidents, filtered cyclists), as from filter_tables
+    """
+    accident_kept, cyclist_kept = semijoin_masks(
+        engines[0].apply(**filters), engines[1].apply(**filters), cyclists[ACCIDENT_ID].to_numpy()
+    )
+    return accidents[accident_kept], cyclists[cyclist_kept]
+
+@track_allocations
+def semijoin_masks(
+    accident_mask: np.ndarray,
+    cyclist_mask: np.ndarray,
+    cyclist_accident_ids: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Link per-table filter masks the way filter_tables() links the tables.
+    
+    A cyclist is kept only if their accident passes, and an accident only if
+    at least one of its cyclists is kept.
+    
+    Args:
+        accident_mask: Accidents passing the accident-level filters, in accident_id order
+        cyclist_mask: Cyclists passing the cyclist-level filters
+        cyclist_accident_ids: accident_id of each cyclist
+    
+    Returns:
+        Tuple of (accident mask, cyclist mask)
+    """
+    cyclist_mask = cyclist_mask & accident_mask[cyclist_accident_ids]
+    has_cyclist = np.bincount(cyclist_accident_ids[cyclist_mask], minlength=len(accident_mask)) > 0
+    return accident_mask & has_cyclist, cyclist_mask
+
+@track_allocations
+def compare_cohorts(
+    accidents: pd.DataFrame,
+    cyclists: pd.DataFrame,
+    cohort_a: Tuple[np.ndarray, np.ndarray],
+    cohort_b: Tuple[np.ndarray, np.ndarray],
+    labels: Tuple[str, str] = ('Cohort A', 'Cohort B')
+) -> Dict[str, pd.DataFrame]:
+    """
+    Compute the KPIs and main aggregates of two cohorts in one pass over the tables.
+    
+    Each grouping column is factorised once and both cohorts are counted over
+    the shared codes, one weighted bincount per cohort, so comparing costs
+    about the same as one filtered view.
+    
+    Args:
+        accidents: Unfiltered accident table, in accident_id order
+        cyclists: Unfiltered cyclist table
+        cohort_a: (accident mask, cyclist mask) of the first cohort, as from semijoin_masks
+        cohort_b: Same for the second cohort
+        labels: Column names of the two cohorts
+    
+    Returns:
+        Dictionary of 'kpis' (the numeric calculate_kpis values), 'severity',
+        'year', 'day_of_week', 'gender' and 'age_grp' (counts of cyclists,
+        or of accidents for year and day_of_week). Each frame is indexed by
+        the KPI or value, with one column per cohort, 'Delta' (second minus
+        first) and 'Delta %'.
+    """
+    accident_masks = np.stack([cohort_a[0], cohort_b[0]])
+    cyclist_masks = np.stack([cohort_a[1], cohort_b[1]])
+    
+    def stacked_counts(table: pd.DataFrame, column: str, masks: np.ndarray, order: Optional[List[str]] = None) -> pd.DataFrame:
+        codes, uniques = pd.factorize(table[column], sort=True)
+        valid = codes >= 0
+        counts = np.stack([np.bincount(codes[valid], weights=mask[valid], minlength=len(uniques)) for mask in masks])
+        frame = pd.DataFrame(counts.T, index=pd.Index(uniques, name=column), columns=list(labels))
+        return frame.reindex(order, fill_value=0) if order is not None else frame
+    
+    def with_deltas(frame: pd.DataFrame) -> pd.DataFrame:
+        first, second = frame[labels[0]], frame[labels[1]]
+        frame['Delta'] = second - first
+        frame['Delta %'] = (frame['Delta'] / first.where(first != 0) * 100).round(1)
+        return frame
+    
+    # Accident-level KPIs: one matrix product per summed column
+    n_accidents = accident_masks.sum(axis=1)
+    kpis = {'total_accidents': n_accidents.astype(float)}
+    for kpi, column in (('total_casualties', 'number_of_casualties'), ('total_vehicles', 'number_of_vehicles')):
+        values = accidents[column].fillna(0).to_numpy(dtype=float) if column in accidents.columns else np.zeros(len(accidents))
+        kpis[kpi] = accident_masks @ values
+    
+    # Accidents with at least one cyclist of each severity: distinct (accident, severity) pairs
+    severity_codes, severities = pd.factorize(cyclists['severity'])
+    pair = cyclists[ACCIDENT_ID].to_numpy(dtype=np.int64) * max(len(severities), 1) + severity_codes
+    for severity in ('Fatal', 'Serious', 'Slight'):
+        code = severities.get_loc(severity) if severity in severities else -1
+        kpis[f'{severity.lower()}_accidents'] = np.array([
+            len(np.unique(pair[mask & (severity_codes == code)])) for mask in cyclist_masks
+        ], dtype=float)
+    kpis['avg_casualties_per_accident'] = np.divide(
+        kpis['total_casualties'], n_accidents, out=np.zeros(2), where=n_accidents > 0
+    )
+    kpi_frame = pd.DataFrame(kpis, index=list(labels)).T.rename_axis('kpi')
+    
+    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    return {
+        'kpis': with_deltas(kpi_frame),
+        'severity': with_deltas(stacked_counts(cyclists, 'severity', cyclist_masks)),
+        'year': with_deltas(stacked_counts(accidents, 'year', accident_masks)),
+        'day_of_week': with_deltas(stacked_counts(accidents, 'day_of_week', accident_masks, day_order)),
+        'gender': with_deltas(stacked_counts(cyclists, 'gender', cyclist_masks)),
+        'age_grp': with_deltas(stacked_counts(cyclists, 'age_grp', cyclist_masks)),
+    }
+
+@track_allocations
+def join_cyclists(accidents: pd.DataFrame, cyclists: pd.DataFrame) -> pd.DataFrame:
+    """
+    Join cyclist rows to their accidents, giving one row per cyclist.
+    
+    accident_id is the row position in the unfiltered accident table, so the
+    join is a positional gather rather than a hash join.
+    
+    Args:
+        accidents: Unfiltered accident table
+        cyclists: Cyclist table (filtered or not)
+    
+    Returns:
+        DataFrame with accident and cyclist columns, in the column order of
+        the flat processed dataset, indexed like cyclists (so the index gives
+        each row's position in the unfiltered cyclist table)
+    """
+    accident_rows = accidents.take(cyclists[ACCIDENT_ID].to_numpy()).reset_index(drop=True)
+    cyclist_columns = cyclists.drop(columns=ACCIDENT_ID).reset_index(drop=True)
+    joined = pd.concat([accident_rows, cyclist_columns], axis=1)
+    joined.index = cyclists.index
+    order = {col: i for i, col in enumerate(PROCESSED_SCHEMA)}
+    return joined[sorted(joined.columns, key=lambda col: order.get(col, len(order)))]
+
+@track_allocations
+def count_unique_accidents(df: pd.DataFrame) -> int:
+    """
+    Count the distinct accidents in a frame.
+    
+    Interned accident_id codes are counted with a bincount instead of hashing
+    the Accident_Index strings.
+    
+    Args:
+        df: Dataframe with an accident_id or accident_index column
+    
+    Returns:
+        Number of distinct accidents
+    """
+    if ACCIDENT_ID in df.columns:
+        ids = df[ACCIDENT_ID].to_numpy()
+        return int(np.count_nonzero(np.bincount(ids))) if len(ids) else 0
+    return df['accident_index'].nunique()
+
+@track_allocations
+def decode_accident_index(df: pd.DataFrame, accident_index: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the Accident_Index strings back to rows keyed by accident_id.
+    
+    Only meant for rows that are displayed or exported; everything else works
+    on the integer codes.
+    
+    Args:
+        df: Dataframe with an accident_id column
+        accident_index: Dictionary whose row i holds the index of accident_id i
+    
+    Returns:
+        Copy of df with an accident_index column in front
+    """
+    decoded = df.copy()
+    values = accident_index['accident_index'].take(decoded[ACCIDENT_ID].to_numpy()).to_numpy()
+    decoded.insert(0, 'accident_index', values)
+    return decoded
+
+@track_allocations
+def build_sort_permutation(
+    df: pd.DataFrame,
+    column: str,
+    accident_index: Optional[pd.DataFrame] = None
+) -> np.ndarray:
+    """
+    Precompute the ascending row order of a table by one column.
+    
+    Values are ranked once through a sorted factorisation and missing values
+    go last. 'accident_index' can be requested for a table keyed by
+    accident_id; its strings are then ranked in the dictionary instead of
+    being decoded for every row.
+    
+    Args:
+        df: Unfiltered table the permutation refers to
+        column: Column to sort by
+        accident_index: Dictionary for sorting an interned table by accident_index
+    
+    Returns:
+        Tuple of (stable permutation of row positions (int32), number of
+        missing values, which make up the end of the permutation)
+    """
+    if column == 'accident_index' and column not in df.columns and accident_index is not None:
+        ranks = np.empty(len(accident_index), dtype=np.int64)
+        ranks[np.argsort(accident_index['accident_index'].to_numpy(), kind='stable')] = np.arange(len(accident_index))
+        keys = ranks[df[ACCIDENT_ID].to_numpy()]
+        n_missing = 0
+    else:
+        codes, _ = pd.factorize(df[column], sort=True)
+        keys = np.where(codes < 0, codes.max(initial=0) + 1, codes)
+        n_missing = int(np.count_nonzero(codes < 0))
+    return np.argsort(keys, kind='stable').astype(np.int32), n_missing
+
+@track_allocations
+def view_order(
+    permutation: np.ndarray,
+    positions: np.ndarray,
+    descending: bool = False,
+    n_missing: int = 0
+) -> np.ndarray:
+    """
+    Order the rows of a filtered view with a permutation of the full table.
+    
+    Costs one pass over the permutation; keep the result for the view and
+    every page is then a slice of it. Missing values stay last in both
+    directions.
+    
+    Args:
+        permutation: From build_sort_permutation on the unfiltered table
+        positions: Full-table position of each row of the view
+        descending: Reverse the order of the non-missing values
+        n_missing: Missing values at the end of the permutation, from
+            build_sort_permutation
+    
+    Returns:
+        Row positions within the view (for .iloc), in sorted order
+    """
+    in_view = np.full(len(permutation), -1, dtype=np.int64)
+    in_view[positions] = np.arange(len(positions))
+    order = in_view[permutation]
+    kept = order >= 0
+    order = order[kept]
+    if descending:
+        n_valid = np.count_nonzero(kept[:len(permutation) - n_missing])
+        order = np.concatenate([order[:n_valid][::-1], order[n_valid:]])
+    return order
+
+@track_allocations
+def build_accident_lookup(accident_index: pd.DataFrame) -> pd.Index:
+    """
+    Build the hash index from Accident_Index string to accident_id.
+    
+    Args:
+        accident_index: Dictionary whose row i holds the index of accident_id i
+    
+    Returns:
+        Index whose position of a string is its accident_id
+    """
+    lookup = pd.Index(accident_index['accident_index'])
+    lookup.get_indexer(lookup[:1])  # builds the hash table now rather than on the first search
+    return lookup
+
+@track_allocations
+def search_rows(df: pd.DataFrame, query: str, lookup: Optional[pd.Index] = None) -> np.ndarray:
+    """
+    Find the rows of a view matching a search string.
+    
+    An exact Accident_Index is resolved through the lookup index; otherwise
+    the query is matched as a substring of Accident_Index values and of the
+    categories of text columns (each distinct value is tested once, then
+    rows are selected by membership).
+    
+    Args:
+        df: View to search (with accident_id, or with accident_index strings)
+        query: Search text, case-insensitive
+        lookup: From build_accident_lookup, for views keyed by accident_id
+    
+    Returns:
+        Row positions within the view (for .iloc), in view order
+    """
+    query = query.strip()
+    if not query:
+        return np.arange(len(df))
+    
+    if lookup is not None and ACCIDENT_ID in df.columns:
+        accident_ids = lookup.get_indexer([query.upper()])
+        if accident_ids[0] < 0:
+            accident_ids = np.flatnonzero(lookup.str.contains(query, case=False, regex=False))
+        matches = np.isin(df[ACCIDENT_ID].to_numpy(), accident_ids)
+    else:
+        matches = np.zeros(len(df), dtype=bool)
+    
+    for column in df.columns:
+        if not (pd.api.types.is_string_dtype(df[column]) or isinstance(df[column].dtype, pd.CategoricalDtype)):
+            continue
+        values = pd.Series(df[column].dropna().unique())
+        hits = values[values.astype(str).str.contains(query, case=False, regex=False)]
+        if len(hits):
+            matches |= df[column].isin(hits).to_numpy()
+    return np.flatnonzero(matches)
+
+# Dimensions of the linked (cross-filtered) charts, at accident grain
+CROSSFILTER_DIMENSIONS = ['weather_conditions', 'year', 'hour']
+
+@track_allocations
+def build_dimension_codes(df: pd.DataFrame, dimensions: List[str] = CROSSFILTER_DIMENSIONS) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Factorise the cross-filter dimensions of a table once.
+    
+    'hour' always has the labels 0-23; its codes are the stored hour
+    column's when there is one. Missing values get code -1.
+    
+    Args:
+        df: Table to index, normally the unfiltered accident table
+        dimensions: Columns (or 'hour') to factorise
+    
+    Returns:
+        Dictionary of dimension -> (int16 code of each row, sorted labels)
+    """
+    codes = {}
+    for dimension in dimensions:
+        if dimension == 'hour':
+            hours = bin_column(df, 'hour')
+            codes[dimension] = (hours.cat.codes.to_numpy().astype(np.int16), np.arange(24))
+        else:
+            dimension_codes, labels = pd.factorize(df[dimension], sort=True)
+            codes[dimension] = (dimension_codes.astype(np.int16), np.asarray(labels))
+    return codes
+
+@track_allocations
+def build_count_cube(
+    dimension_codes: Dict[str, Tuple[np.ndarray, np.ndarray]],
+    positions: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Count rows over every combination of the dimensions in one pass.
+    
+    Once built for a filter state, any cross-filter selection is answered by
+    slicing the cube, without touching the rows again.
+    
+    Args:
+        dimension_codes: From build_dimension_codes
+        positions: Rows to count (e.g. the filtered accidents); all rows if None
+    
+    Returns:
+        Array with one axis per dimension, in dimension_codes order
+    """
+    shape = tuple(len(labels) for _, labels in dimension_codes.values())
+    codes = [c if positions is None else c[positions] for c, _ in dimension_codes.values()]
+    valid = np.logical_and.reduce([c >= 0 for c in codes])
+    flat = np.ravel_multi_index([c[valid] for c in codes], shape)
+    return np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+
+@track_allocations
+def slice_cube(
+    cube: np.ndarray,
+    dimensions: List[str],
+    selections: Dict[str, Optional[np.ndarray]],
+    previous: Optional[Dict[str, np.ndarray]] = None,
+    changed: Optional[str] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Counts of each linked chart under the selections of the other charts.
+    
+    A chart is not filtered by its own selection, as in crossfilter, so when
+    only one selection changed, that chart's counts are taken from previous
+    and only the others are recomputed.
+    
+    Args:
+        cube: From build_count_cube
+        dimensions: Dimension of each cube axis
+        selections: Boolean mask over each dimension's labels, or None
+        previous: Counts returned for the same cube before the change
+        changed: Dimension whose selection changed since previous
+    
+    Returns:
+        Dictionary of dimension -> counts by label
+    """
+    counts = {}
+    for axis, dimension in enumerate(dimensions):
+        if previous is not None and dimension == changed and dimension in previous:
+            counts[dimension] = previous[dimension]
+            continue
+        sliced = cube
+        for other_axis, other in enumerate(dimensions):
+            selected = selections.get(other)
+            if other != dimension and selected is not None:
+                sliced = np.compress(selected, sliced, axis=other_axis)
+        counts[dimension] = sliced.sum(axis=tuple(a for a in range(cube.ndim) if a != axis))
+    return counts
+
+@track_allocations
+def calculate_kpis(df: pd.DataFrame, cyclists: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
     """
     Calculate key performance indicators from the filtered dataframe.
     
+    Casualty and vehicle counts are accident-level, so they are summed once per
+    accident, and severity KPIs count accidents with at least one cyclist of
+    that severity.
+    
     Args:
-        df: Input dataframe
+        df: Filtered accident table when cyclists is given, otherwise a flat
+            one-row-per-cyclist dataframe
+        cyclists: Filtered cyclist table
     
     Returns:
         Dictionary with KPI values
     """
+    if cyclists is None:
+        cyclists = df
+    key = next((col for col in (ACCIDENT_ID, 'accident_index') if col in cyclists.columns), None)
+    if cyclists is df:
+        accidents = df.drop_duplicates(key) if key else df
+    else:
+        accidents = df
+    
+    def accidents_with(severity: str) -> int:
+        if 'severity' not in cyclists.columns:
+            return 0
+        matching = cyclists[cyclists['severity'] == severity]
+        return count_unique_accidents(matching) if key else len(matching)
+    
     return {
-        'total_accidents': len(df),
-        'total_casualties': df['number_of_casualties'].sum() if 'number_of_casualties' in df.columns else 0,
-        'total_vehicles': df['number_of_vehicles'].sum() if 'number_of_vehicles' in df.columns else 0,
-        'fatal_accidents': len(df[df['severity'] == 'Fatal']) if 'severity' in df.columns else 0,
-        'serious_accidents': len(df[df['severity'] == 'Serious']) if 'severity' in df.columns else 0,
-        'slight_accidents': len(df[df['severity'] == 'Slight']) if 'severity' in df.columns else 0,
-        'avg_casualties_per_accident': df['number_of_casualties'].mean() if 'number_of_casualties' in df.columns else 0,
-        'year_range': f"{df['year'].min()}-{df['year'].max()}" if 'year' in df.columns and len(df) > 0 else "N/A"
+        'total_accidents': len(accidents),
+        'total_casualties': accidents['number_of_casualties'].sum() if 'number_of_casualties' in accidents.columns else 0,
+        'total_vehicles': accidents['number_of_vehicles'].sum() if 'number_of_vehicles' in accidents.columns else 0,
+        'fatal_accidents': accidents_with('Fatal'),
+        'serious_accidents': accidents_with('Serious'),
+        'slight_accidents': accidents_with('Slight'),
+        'avg_casualties_per_accident': accidents['number_of_casualties'].mean() if 'number_of_casualties' in accidents.columns else 0,
+        'year_range': f"{accidents['year'].min()}-{accidents['year'].max()}" if 'year' in accidents.columns and len(accidents) > 0 else "N/A"
     }
 
+@track_allocations
 def group_rare_categories(
     series: pd.Series, 
     min_count: int = 100, 
@@ -104,6 +691,7 @@ def group_rare_categories(
     
     return result
 
+@track_allocations
 def prepare_time_series_data(df: pd.DataFrame, freq: str = 'year') -> pd.DataFrame:
     """
     Prepare data for time series visualization.
@@ -129,6 +717,7 @@ def prepare_time_series_data(df: pd.DataFrame, freq: str = 'year') -> pd.DataFra
     else:
         return df.groupby(freq).size().reset_index(name='count')
 
+@track_allocations
 def prepare_stacked_bar_data(
     df: pd.DataFrame, 
     x_column: str, 
@@ -147,6 +736,7 @@ def prepare_stacked_bar_data(
     """
     return pd.crosstab(df[x_column], df[color_column])
 
+@track_allocations
 def prepare_correlation_data(df: pd.DataFrame) -> pd.DataFrame:
     """
     Prepare data for correlation analysis between numeric variables.
@@ -165,6 +755,7 @@ def prepare_correlation_data(df: pd.DataFrame) -> pd.DataFrame:
     else:
         return pd.DataFrame()
 
+@track_allocations
 def get_top_categories(
     df: pd.DataFrame, 
     column: str, 
@@ -185,6 +776,25 @@ def get_top_categories(
         return df[column].value_counts().head(top_n).index.tolist()
     return []
 
+# Severity columns of every severity table, in chart order
+SEVERITY_ORDER = list(SEVERITY_MAP)
+
+@track_allocations
+def severity_counts(df: pd.DataFrame, by: Union[str, pd.Series]) -> pd.DataFrame:
+    """
+    Crosstab of severity counts by a column (or a Series aligned with df).
+    
+    Every severity in SEVERITY_ORDER gets a column, with zeros for any the
+    filters removed, so charts plotting all three always find them.
+    """
+    groups = df[by] if isinstance(by, str) else by
+    return pd.crosstab(groups, df['severity']).reindex(columns=SEVERITY_ORDER, fill_value=0)
+
+def severity_percentages(counts: pd.DataFrame) -> pd.DataFrame:
+    """Row percentages of a severity_counts() table."""
+    return counts.div(counts.sum(axis=1), axis=0) * 100
+
+@track_allocations
 def prepare_severity_analysis(df: pd.DataFrame, by_column: str) -> pd.DataFrame:
     """
     Prepare severity analysis data grouped by a specified column.
@@ -197,14 +807,33 @@ def prepare_severity_analysis(df: pd.DataFrame, by_column: str) -> pd.DataFrame:
         DataFrame with severity counts by the specified column
     """
     if 'severity' in df.columns and by_column in df.columns:
-        severity_order = ['Slight', 'Serious', 'Fatal']
-        return pd.crosstab(
-            df[by_column], 
-            df['severity'], 
-            normalize='index'
-        ).reindex(columns=severity_order, fill_value=0) * 100
+        return severity_percentages(severity_counts(df, by_column))
     return pd.DataFrame()
 
+@track_allocations
+def prepare_severity_intervals(
+    df: pd.DataFrame,
+    by: Union[str, pd.Series],
+    n_resamples: int = 0
+) -> pd.DataFrame:
+    """
+    Severity rates by a column with their 95% intervals.
+    
+    Args:
+        df: Input dataframe
+        by: Column (or Series aligned with df) to group by
+        n_resamples: Bootstrap resamples; 0 for Wilson intervals only
+    
+    Returns:
+        rate_intervals() of the severity counts: one row per (group,
+        severity) with count, total, rate, low, high (and boot_low,
+        boot_high), in percent
+    """
+    if 'severity' in df.columns and (not isinstance(by, str) or by in df.columns):
+        return rate_intervals(severity_counts(df, by), n_resamples=n_resamples)
+    return pd.DataFrame()
+
+@track_allocations
 def format_large_numbers(number: float) -> str:
     """
     Format large numbers with K, M suffixes for better readability.
@@ -222,6 +851,7 @@ def format_large_numbers(number: float) -> str:
     else:
         return f"{number:,.0f}"
 
+@track_allocations
 def get_unique_values_for_filters(df: pd.DataFrame) -> Dict[str, List[str]]:
     """
     Get unique values for each categorical column to populate filter options.
@@ -247,6 +877,7 @@ def get_unique_values_for_filters(df: pd.DataFrame) -> Dict[str, List[str]]:
     
     return unique_values
 
+@track_allocations
 def calculate_accident_rates(df: pd.DataFrame, by_column: str) -> pd.DataFrame:
     """
     Calculate accident rates and percentages by a specified column.
@@ -273,6 +904,7 @@ def calculate_accident_rates(df: pd.DataFrame, by_column: str) -> pd.DataFrame:
 
 # Advanced Analysis Functions
 
+@track_allocations
 def extract_hour_from_time(df: pd.DataFrame) -> pd.DataFrame:
     """
     Extract hour from time column for temporal analysis.
@@ -284,7 +916,10 @@ def extract_hour_from_time(df: pd.DataFrame) -> pd.DataFrame:
         DataFrame with additional 'hour' column
     """
     df_copy = df.copy()
-    if 'time' in df.columns:
+    if 'hour' in df.columns:
+        # Stored at preprocess time as a categorical of the hours
+        df_copy['hour'] = df['hour'].astype(float)
+    elif 'time' in df.columns:
         # Handle both string and datetime time formats
         try:
             df_copy['hour'] = pd.to_datetime(df_copy['time'], format='%H:%M:%S').dt.hour
@@ -299,6 +934,7 @@ def extract_hour_from_time(df: pd.DataFrame) -> pd.DataFrame:
     
     return df_copy
 
+@track_allocations
 def prepare_severity_speed_heatmap(df: pd.DataFrame) -> pd.DataFrame:
     """
     Prepare data for severity vs speed limit heatmap.
@@ -310,57 +946,56 @@ def prepare_severity_speed_heatmap(df: pd.DataFrame) -> pd.DataFrame:
         Pivot table for heatmap visualization
     """
     if 'severity' in df.columns and 'speed_limit' in df.columns:
-        # Create speed bins
-        df_temp = df.copy()
-        df_temp = df_temp.dropna(subset=['speed_limit'])
-        
-        # Create speed limit bins
-        speed_bins = [0, 20, 30, 40, 50, 60, 70, 100]
-        speed_labels = ['≤20', '21-30', '31-40', '41-50', '51-60', '61-70', '>70']
+        # Speed limit bins (BIN_SCHEMES['speed_band']), stored by preprocess()
+        speed_bands = bin_column(df, 'speed_band')
         
         try:
-            df_temp['speed_bin'] = pd.cut(df_temp['speed_limit'], bins=speed_bins, labels=speed_labels, include_lowest=True)
-            
             # Create pivot table
-            heatmap_data = pd.crosstab(df_temp['speed_bin'], df_temp['severity'], normalize='index') * 100
+            heatmap_data = severity_percentages(severity_counts(df, speed_bands))
+            heatmap_data.index.name = 'speed_bin'
             return heatmap_data.round(1)
         except:
             return pd.DataFrame()
     
     return pd.DataFrame()
 
-def prepare_temporal_analysis(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+@track_allocations
+def prepare_temporal_analysis(df: pd.DataFrame, n_resamples: int = 0) -> Dict[str, pd.DataFrame]:
     """
     Prepare data for various temporal analyses.
     
     Args:
         df: Input dataframe
+        n_resamples: Bootstrap resamples of the severity-rate intervals
     
     Returns:
-        Dictionary with different temporal analysis datasets
+        Dictionary with different temporal analysis datasets; each severity
+        rate table 'x' comes with 'x_intervals' from prepare_severity_intervals()
     """
-    df_with_hour = extract_hour_from_time(df)
     results = {}
     
-    # Hourly distribution
-    if 'hour' in df_with_hour.columns:
-        hourly_data = df_with_hour.groupby('hour').size().reset_index(name='count')
-        results['hourly'] = hourly_data
+    # Hourly distribution, counted on the stored hour codes
+    hours = bin_column(df, 'hour')
+    if hours is not None:
+        codes = hours.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=24)
+        observed = np.flatnonzero(counts)
+        results['hourly'] = pd.DataFrame({'hour': observed, 'count': counts[observed]})
     
     # Weekday vs Weekend
     if 'day_of_week' in df.columns:
-        df_temp = df.copy()
-        df_temp['is_weekend'] = df_temp['day_of_week'].isin(['Saturday', 'Sunday'])
-        weekend_severity = pd.crosstab(df_temp['is_weekend'], df_temp['severity'], normalize='index') * 100
-        weekend_severity.index = ['Weekday', 'Weekend']
-        weekend_severity.index.name = 'day_type'  # Give the index a name
-        results['weekend_vs_weekday'] = weekend_severity
+        is_weekend = df['is_weekend'] if 'is_weekend' in df.columns else df['day_of_week'].isin(WEEKEND_DAYS)
+        weekend_counts = severity_counts(df, is_weekend)
+        weekend_counts.index = weekend_counts.index.map({False: 'Weekday', True: 'Weekend'})
+        weekend_counts.index.name = 'day_type'  # Give the index a name
+        results['weekend_vs_weekday'] = severity_percentages(weekend_counts)
+        results['weekend_vs_weekday_intervals'] = rate_intervals(weekend_counts, n_resamples=n_resamples)
     
     # Monthly trends with rolling average
     if 'date' in df.columns:
         monthly_counts = df.groupby(df['date'].dt.to_period('M')).size()
         monthly_df = pd.DataFrame({
-            'month': monthly_counts.index.astype(str),
+            'month': monthly_counts.index.to_timestamp(),
             'count': monthly_counts.values,
             'rolling_avg': monthly_counts.rolling(window=3, center=True).mean().values
         })
@@ -368,22 +1003,26 @@ def prepare_temporal_analysis(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
     
     return results
 
-def prepare_demographic_severity_analysis(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+@track_allocations
+def prepare_demographic_severity_analysis(df: pd.DataFrame, n_resamples: int = 0) -> Dict[str, pd.DataFrame]:
     """
     Prepare demographic-severity analysis data.
     
     Args:
         df: Input dataframe
+        n_resamples: Bootstrap resamples of the severity-rate intervals
     
     Returns:
-        Dictionary with demographic analysis datasets
+        Dictionary with demographic analysis datasets; each severity rate
+        table 'x' comes with 'x_intervals' from prepare_severity_intervals()
     """
     results = {}
     
     # Age vs Severity heatmap
     if 'age_grp' in df.columns and 'severity' in df.columns:
-        age_severity = pd.crosstab(df['age_grp'], df['severity'], normalize='index') * 100
-        results['age_severity_heatmap'] = age_severity.round(1)
+        age_counts = severity_counts(df, 'age_grp')
+        results['age_severity_heatmap'] = severity_percentages(age_counts).round(1)
+        results['age_severity_heatmap_intervals'] = rate_intervals(age_counts, n_resamples=n_resamples)
     
     # Gender vs Accident conditions
     if 'gender' in df.columns and 'road_conditions' in df.columns:
@@ -394,18 +1033,16 @@ def prepare_demographic_severity_analysis(df: pd.DataFrame) -> Dict[str, pd.Data
         results['gender_road_conditions'] = gender_road.round(1)
     
     # Age and Gender vs Time (if hour extraction is possible)
-    df_with_hour = extract_hour_from_time(df)
-    if 'hour' in df_with_hour.columns and 'age_grp' in df_with_hour.columns and 'gender' in df_with_hour.columns:
-        # Create age-gender groups for cleaner visualization
-        df_temp = df_with_hour.copy()
-        df_temp = df_temp.dropna(subset=['hour'])
-        
+    hours = bin_column(df, 'hour')
+    if hours is not None and 'age_grp' in df.columns and 'gender' in df.columns:
         # Aggregate by broader categories for clarity
-        age_gender_time = df_temp.groupby(['hour', 'gender']).size().reset_index(name='count')
+        age_gender_time = df.groupby([hours, df['gender']], observed=True).size().reset_index(name='count')
+        age_gender_time['hour'] = age_gender_time['hour'].astype(int)
         results['age_gender_time'] = age_gender_time
     
     return results
 
+@track_allocations
 def calculate_correlation_matrix(df: pd.DataFrame) -> pd.DataFrame:
     """
     Calculate correlation matrix for numerical variables.
@@ -433,6 +1070,7 @@ def calculate_correlation_matrix(df: pd.DataFrame) -> pd.DataFrame:
     
     return pd.DataFrame()
 
+@track_allocations
 def prepare_severity_trends_data(df: pd.DataFrame) -> pd.DataFrame:
     """
     Prepare severity trends over time for stacked area chart.
@@ -444,47 +1082,47 @@ def prepare_severity_trends_data(df: pd.DataFrame) -> pd.DataFrame:
         DataFrame with yearly severity counts
     """
     if 'year' in df.columns and 'severity' in df.columns:
-        severity_trends = df.groupby(['year', 'severity']).size().unstack(fill_value=0)
+        severity_trends = severity_counts(df, 'year')
         severity_trends = severity_trends.reset_index()
         return severity_trends
     
     return pd.DataFrame()
 
-def prepare_environmental_analysis(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+@track_allocations
+def prepare_environmental_analysis(df: pd.DataFrame, n_resamples: int = 0) -> Dict[str, pd.DataFrame]:
     """
     Prepare environmental condition analysis data.
     
     Args:
         df: Input dataframe
+        n_resamples: Bootstrap resamples of the severity-rate intervals
     
     Returns:
-        Dictionary with environmental analysis datasets
+        Dictionary with environmental analysis datasets; each severity rate
+        table 'x' comes with 'x_intervals' from prepare_severity_intervals()
     """
     results = {}
     
     # Weather vs Severity (normalized percentages)
     if 'weather_conditions' in df.columns and 'severity' in df.columns:
-        df_temp = df.copy()
-        df_temp['weather_conditions'] = group_rare_categories(df_temp['weather_conditions'], min_count=500)
-        weather_severity = pd.crosstab(df_temp['weather_conditions'], df_temp['severity'], normalize='index') * 100
-        results['weather_severity'] = weather_severity.round(1)
+        weather_counts = severity_counts(df, group_rare_categories(df['weather_conditions'], min_count=500))
+        results['weather_severity'] = severity_percentages(weather_counts).round(1)
+        results['weather_severity_intervals'] = rate_intervals(weather_counts, n_resamples=n_resamples)
     
     # Road Type vs Severity
     if 'road_type' in df.columns and 'severity' in df.columns:
-        df_temp = df.copy()
-        df_temp['road_type'] = group_rare_categories(df_temp['road_type'], min_count=500)
-        road_severity = pd.crosstab(df_temp['road_type'], df_temp['severity'])
+        road_severity = severity_counts(df, group_rare_categories(df['road_type'], min_count=500))
         results['road_type_severity'] = road_severity
     
     # Light Conditions vs Severity
     if 'light_conditions' in df.columns and 'severity' in df.columns:
-        df_temp = df.copy()
-        df_temp['light_conditions'] = group_rare_categories(df_temp['light_conditions'], min_count=500)
-        light_severity = pd.crosstab(df_temp['light_conditions'], df_temp['severity'], normalize='index') * 100
-        results['light_severity'] = light_severity.round(1)
+        light_counts = severity_counts(df, group_rare_categories(df['light_conditions'], min_count=500))
+        results['light_severity'] = severity_percentages(light_counts).round(1)
+        results['light_severity_intervals'] = rate_intervals(light_counts, n_resamples=n_resamples)
     
     return results
 
+@track_allocations
 def create_sankey_data(df: pd.DataFrame) -> Dict[str, Any]:
     """
     Prepare data for Sankey diagram showing flow from road_type -> weather -> severity.
@@ -541,4 +1179,50 @@ def create_sankey_data(df: pd.DataFrame) -> Dict[str, Any]:
         'sources': sources,
         'targets': targets,
         'values': values
-    }
\ No newline at end of file
+    }
+
+def _update_fingerprint(digest: hashlib.blake2b, data: Any) -> None:
+    """Feed the type, shape and contents of data into digest."""
+    if isinstance(data, pd.DataFrame):
+        digest.update(repr((list(data.columns), [str(t) for t in data.dtypes], data.shape)).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    elif isinstance(data, (pd.Series, pd.Index)):
+        digest.update(repr((type(data).__name__, data.name, str(data.dtype), len(data))).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=isinstance(data, pd.Series)).to_numpy().tobytes())
+    elif isinstance(data, np.ndarray):
+        digest.update(repr((str(data.dtype), data.shape)).encode())
+        if data.dtype == object:
+            digest.update(pd.util.hash_array(data.ravel()).tobytes())
+        else:
+            digest.update(np.ascontiguousarray(data).tobytes())
+    elif isinstance(data, dict):
+        digest.update(b'dict')
+        for key, value in data.items():
+            _update_fingerprint(digest, key)
+            _update_fingerprint(digest, value)
+    elif isinstance(data, (list, tuple)):
+        digest.update(f"{type(data).__name__}{len(data)}".encode())
+        for value in data:
+            _update_fingerprint(digest, value)
+    else:
+        digest.update(repr(data).encode())
+
+@track_allocations
+def data_fingerprint(data: Any) -> str:
+    """
+    Content hash of the data feeding a chart.
+    
+    Two inputs get the same fingerprint when they hold the same values,
+    labels and dtypes, so a figure built from one can be reused for the
+    other.
+    
+    Args:
+        data: A DataFrame, Series, Index, array, scalar, or a dict, list or
+            tuple of these
+    
+    Returns:
+        32-character hex digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    _update_fingerprint(digest, data)
+    return digest.hexdigest()
@@ -3,18 +3,46 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+SEVERITY_ORDER = ['Slight', 'Serious', 'Fatal']
+
+# A plot job is (render function, aggregate, save path, keyword arguments).
+# Aggregates are small (one value per year or category), so jobs are cheap to
+# send to worker processes; the row-level frame never leaves the parent.
+PlotJob = Tuple[Callable, Any, str, Dict[str, Any]]
 
 # Ensure processed folder exists
 def ensure_folder(path):
     os.makedirs(path, exist_ok=True)
 
-def accidents_over_time(df: pd.DataFrame, save_path: str = "processed/accidents_over_time.png"):
-    """Plot accidents per year and save to file."""
+# ---------------------------
+# Aggregates
+# ---------------------------
+
+def yearly_counts(df: pd.DataFrame) -> pd.Series:
+    """Number of accidents per year."""
+    return df.groupby('year').size()
+
+def severity_counts(df: pd.DataFrame) -> pd.Series:
+    """Number of accidents per severity, in Slight/Serious/Fatal order."""
+    return df['severity'].value_counts().reindex(SEVERITY_ORDER, fill_value=0)
+
+def gender_age_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Accident counts with genders as rows and age groups as columns."""
+    return df.groupby(['gender','age_grp']).size().unstack()
+
+# ---------------------------
+# Renderers (aggregate in, PNG out)
+# ---------------------------
+
+def plot_yearly_counts(yearly: pd.Series, save_path: str, title: str = "Number of Bicycle Accidents per Year"):
+    """Line plot of accidents per year."""
     ensure_folder(os.path.dirname(save_path))
-    yearly = df.groupby('year').size()
     plt.figure(figsize=(10,5))
     sns.lineplot(x=yearly.index, y=yearly.values, marker='o')
-    plt.title("Number of Bicycle Accidents per Year")
+    plt.title(title)
     plt.ylabel("Number of Accidents")
     plt.xlabel("Year")
     plt.grid(True)
@@ -22,23 +50,146 @@ def accidents_over_time(df: pd.DataFrame, save_path: str = "processed/accidents_
     plt.savefig(save_path)
     plt.close()  # closes the figure to free memory
 
-def severity_distribution(df: pd.DataFrame, save_path: str = "processed/severity_distribution.png"):
-    """Plot severity distribution and save to file."""
+def plot_severity_counts(counts: pd.Series, save_path: str, title: str = "Accident Severity Distribution"):
+    """Bar plot of accidents per severity."""
     ensure_folder(os.path.dirname(save_path))
     plt.figure(figsize=(6,4))
-    sns.countplot(x='severity', data=df, order=['Slight','Serious','Fatal'])
-    plt.title("Accident Severity Distribution")
+    ax = sns.barplot(x=list(counts.index), y=counts.values, order=list(counts.index))
+    ax.set_xlabel("severity")
+    ax.set_ylabel("count")
+    plt.title(title)
     plt.tight_layout()
     plt.savefig(save_path)
     plt.close()
 
-def accidents_by_gender_age(df: pd.DataFrame, save_path: str = "processed/accidents_by_gender_age.png"):
-    """Accidents by gender and age group."""
+def plot_gender_age_table(table: pd.DataFrame, save_path: str, title: str = "Accidents by Gender and Age Group"):
+    """Stacked bars of accidents by gender, split by age group."""
     ensure_folder(os.path.dirname(save_path))
-    table = df.groupby(['gender','age_grp']).size().unstack()
     table.plot(kind='bar', stacked=True, figsize=(12,6))
-    plt.title("Accidents by Gender and Age Group")
+    plt.title(title)
     plt.ylabel("Number of Accidents")
     plt.tight_layout()
     plt.savefig(save_path)
     plt.close()
+
+def plot_category_counts(counts: pd.Series, save_path: str, title: str, xlabel: str):
+    """Horizontal bars of accidents per category of a condition column."""
+    ensure_folder(os.path.dirname(save_path))
+    plt.figure(figsize=(8,5))
+    ordered = counts.sort_values()
+    plt.barh([str(label) for label in ordered.index], ordered.values)
+    plt.title(title)
+    plt.xlabel("Number of Accidents")
+    plt.ylabel(xlabel)
+    plt.tight_layout()
+    plt.savefig(save_path)
+    plt.close()
+
+# ---------------------------
+# Single-plot API used by main.py and the notebook
+# ---------------------------
+
+def accidents_over_time(df: pd.DataFrame, save_path: str = "processed/accidents_over_time.png"):
+    """Plot accidents per year and save to file."""
+    plot_yearly_counts(yearly_counts(df), save_path)
+
+def severity_distribution(df: pd.DataFrame, save_path: str = "processed/severity_distribution.png"):
+    """Plot severity distribution and save to file."""
+    plot_severity_counts(severity_counts(df), save_path)
+
+def accidents_by_gender_age(df: pd.DataFrame, save_path: str = "processed/accidents_by_gender_age.png"):
+    """Accidents by gender and age group."""
+    plot_gender_age_table(gender_age_table(df), save_path)
+
+# ---------------------------
+# Batch rendering
+# ---------------------------
+
+def build_plot_jobs(
+    df: pd.DataFrame,
+    output_dir: str = "processed",
+    per_severity: bool = False,
+    per_year: bool = False,
+    condition_columns: Sequence[str] = ()
+) -> List[PlotJob]:
+    """
+    Compute every plot's aggregate once and return the render jobs.
+
+    The three standard plots are always included. Small multiples reuse a
+    single grouped count each, so adding them costs one pass over the rows
+    rather than one pass per figure.
+
+    Args:
+        df: Preprocessed dataframe
+        output_dir: Folder the PNG files are written to
+        per_severity: Add a yearly trend figure for each severity
+        per_year: Add a severity distribution figure for each year
+        condition_columns: Columns (e.g. 'road_conditions') to add count plots for
+
+    Returns:
+        List of (render function, aggregate, save path, kwargs) jobs
+    """
+    jobs: List[PlotJob] = [
+        (plot_yearly_counts, yearly_counts(df), os.path.join(output_dir, "accidents_over_time.png"), {}),
+        (plot_severity_counts, severity_counts(df), os.path.join(output_dir, "severity_distribution.png"), {}),
+        (plot_gender_age_table, gender_age_table(df), os.path.join(output_dir, "accidents_by_gender_age.png"), {}),
+    ]
+
+    if per_severity or per_year:
+        year_severity = df.groupby(['year', 'severity']).size().unstack(fill_value=0)
+        year_severity = year_severity.reindex(columns=SEVERITY_ORDER, fill_value=0)
+        multiples_dir = os.path.join(output_dir, "small_multiples")
+        if per_severity:
+            for severity in SEVERITY_ORDER:
+                jobs.append((
+                    plot_yearly_counts, year_severity[severity],
+                    os.path.join(multiples_dir, f"accidents_over_time_{severity.lower()}.png"),
+                    {'title': f"{severity} Bicycle Accidents per Year"}
+                ))
+        if per_year:
+            for year, counts in year_severity.iterrows():
+                jobs.append((
+                    plot_severity_counts, counts,
+                    os.path.join(multiples_dir, f"severity_distribution_{int(year)}.png"),
+                    {'title': f"Accident Severity Distribution ({int(year)})"}
+                ))
+
+    for column in condition_columns:
+        if column in df.columns:
+            label = column.replace('_', ' ').title()
+            jobs.append((
+                plot_category_counts, df[column].value_counts(),
+                os.path.join(output_dir, f"accidents_by_{column}.png"),
+                {'title': f"Accidents by {label}", 'xlabel': label}
+            ))
+
+    return jobs
+
+def _init_render_worker():
+    """Use the non-interactive backend in worker processes."""
+    import matplotlib
+    matplotlib.use("Agg")
+
+def _render_job(job: PlotJob) -> str:
+    render, aggregate, save_path, kwargs = job
+    render(aggregate, save_path, **kwargs)
+    return save_path
+
+def render_plots(jobs: List[PlotJob], max_workers: Optional[int] = None) -> List[str]:
+    """
+    Render plot jobs in a process pool on the Agg backend.
+
+    Args:
+        jobs: Jobs from build_plot_jobs
+        max_workers: Worker processes (defaults to the CPU count); 1 renders
+            in the current process
+
+    Returns:
+        Paths of the saved figures, in job order
+    """
+    workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        return [_render_job(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker) as pool:
+        return list(pool.map(_render_job, jobs))
@@ -1,5 +1,37 @@
 # src/etl.py
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pa_csv
+
+from src.preprocessing import ACCIDENT_ID
+
+# Declared column types of the raw extracts. Passing them to the Arrow reader
+# skips type inference and keeps dtypes stable across data releases; columns
+# not listed here are still inferred.
+ACCIDENTS_SCHEMA: Dict[str, pa.DataType] = {
+    'Accident_Index': pa.string(),
+    'Number_of_Vehicles': pa.int64(),
+    'Number_of_Casualties': pa.int64(),
+    'Date': pa.string(),
+    'Time': pa.string(),
+    'Speed_limit': pa.float64(),
+    'Road_conditions': pa.string(),
+    'Weather_conditions': pa.string(),
+    'Day': pa.string(),
+    'Road_type': pa.string(),
+    'Light_conditions': pa.string(),
+}
+BIKERS_SCHEMA: Dict[str, pa.DataType] = {
+    'Accident_Index': pa.string(),
+    'Gender': pa.string(),
+    'Severity': pa.string(),
+    'Age_Grp': pa.string(),
+}
 
 def load_csv(path: str, low_memory: bool = False) -> pd.DataFrame:
     """
@@ -7,13 +39,114 @@ def load_csv(path: str, low_memory: bool = False) -> pd.DataFrame:
     """
     return pd.read_csv(path, low_memory=low_memory)
 
+def load_csv_arrow(path: str, schema: Optional[Dict[str, pa.DataType]] = None, use_threads: bool = True) -> pd.DataFrame:
+    """
+    Load CSV into DataFrame with Arrow's block-parallel reader.
+
+    Blocks of the file are parsed on Arrow's thread pool, so one file uses
+    every core instead of one. Empty fields become missing values, as with
+    pd.read_csv.
+
+    Args:
+        path: CSV file path
+        schema: Column name to Arrow type for columns with a declared type
+        use_threads: Parse blocks in parallel
+
+    Returns:
+        DataFrame with the same columns as pd.read_csv would produce
+    """
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(use_threads=use_threads, block_size=16 * 1024 * 1024),
+        convert_options=pa_csv.ConvertOptions(column_types=schema or {}, strings_can_be_null=True)
+    )
+    return table.to_pandas()
+
+def load_accidents_bikers(accidents_path: str, bikers_path: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Parse Accidents.csv and Bikers.csv concurrently.
+
+    Each file is read with the multithreaded Arrow reader on its own thread;
+    the call returns once both frames are ready.
+
+    Returns:
+        Tuple of (accidents, bikers) DataFrames
+    """
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        accidents = pool.submit(load_csv_arrow, accidents_path, ACCIDENTS_SCHEMA)
+        bikers = pool.submit(load_csv_arrow, bikers_path, BIKERS_SCHEMA)
+        return accidents.result(), bikers.result()
+
+def intern_accident_index(
+    accidents: pd.DataFrame,
+    bikers: pd.DataFrame
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Replace the Accident_Index strings of both frames by integer accident_id codes.
+
+    Codes are assigned in Accidents.csv order; cyclists whose Accident_Index
+    has no accident get -1 and drop out of the inner join. The strings are
+    kept once, in a side dictionary whose row i is the index of accident_id i.
+
+    Returns:
+        Tuple of (accidents, bikers, accident_index dictionary)
+    """
+    codes, uniques = pd.factorize(accidents['Accident_Index'], use_na_sentinel=False)
+    # Arrow's hash lookup is faster than Index.get_indexer on string keys
+    biker_codes = pc.index_in(pa.array(bikers['Accident_Index']), value_set=pa.array(uniques))
+    biker_codes = biker_codes.fill_null(-1).to_numpy()
+
+    accidents = accidents.drop(columns='Accident_Index')
+    accidents.insert(0, ACCIDENT_ID, codes.astype(np.int32))
+    bikers = bikers.drop(columns='Accident_Index')
+    bikers.insert(0, ACCIDENT_ID, biker_codes.astype(np.int32))
+    return accidents, bikers, pd.DataFrame({'accident_index': uniques})
+
+def iter_merged_batches(
+    accidents_path: str,
+    bikers_path: str,
+    block_size: int = 64 * 1024 * 1024
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream Accidents.csv in blocks and yield each block merged with Bikers.
+
+    Bikers (four narrow columns) is loaded once; accidents are parsed one
+    block at a time, so the wide accident columns are never all in memory.
+    Batches come out in the row order of merge_accidents_bikers.
+
+    Args:
+        accidents_path: Path to Accidents.csv
+        bikers_path: Path to Bikers.csv
+        block_size: Bytes of Accidents.csv parsed per batch
+
+    Yields:
+        Merged DataFrames with the raw column names
+    """
+    bikers = load_csv_arrow(bikers_path, BIKERS_SCHEMA)
+    reader = pa_csv.open_csv(
+        accidents_path,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(column_types=ACCIDENTS_SCHEMA, strings_can_be_null=True)
+    )
+    for record_batch in reader:
+        merged = merge_frames(record_batch.to_pandas(), bikers)
+        if len(merged):
+            yield merged
+
+def merge_frames(accidents: pd.DataFrame, bikers: pd.DataFrame) -> pd.DataFrame:
+    """
+    Inner-join loaded accidents and bikers frames on accident_id when both
+    were interned, otherwise on Accident_Index.
+    """
+    key = ACCIDENT_ID if ACCIDENT_ID in accidents.columns and ACCIDENT_ID in bikers.columns else 'Accident_Index'
+    return pd.merge(accidents, bikers, on=key, how='inner')
+
 def merge_accidents_bikers(accidents_path: str, bikers_path: str) -> pd.DataFrame:
     """
     Merge accidents and bikers datasets on Accident_Index.
     Returns merged DataFrame.
     """
-    accidents = load_csv(accidents_path)
-    bikers = load_csv(bikers_path)
-    
-    df = pd.merge(accidents, bikers, on='Accident_Index', how='inner')
+    accidents, bikers = load_accidents_bikers(accidents_path, bikers_path)
+
+    df = merge_frames(accidents, bikers)
     return df
@@ -0,0 +1,148 @@
+# src/export.py
+import os
+import tempfile
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from src.preprocessing import arrow_schema
+
+# Label -> (file extension, MIME type)
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Arrow IPC': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+DEFAULT_BATCH_ROWS = 100_000
+
+
+def iter_export_batches(
+    df: pd.DataFrame,
+    transform: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    order: Optional[np.ndarray] = None
+) -> Iterator[pa.Table]:
+    """
+    Convert a frame to Arrow one slice of rows at a time.
+
+    Args:
+        df: Rows to export
+        transform: Applied to each slice before conversion, e.g. to select
+            columns or decode Accident_Index
+        batch_rows: Rows per slice
+        order: Positions of the rows to export, in export order; each slice
+            is gathered from df as it is converted, so the reordered frame
+            is never built whole. Defaults to every row in frame order
+
+    Yields:
+        Arrow tables sharing the schema of the first slice
+    """
+    schema = None
+    n_rows = len(df) if order is None else len(order)
+    for start in range(0, max(n_rows, 1), batch_rows):
+        if order is None:
+            rows = df.iloc[start:start + batch_rows]
+        else:
+            rows = df.iloc[order[start:start + batch_rows]]
+        if transform is not None:
+            rows = transform(rows)
+        if schema is None:
+            schema = arrow_schema(rows)
+        yield pa.Table.from_pandas(rows, schema=schema, preserve_index=False)
+
+
+def _csv_schema(schema: pa.Schema) -> pa.Schema:
+    """Whole-second times and timestamps, so CSV cells read '21:05:00' rather than '21:05:00.000000'."""
+    fields = []
+    for field in schema:
+        if pa.types.is_time(field.type):
+            field = field.with_type(pa.time32('s'))
+        elif pa.types.is_timestamp(field.type):
+            field = field.with_type(pa.timestamp('s', tz=field.type.tz))
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def write_export(batches: Iterator[pa.Table], export_format: str, path: str) -> None:
+    """
+    Stream Arrow batches to a file in one of EXPORT_FORMATS.
+
+    Each batch is written as soon as it is converted, so memory holds one
+    batch plus the writer's buffers whatever the number of rows.
+    """
+    writer = None
+    sink = None
+    try:
+        for batch in batches:
+            if writer is None:
+                schema = batch.schema
+                if export_format == 'CSV (gzip)':
+                    schema = _csv_schema(schema)
+                    sink = pa.CompressedOutputStream(path, 'gzip')
+                    writer = pa_csv.CSVWriter(sink, schema)
+                elif export_format == 'Parquet':
+                    writer = pq.ParquetWriter(path, schema)
+                elif export_format == 'Arrow IPC':
+                    sink = pa.OSFile(path, 'wb')
+                    writer = pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+                else:
+                    raise ValueError(f"Unknown export format: {export_format}")
+            if batch.schema != schema:
+                batch = batch.cast(schema, safe=False)
+            writer.write_table(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+
+
+def export_to_tempfile(
+    df: pd.DataFrame,
+    export_format: str,
+    transform: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    order: Optional[np.ndarray] = None
+) -> str:
+    """
+    Write df (or its rows at order, see iter_export_batches()) to a
+    temporary file in the given format and return its path.
+
+    The caller owns the file and should delete it once it has been sent.
+    """
+    extension = EXPORT_FORMATS[export_format][0]
+    fd, path = tempfile.mkstemp(suffix=f".{extension}", prefix="bicycle_accidents_")
+    os.close(fd)
+    try:
+        write_export(iter_export_batches(df, transform, batch_rows, order), export_format, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def open_export(
+    df: pd.DataFrame,
+    export_format: str,
+    transform: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    order: Optional[np.ndarray] = None
+) -> BinaryIO:
+    """
+    Export df to a temporary file and return it open for reading.
+
+    The file is unlinked straight away; its space is released when the
+    returned handle is closed.
+    """
+    path = export_to_tempfile(df, export_format, transform, batch_rows, order)
+    handle = open(path, 'rb')
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # open files cannot be unlinked on Windows; the temp dir is cleaned by the OS
+    return handle
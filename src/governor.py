@@ -0,0 +1,180 @@
+# src/governor.py
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from src.perf import frame_nbytes
+
+# Eviction tiers: higher tiers are dropped first, TIER_BASE never
+TIER_BASE = 0      # the loaded tables
+TIER_INDEX = 1     # shared indexes that are slow to rebuild (permutations, lookups, codes)
+TIER_DERIVED = 2   # per-filter results, figures and per-session state
+
+DEFAULT_BUDGET_MB = 1024
+
+
+@dataclass
+class _Entry:
+    nbytes: int
+    tier: int
+    cost_s: float
+    priority: float
+    evict: Optional[Callable[[], None]]
+
+
+class MemoryGovernor:
+    """
+    Account the bytes held by the dashboard's caches and keep them under a budget.
+
+    Every cached value is registered under (cache name, key) with its size,
+    an eviction tier and the time it took to compute. When the total exceeds
+    the budget, entries are evicted from the highest tier first; within a
+    tier the choice is cost-aware LRU (GreedyDual-Size): an entry's priority
+    is the clock at its last use plus its compute time per byte, so large,
+    cheap, stale entries go first. Evicting calls the entry's callback, which
+    drops the value from its owner cache. TIER_BASE entries count towards
+    usage but are never evicted.
+
+    Example:
+        governor.register('filter_results', key, nbytes, cost_s=0.2, evict=lambda: cache.discard(key))
+        governor.touch('filter_results', key)  # on a hit
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.evictions = 0
+        self._entries: Dict[Tuple[str, Hashable], _Entry] = {}
+        self._clock = 0.0
+        self._lock = threading.RLock()
+
+    def _priority(self, nbytes: int, cost_s: float) -> float:
+        return self._clock + (cost_s + 1e-6) / max(nbytes, 1)
+
+    def register(
+        self,
+        cache: str,
+        key: Hashable,
+        nbytes: int,
+        tier: int = TIER_DERIVED,
+        cost_s: float = 0.0,
+        evict: Optional[Callable[[], None]] = None
+    ) -> None:
+        """Account a cached value (replacing any previous entry) and enforce the budget."""
+        with self._lock:
+            self._entries[(cache, key)] = _Entry(nbytes, tier, cost_s, self._priority(nbytes, cost_s), evict)
+            victims = self._select_victims(protect=(cache, key))
+        self._run_evictions(victims)
+
+    def touch(self, cache: str, key: Hashable) -> None:
+        """Mark an entry as just used."""
+        with self._lock:
+            entry = self._entries.get((cache, key))
+            if entry is not None:
+                entry.priority = self._priority(entry.nbytes, entry.cost_s)
+
+    def release(self, cache: str, key: Hashable) -> None:
+        """Forget an entry its owner has dropped by itself."""
+        with self._lock:
+            self._entries.pop((cache, key), None)
+
+    def trim(self, target_bytes: Optional[int] = None) -> int:
+        """Evict down to target_bytes (default: the budget); returns the bytes freed."""
+        with self._lock:
+            before = self.used_bytes()
+            victims = self._select_victims(target_bytes=target_bytes)
+        self._run_evictions(victims)
+        return before - self.used_bytes()
+
+    def used_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def _select_victims(
+        self,
+        protect: Optional[Tuple[str, Hashable]] = None,
+        target_bytes: Optional[int] = None
+    ) -> List[_Entry]:
+        target = self.budget_bytes if target_bytes is None else target_bytes
+        used = sum(entry.nbytes for entry in self._entries.values())
+        if used <= target:
+            return []
+        candidates = sorted(
+            ((name, entry) for name, entry in self._entries.items() if entry.tier > TIER_BASE and name != protect),
+            key=lambda item: (-item[1].tier, item[1].priority)
+        )
+        victims = []
+        for name, entry in candidates:
+            if used <= target:
+                break
+            del self._entries[name]
+            self._clock = max(self._clock, entry.priority)
+            used -= entry.nbytes
+            self.evictions += 1
+            victims.append(entry)
+        return victims
+
+    @staticmethod
+    def _run_evictions(victims: List[_Entry]) -> None:
+        # Outside the lock: callbacks take their owner's lock and may call release()
+        for entry in victims:
+            if entry.evict is not None:
+                entry.evict()
+
+    def usage(self) -> Dict[str, Any]:
+        """Budget, total and per-cache bytes and entry counts."""
+        with self._lock:
+            caches: Dict[str, Dict[str, int]] = {}
+            for (cache, _), entry in self._entries.items():
+                row = caches.setdefault(cache, {'entries': 0, 'bytes': 0, 'tier': entry.tier})
+                row['entries'] += 1
+                row['bytes'] += entry.nbytes
+            return {
+                'budget_bytes': self.budget_bytes,
+                'used_bytes': sum(row['bytes'] for row in caches.values()),
+                'evictions': self.evictions,
+                'caches': caches
+            }
+
+
+class GovernedStore:
+    """
+    Dictionary whose entries are accounted, and may be evicted, by a MemoryGovernor.
+
+    Used for per-session state that would otherwise live in st.session_state
+    beyond the governor's reach; an evicted value is simply rebuilt by its
+    session on next use.
+    """
+
+    def __init__(self, governor: MemoryGovernor, name: str, tier: int = TIER_DERIVED):
+        self.governor = governor
+        self.name = name
+        self.tier = tier
+        self._values: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._values.get(key)
+        if value is not None:
+            self.governor.touch(self.name, key)
+        return value
+
+    def put(self, key: Hashable, value: Any, cost_s: float = 0.0) -> None:
+        """Store (or re-account, after an in-place update) a value."""
+        with self._lock:
+            self._values[key] = value
+        self.governor.register(self.name, key, frame_nbytes(value), tier=self.tier, cost_s=cost_s,
+                               evict=lambda: self.discard(key))
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+        self.governor.release(self.name, key)
+
+
+def timed(func: Callable[[], Any]) -> Tuple[Any, float]:
+    """Call func and return (result, seconds taken), the cost to register."""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
@@ -0,0 +1,107 @@
+# src/intervals.py
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+Z_95 = 1.959964
+# Resamples drawn when bootstrap intervals are asked for
+BOOTSTRAP_RESAMPLES = 2_000
+
+
+def wilson_bounds(successes: np.ndarray, totals: np.ndarray, z: float = Z_95) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Wilson score interval of the proportions successes / totals, element-wise.
+
+    Unlike the normal (Wald) interval it stays inside [0, 1] and does not
+    collapse to zero width for a rate of 0 or 1 in a small category.
+    Entries with a total of 0 get NaN bounds.
+
+    Returns:
+        (low, high) as float arrays of proportions, broadcast from the inputs
+    """
+    successes = np.asarray(successes, dtype=np.float64)
+    totals = np.asarray(totals, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = successes / totals
+        z2 = z * z
+        denominator = 1 + z2 / totals
+        centre = (p + z2 / (2 * totals)) / denominator
+        half = z * np.sqrt(p * (1 - p) / totals + z2 / (4 * totals * totals)) / denominator
+    empty = totals <= 0
+    return np.where(empty, np.nan, np.clip(centre - half, 0, 1)), np.where(empty, np.nan, np.clip(centre + half, 0, 1))
+
+
+def bootstrap_bounds(
+    counts: np.ndarray,
+    n_resamples: int = BOOTSTRAP_RESAMPLES,
+    level: float = 0.95,
+    seed: Optional[int] = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Percentile bootstrap interval of each row's proportions in a count table.
+
+    Every row is resampled as a whole: n_resamples multinomial draws of its
+    total over its observed proportions, for all rows in one call, so the
+    cost depends on the table's size, not on the rows it was counted from.
+
+    Args:
+        counts: (categories, outcomes) array of counts
+        n_resamples: Number of bootstrap resamples
+        level: Coverage of the interval
+        seed: Random seed
+
+    Returns:
+        (low, high) arrays of proportions shaped like counts; NaN for rows
+        with no counts
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    totals = counts.sum(axis=1)
+    empty = totals == 0
+    pvals = counts / np.where(empty, 1, totals)[:, None]
+    pvals[empty] = 1 / counts.shape[1]
+    draws = np.random.default_rng(seed).multinomial(totals, pvals, size=(n_resamples, len(counts)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = draws / totals[None, :, None]
+    tail = (1 - level) / 2 * 100
+    low, high = np.percentile(rates, [tail, 100 - tail], axis=0)
+    low[empty], high[empty] = np.nan, np.nan
+    return low, high
+
+
+def rate_intervals(
+    counts: pd.DataFrame,
+    z: float = Z_95,
+    n_resamples: int = 0,
+    seed: Optional[int] = 0
+) -> pd.DataFrame:
+    """
+    Row percentages of a count crosstab with their uncertainty.
+
+    Args:
+        counts: Crosstab of counts, one row per category and one column per
+            outcome, as returned by pd.crosstab()
+        z: Normal quantile of the Wilson interval (1.96 for 95%)
+        n_resamples: Bootstrap resamples; 0 skips the bootstrap interval
+        seed: Random seed of the bootstrap
+
+    Returns:
+        One row per (category, outcome) with the crosstab's index and column
+        names plus 'count', 'total', 'rate', 'low' and 'high' (Wilson), and
+        'boot_low' and 'boot_high' when n_resamples > 0; rates and bounds
+        are percentages
+    """
+    values = counts.to_numpy(dtype=np.int64)
+    totals = np.broadcast_to(values.sum(axis=1, keepdims=True), values.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = values / totals
+    low, high = wilson_bounds(values, totals, z)
+    columns = {'count': values, 'total': totals, 'rate': rates * 100, 'low': low * 100, 'high': high * 100}
+    if n_resamples > 0:
+        boot_low, boot_high = bootstrap_bounds(values, n_resamples, seed=seed)
+        columns.update(boot_low=boot_low * 100, boot_high=boot_high * 100)
+    index = pd.MultiIndex.from_product(
+        [counts.index, counts.columns],
+        names=[counts.index.name or 'category', counts.columns.name or 'outcome']
+    )
+    return pd.DataFrame({name: np.ravel(column) for name, column in columns.items()}, index=index).reset_index()
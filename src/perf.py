@@ -0,0 +1,616 @@
+# src/perf.py
+import os
+import json
+import time
+import threading
+import platform
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psutil
+
+MB = 1024 * 1024
+
+
+class PeakRSSSampler:
+    """Track the peak resident set size of this process in a background thread."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._process = psutil.Process(os.getpid())
+        self._stop = threading.Event()
+        self._thread = None
+        self.start_rss = 0
+        self.peak_rss = 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = self._process.memory_info().rss
+            if rss > self.peak_rss:
+                self.peak_rss = rss
+
+    def __enter__(self):
+        self.start_rss = self.peak_rss = self._process.memory_info().rss
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end_rss = self._process.memory_info().rss
+        self.peak_rss = max(self.peak_rss, self.end_rss)
+        return False
+
+
+def measure(func: Callable, *args, **kwargs) -> Tuple[Any, Dict[str, float]]:
+    """
+    Run a callable and measure its wall time and memory.
+
+    Args:
+        func: Callable to run
+        *args, **kwargs: Arguments passed to the callable
+
+    Returns:
+        Tuple of (result, metrics) where metrics holds wall_time_s,
+        peak_rss_mb (peak above the starting RSS) and rss_delta_mb
+    """
+    with PeakRSSSampler() as sampler:
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        wall_time = time.perf_counter() - start
+
+    return result, {
+        'wall_time_s': round(wall_time, 6),
+        'peak_rss_mb': round((sampler.peak_rss - sampler.start_rss) / MB, 2),
+        'rss_delta_mb': round((sampler.end_rss - sampler.start_rss) / MB, 2)
+    }
+
+
+def environment_info() -> Dict[str, Any]:
+    """Describe the machine a measurement was taken on."""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'total_memory_mb': round(psutil.virtual_memory().total / MB)
+    }
+
+
+def load_history(path: str) -> List[Dict[str, Any]]:
+    """Load previous benchmark runs from a JSON history file."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def append_history(path: str, run: Dict[str, Any]) -> None:
+    """Append a benchmark run to a JSON history file."""
+    history = load_history(path)
+    history.append(run)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(history, f, indent=2)
+
+
+def new_run(label: Optional[str] = None) -> Dict[str, Any]:
+    """Create an empty benchmark run record."""
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'label': label,
+        'environment': environment_info(),
+        'results': []
+    }
+
+
+def find_regressions(
+    run: Dict[str, Any],
+    history: List[Dict[str, Any]],
+    threshold: float = 0.2,
+    min_wall_time: float = 0.01
+) -> List[Dict[str, Any]]:
+    """
+    Compare a run against the most recent previous result of each case.
+
+    Args:
+        run: Benchmark run to check
+        history: Previous runs, oldest first
+        threshold: Relative slowdown (0.2 = 20%) flagged as a regression
+        min_wall_time: Cases faster than this in both runs are ignored as noise
+
+    Returns:
+        List of regressions with the previous and current measurements
+    """
+    previous = {}
+    for past in history:
+        for result in past.get('results', []):
+            previous[(result['case'], result['rows'])] = result
+
+    regressions = []
+    for result in run['results']:
+        before = previous.get((result['case'], result['rows']))
+        if before is None or 'error' in result or 'error' in before:
+            continue
+        if max(before['wall_time_s'], result['wall_time_s']) < min_wall_time:
+            continue
+        ratio = result['wall_time_s'] / max(before['wall_time_s'], 1e-9)
+        if ratio > 1 + threshold:
+            regressions.append({
+                'case': result['case'],
+                'rows': result['rows'],
+                'previous_s': before['wall_time_s'],
+                'current_s': result['wall_time_s'],
+                'slowdown': round(ratio, 2)
+            })
+    return regressions
+
+
+class RunReport:
+    """
+    Collect per-stage measurements for a pipeline run.
+
+    Each stage records wall time, CPU time, rows in and out, and the RSS at
+    start and end of the stage together with its peak. Extra values (such as
+    output sizes) can be attached to a stage through the dict it yields.
+
+    Example:
+        report = RunReport("main.py")
+        with report.stage("preprocess", rows_in=len(df)) as stage:
+            df_clean = preprocess(df)
+            stage['rows_out'] = len(df_clean)
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.stages: List[Dict[str, Any]] = []
+        self.metrics: Dict[str, Any] = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None):
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        with PeakRSSSampler() as sampler:
+            try:
+                yield record
+            finally:
+                wall_time = time.perf_counter() - wall_start
+                cpu_time = time.process_time() - cpu_start
+        rows = record['rows_in'] if record['rows_in'] is not None else record['rows_out']
+        record.update({
+            'wall_time_s': round(wall_time, 4),
+            'cpu_time_s': round(cpu_time, 4),
+            'rows_per_s': round(rows / wall_time) if rows and wall_time > 0 else None,
+            'rss_start_mb': round(sampler.start_rss / MB, 1),
+            'rss_end_mb': round(sampler.end_rss / MB, 1),
+            'rss_delta_mb': round((sampler.end_rss - sampler.start_rss) / MB, 1),
+            'peak_rss_mb': round(sampler.peak_rss / MB, 1)
+        })
+        self.stages.append(record)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the report as a JSON-serialisable dict."""
+        return {
+            'name': self.name,
+            'started_at': self.started_at,
+            'total_wall_time_s': round(time.perf_counter() - self._start, 4),
+            'peak_rss_mb': max((s['peak_rss_mb'] for s in self.stages), default=None),
+            'environment': environment_info(),
+            'metrics': self.metrics,
+            'stages': self.stages
+        }
+
+    def write_json(self, path: str, history_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Write the report to a JSON file.
+
+        Args:
+            path: File the latest report is written to
+            history_path: Optional JSON Lines file the report is appended to
+
+        Returns:
+            The report dict that was written
+        """
+        report = self.to_dict()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        if history_path:
+            with open(history_path, "a") as f:
+                f.write(json.dumps(report) + "\n")
+        return report
+
+    def summary(self) -> str:
+        """Format the stages as a human-readable table."""
+        report = self.to_dict()
+        total = report['total_wall_time_s'] or 1e-9
+        header = f"{'Stage':<30}{'Wall s':>9}{'CPU s':>9}{'%':>6}{'Rows in':>12}{'Rows out':>12}{'Rows/s':>12}{'Peak MB':>10}{'Δ MB':>9}"
+        lines = [f"Run report: {self.name}", header, "-" * len(header)]
+        for s in self.stages:
+            lines.append(
+                f"{s['stage']:<30}{s['wall_time_s']:>9.2f}{s['cpu_time_s']:>9.2f}"
+                f"{100 * s['wall_time_s'] / total:>6.1f}"
+                f"{_fmt_count(s['rows_in']):>12}{_fmt_count(s['rows_out']):>12}{_fmt_count(s['rows_per_s']):>12}"
+                f"{s['peak_rss_mb']:>10.1f}{s['rss_delta_mb']:>9.1f}"
+            )
+            extras = {k: v for k, v in s.items() if k not in _STAGE_FIELDS}
+            if extras:
+                lines.append("    " + ", ".join(f"{k}={v}" for k, v in extras.items()))
+        lines.append("-" * len(header))
+        lines.append(f"Total {report['total_wall_time_s']:.2f}s, peak RSS {report['peak_rss_mb']} MB")
+        if self.metrics:
+            lines.append(", ".join(f"{k}={v}" for k, v in self.metrics.items()))
+        return "\n".join(lines)
+
+
+_STAGE_FIELDS = {
+    'stage', 'rows_in', 'rows_out', 'wall_time_s', 'cpu_time_s', 'rows_per_s',
+    'rss_start_mb', 'rss_end_mb', 'rss_delta_mb', 'peak_rss_mb'
+}
+
+
+def _fmt_count(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:,.0f}"
+
+
+# Cache misses are recorded from inside cached functions, whose bodies only run
+# on a miss. Module state survives Streamlit reruns, unlike app.py globals.
+_cache_misses: Dict[str, int] = {}
+_cache_footprints: Dict[str, int] = {}
+
+
+def record_cache_miss(name: str, nbytes: Optional[int] = None) -> None:
+    """Note that a cached function body ran, with the size of what it cached."""
+    _cache_misses[name] = _cache_misses.get(name, 0) + 1
+    if nbytes is not None:
+        _cache_footprints[name] = int(nbytes)
+
+
+def cache_miss_count(name: str) -> int:
+    """Number of times a cached function body has run in this process."""
+    return _cache_misses.get(name, 0)
+
+
+def cache_footprint(name: str) -> Optional[int]:
+    """Bytes held by the most recent value cached under a name."""
+    return _cache_footprints.get(name)
+
+
+class RerunProfiler:
+    """
+    Time the sections of each dashboard rerun and keep a rolling history.
+
+    A disabled profiler still yields records from section() so call sites need
+    no branching, but measures and stores nothing.
+
+    Example:
+        profiler.start_rerun({'year_range': (1990, 2000)})
+        with profiler.section("load_data", cache_name="load_data") as s:
+            df = load_data()
+            s['rows'] = len(df)
+        profiler.finish_rerun()
+    """
+
+    def __init__(self, enabled: bool = True, history_size: int = 500, log_path: Optional[str] = None):
+        self.enabled = enabled
+        self.history_size = history_size
+        self.log_path = log_path
+        self.history: List[Dict[str, Any]] = []
+        self.current: Optional[Dict[str, Any]] = None
+        self.allocations: Optional['AllocationProfiler'] = None
+        self._rerun_start = 0.0
+
+    def start_rerun(self, context: Optional[Dict[str, Any]] = None, profile_allocations: bool = False) -> None:
+        """
+        Begin timing a rerun.
+
+        Args:
+            context: Values describing the rerun, such as the active filters
+            profile_allocations: Also attribute allocations to each section and
+                to src.dashboard_utils functions for this rerun (slower)
+        """
+        if not self.enabled:
+            return
+        if profile_allocations:
+            self.allocations = start_allocation_profiling()
+        self._rerun_start = time.perf_counter()
+        self.current = {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'context': context or {},
+            'sections': []
+        }
+
+    def set_context(self, **context) -> None:
+        """Attach values (such as the active filters) to the current rerun."""
+        if self.enabled and self.current is not None:
+            self.current['context'].update(context)
+
+    @contextmanager
+    def section(self, name: str, rows: Optional[int] = None, cache_name: Optional[str] = None):
+        record = {'section': name, 'rows': rows}
+        if not self.enabled or self.current is None:
+            yield record
+            return
+
+        misses_before = cache_miss_count(cache_name) if cache_name else 0
+        start = time.perf_counter()
+        try:
+            if self.allocations is not None:
+                with self.allocations.track(f"app.{name}"):
+                    yield record
+            else:
+                yield record
+        finally:
+            record['time_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            if cache_name:
+                record['cache'] = 'miss' if cache_miss_count(cache_name) > misses_before else 'hit'
+                record['cached_mb'] = round((cache_footprint(cache_name) or 0) / MB, 1)
+            self.current['sections'].append(record)
+
+    def finish_rerun(self) -> Optional[Dict[str, Any]]:
+        """Close the current rerun, add it to the history and the log file."""
+        if not self.enabled or self.current is None:
+            return None
+        rerun = self.current
+        rerun['total_ms'] = round((time.perf_counter() - self._rerun_start) * 1000, 2)
+        if self.allocations is not None:
+            stop_allocation_profiling(self.allocations)
+            rerun['allocations'] = self.allocations.report(top=25)
+            self.allocations = None
+        self.history.append(rerun)
+        del self.history[:-self.history_size]
+        self.current = None
+        if self.log_path:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(rerun, default=str) + "\n")
+        return rerun
+
+    def section_percentiles(self, percentiles: Tuple[int, ...] = (50, 95)) -> List[Dict[str, Any]]:
+        """
+        Summarise section timings across the rolling history.
+
+        Returns:
+            One row per section with the call count and the requested
+            percentiles of time_ms, slowest p95 first
+        """
+        timings: Dict[str, List[float]] = {}
+        for rerun in self.history:
+            timings.setdefault('total', []).append(rerun['total_ms'])
+            for s in rerun['sections']:
+                timings.setdefault(s['section'], []).append(s['time_ms'])
+
+        rows = []
+        for name, values in timings.items():
+            ordered = sorted(values)
+            row = {'section': name, 'calls': len(values)}
+            for p in percentiles:
+                row[f'p{p}_ms'] = round(_percentile(ordered, p), 2)
+            rows.append(row)
+        last = f'p{percentiles[-1]}_ms'
+        return sorted(rows, key=lambda r: r[last], reverse=True)
+
+    def export_jsonl(self) -> str:
+        """Return the rolling history as JSON Lines."""
+        return "".join(json.dumps(rerun, default=str) + "\n" for rerun in self.history)
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    """Linear-interpolated percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def frame_nbytes(obj: Any) -> int:
+    """
+    Bytes held by pandas objects, counting string contents (deep accounting).
+    NumPy arrays and objects with an integer nbytes attribute count that;
+    dicts, lists and tuples are summed; anything else counts as 0.
+    """
+    import pandas as pd
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, dict):
+        return sum(frame_nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(frame_nbytes(v) for v in obj)
+    nbytes = getattr(obj, 'nbytes', None)
+    return nbytes if isinstance(nbytes, int) else 0
+
+
+def _arrow_allocated() -> int:
+    """Bytes currently held by pyarrow's memory pool (not seen by tracemalloc)."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return 0
+    return pa.total_allocated_bytes()
+
+
+class AllocationProfiler:
+    """
+    Attribute memory allocated by Python and numpy to named functions and sections.
+
+    Uses tracemalloc: for each tracked call it records the high-water mark of
+    memory allocated above the level at entry (peak_bytes) and what was still
+    held at exit (retained_bytes). Nested calls are handled, so a section's
+    peak includes the peaks of the helpers it calls. Memory held by pyarrow
+    (used for Parquet and Arrow-backed strings) is not visible to tracemalloc
+    and is reported separately as arrow_delta_bytes. pandas deep memory
+    accounting of the first DataFrame argument and of the result gives
+    input_bytes and result_bytes, and copy_ratio = peak_bytes / input_bytes
+    highlights copy-heavy code.
+
+    tracemalloc is process-wide, so only one profiled rerun or benchmark case
+    should run at a time.
+    """
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self._local = threading.local()
+        self._started_tracing = False
+
+    def start(self) -> None:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        import tracemalloc
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @property
+    def _stack(self) -> List[Dict[str, int]]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def track(self, name: str, input_bytes: Optional[int] = None):
+        import tracemalloc
+        stack = self._stack
+        current, peak = tracemalloc.get_traced_memory()
+        # Fold the peak seen so far into the enclosing call before resetting it
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame = {'start': current, 'peak': current, 'arrow_start': _arrow_allocated()}
+        stack.append(frame)
+        try:
+            yield frame
+        finally:
+            stack.pop()
+            end, peak_end = tracemalloc.get_traced_memory()
+            frame['peak'] = max(frame['peak'], peak_end)
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], frame['peak'])
+            # Callers may fill in result_bytes once the tracked block has exited
+            frame['record'] = {
+                'name': name,
+                'peak_bytes': frame['peak'] - frame['start'],
+                'retained_bytes': end - frame['start'],
+                'arrow_delta_bytes': _arrow_allocated() - frame['arrow_start'],
+                'input_bytes': input_bytes,
+                'result_bytes': None
+            }
+            self.records.append(frame['record'])
+
+    def report(self, top: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Rank tracked functions and sections by their worst peak allocation.
+
+        Returns:
+            One row per name with calls, max and total peak bytes, retained
+            bytes, pandas input/result sizes and the worst copy ratio
+        """
+        by_name: Dict[str, Dict[str, Any]] = {}
+        for r in self.records:
+            row = by_name.setdefault(r['name'], {
+                'name': r['name'], 'calls': 0, 'max_peak_bytes': 0, 'total_peak_bytes': 0,
+                'retained_bytes': 0, 'arrow_delta_bytes': 0, 'input_bytes': None,
+                'result_bytes': None, 'copy_ratio': None
+            })
+            row['calls'] += 1
+            row['max_peak_bytes'] = max(row['max_peak_bytes'], r['peak_bytes'])
+            row['total_peak_bytes'] += r['peak_bytes']
+            row['retained_bytes'] += r['retained_bytes']
+            row['arrow_delta_bytes'] += r['arrow_delta_bytes']
+            for key in ('input_bytes', 'result_bytes'):
+                if r[key] is not None:
+                    row[key] = max(row[key] or 0, r[key])
+            if r['input_bytes']:
+                ratio = round(r['peak_bytes'] / r['input_bytes'], 2)
+                row['copy_ratio'] = max(row['copy_ratio'] or 0, ratio)
+
+        ranked = sorted(by_name.values(), key=lambda row: row['max_peak_bytes'], reverse=True)
+        return ranked[:top] if top else ranked
+
+    def format_report(self, top: Optional[int] = 20) -> str:
+        """Format the ranked report as a text table in MB."""
+        header = f"{'Function / section':<60}{'Calls':>7}{'Peak MB':>10}{'Total MB':>10}{'Kept MB':>9}{'Input MB':>10}{'Copy x':>8}"
+        lines = [header, "-" * len(header)]
+        for row in self.report(top):
+            input_mb = "-" if row['input_bytes'] is None else f"{row['input_bytes'] / MB:.1f}"
+            ratio = "-" if row['copy_ratio'] is None else f"{row['copy_ratio']:.2f}"
+            lines.append(
+                f"{row['name']:<60}{row['calls']:>7}{row['max_peak_bytes'] / MB:>10.1f}"
+                f"{row['total_peak_bytes'] / MB:>10.1f}{row['retained_bytes'] / MB:>9.1f}{input_mb:>10}{ratio:>8}"
+            )
+        return "\n".join(lines)
+
+
+# The profiler of each thread; a Streamlit session reruns in its own thread,
+# so other sessions and the prefetch thread are not attributed to it
+_active_allocation_profiler = threading.local()
+
+
+def start_allocation_profiling() -> AllocationProfiler:
+    """
+    Start tracemalloc and route the calling thread's track_allocations
+    calls to a new profiler.
+    """
+    profiler = AllocationProfiler()
+    profiler.start()
+    _active_allocation_profiler.profiler = profiler
+    return profiler
+
+
+def stop_allocation_profiling(profiler: AllocationProfiler) -> None:
+    """Stop a profiler returned by start_allocation_profiling, from the thread that started it."""
+    if getattr(_active_allocation_profiler, 'profiler', None) is profiler:
+        _active_allocation_profiler.profiler = None
+    profiler.stop()
+
+
+@contextmanager
+def allocation_profiling():
+    """
+    Enable allocation tracking for functions decorated with track_allocations.
+
+    Example:
+        with allocation_profiling() as profiler:
+            prepare_temporal_analysis(df)
+        print(profiler.format_report())
+    """
+    profiler = start_allocation_profiling()
+    try:
+        yield profiler
+    finally:
+        stop_allocation_profiling(profiler)
+
+
+def track_allocations(func: Callable) -> Callable:
+    """
+    Decorator attributing allocations to a function while allocation
+    profiling is enabled in the calling thread. When it is not, the call
+    goes straight through.
+    """
+    import functools
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = getattr(_active_allocation_profiler, 'profiler', None)
+        if profiler is None:
+            return func(*args, **kwargs)
+        input_bytes = frame_nbytes(args[0]) if args else None
+        with profiler.track(name, input_bytes=input_bytes) as frame:
+            result = func(*args, **kwargs)
+        frame['record']['result_bytes'] = frame_nbytes(result)
+        return result
+
+    return wrapper
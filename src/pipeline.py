@@ -0,0 +1,233 @@
+# src/pipeline.py
+import os
+import json
+import pickle
+import shutil
+import hashlib
+import inspect
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from src.perf import RunReport
+
+FRAME = 'frame'    # a DataFrame or dict of DataFrames, cached as Parquet
+OBJECT = 'object'  # any picklable value, cached with pickle
+FILES = 'files'    # the stage writes output files; only a marker is cached
+
+
+@dataclass
+class Stage:
+    """
+    One step of the pipeline.
+
+    Attributes:
+        name: Unique stage name
+        func: Callable receiving the upstream outputs, in `inputs` order
+        inputs: Names of upstream stages
+        kind: FRAME, OBJECT or FILES, deciding how the output is cached
+        code: Modules or callables whose source is the stage's code version
+        params: JSON-serialisable parameters that change the output
+        input_files: Files read by the stage, fingerprinted by content
+        output_files: Files written by a FILES stage
+    """
+    name: str
+    func: Callable
+    inputs: Sequence[str] = ()
+    kind: str = FRAME
+    code: Sequence[Any] = ()
+    params: Dict[str, Any] = field(default_factory=dict)
+    input_files: Sequence[str] = ()
+    output_files: Sequence[str] = ()
+
+
+class StageCache:
+    """
+    Content-addressed store for stage outputs.
+
+    A stage's key hashes its name, code version, parameters, input file
+    contents and the keys of its upstream stages, so editing one module or
+    input invalidates exactly the stages downstream of it.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._hash_index_path = os.path.join(cache_dir, "file_hashes.json")
+        self._hash_index = self._read_json(self._hash_index_path, {})
+
+    @staticmethod
+    def _read_json(path: str, default):
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return default
+
+    def file_hash(self, path: str) -> str:
+        """SHA-256 of a file, reusing the previous hash while size and mtime are unchanged."""
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        entry = self._hash_index.get(os.path.abspath(path))
+        if entry and entry['signature'] == signature:
+            return entry['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(8 * 1024 * 1024), b''):
+                digest.update(block)
+        self._hash_index[os.path.abspath(path)] = {'signature': signature, 'sha256': digest.hexdigest()}
+        with open(self._hash_index_path, "w") as f:
+            json.dump(self._hash_index, f, indent=2)
+        return digest.hexdigest()
+
+    @staticmethod
+    def code_version(code: Sequence[Any]) -> str:
+        digest = hashlib.sha256()
+        for obj in code:
+            digest.update(inspect.getsource(obj).encode())
+        return digest.hexdigest()
+
+    def stage_key(self, stage: Stage, upstream_keys: List[str]) -> str:
+        payload = {
+            'stage': stage.name,
+            'kind': stage.kind,
+            'code': self.code_version(stage.code),
+            'params': stage.params,
+            'input_files': [self.file_hash(p) for p in stage.input_files],
+            'output_files': list(stage.output_files),
+            'upstream': upstream_keys
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _entry_dir(self, stage: Stage, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{stage.name}-{key[:16]}")
+
+    def has(self, stage: Stage, key: str) -> bool:
+        marker = self._read_json(os.path.join(self._entry_dir(stage, key), "marker.json"), None)
+        if marker is None:
+            return False
+        if stage.kind == FILES:
+            # Outputs deleted or rewritten since they were produced must be rebuilt
+            for path, signature in marker['outputs'].items():
+                if not os.path.exists(path):
+                    return False
+                stat = os.stat(path)
+                if [stat.st_size, stat.st_mtime_ns] != signature:
+                    return False
+        return True
+
+    def load(self, stage: Stage, key: str) -> Any:
+        entry_dir = self._entry_dir(stage, key)
+        marker = self._read_json(os.path.join(entry_dir, "marker.json"), {})
+        if stage.kind == FRAME:
+            frames = {name: pd.read_parquet(os.path.join(entry_dir, f"{name}.parquet")) for name in marker['frames']}
+            return frames['_'] if list(frames) == ['_'] else frames
+        if stage.kind == OBJECT:
+            with open(os.path.join(entry_dir, "value.pkl"), 'rb') as f:
+                return pickle.load(f)
+        return list(marker['outputs'])
+
+    def store(self, stage: Stage, key: str, value: Any) -> None:
+        entry_dir = self._entry_dir(stage, key)
+        os.makedirs(entry_dir, exist_ok=True)
+        marker: Dict[str, Any] = {'stage': stage.name, 'key': key}
+        if stage.kind == FRAME:
+            frames = value if isinstance(value, dict) else {'_': value}
+            for name, frame in frames.items():
+                frame.to_parquet(os.path.join(entry_dir, f"{name}.parquet"), index=False, engine='pyarrow')
+            marker['frames'] = list(frames)
+        elif stage.kind == OBJECT:
+            with open(os.path.join(entry_dir, "value.pkl"), 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            outputs = value if value is not None else stage.output_files
+            marker['outputs'] = {
+                path: [os.stat(path).st_size, os.stat(path).st_mtime_ns] for path in outputs
+            }
+        # The marker is written last, so an interrupted store is never treated as a hit
+        with open(os.path.join(entry_dir, "marker.json"), "w") as f:
+            json.dump(marker, f, indent=2)
+
+    def prune(self, current_keys: Dict[str, str]) -> None:
+        """Delete cached entries of known stages other than their current key."""
+        keep = {f"{name}-{key[:16]}" for name, key in current_keys.items()}
+        for entry in os.listdir(self.cache_dir):
+            stage_name = entry.rsplit('-', 1)[0]
+            if stage_name in current_keys and entry not in keep:
+                shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
+
+
+def _row_count(value: Any) -> Optional[int]:
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, dict) and value and all(isinstance(v, pd.DataFrame) for v in value.values()):
+        return sum(len(v) for v in value.values())
+    return None
+
+
+def run_pipeline(
+    stages: List[Stage],
+    cache_dir: str = "processed/.cache",
+    report: Optional[RunReport] = None,
+    force: bool = False
+) -> Dict[str, Any]:
+    """
+    Run stages in order, skipping those whose cached output is still valid.
+
+    Keys are computed for every stage first; they depend on code, parameters
+    and input files only, never on outputs. Stages with a cache hit are not
+    executed, and their outputs are loaded only if a downstream stage has to
+    run, so a change to the plot code re-renders plots without touching the
+    CSVs at all.
+
+    Args:
+        stages: Stages in dependency order
+        cache_dir: Directory for cached outputs
+        report: Optional RunReport; every stage is recorded with 'cached' set
+        force: Ignore cached outputs and run every stage
+
+    Returns:
+        Dictionary of stage name to the stage's status ('ran' or 'cached')
+    """
+    cache = StageCache(cache_dir)
+    by_name = {stage.name: stage for stage in stages}
+    keys: Dict[str, str] = {}
+    for stage in stages:
+        keys[stage.name] = cache.stage_key(stage, [keys[name] for name in stage.inputs])
+
+    to_run = {stage.name for stage in stages if force or not cache.has(stage, keys[stage.name])}
+    values: Dict[str, Any] = {}
+    report = report or RunReport("pipeline")
+
+    def value_of(name: str) -> Any:
+        if name not in values:
+            stage = by_name[name]
+            with report.stage(f"{name} (cache load)") as record:
+                values[name] = cache.load(stage, keys[name])
+                record['rows_out'] = _row_count(values[name])
+                record['cached'] = True
+        return values[name]
+
+    status = {}
+    for stage in stages:
+        if stage.name not in to_run:
+            status[stage.name] = 'cached'
+            print(f"[{stage.name}] cached ({keys[stage.name][:12]})")
+            with report.stage(stage.name) as record:
+                record['cached'] = True
+            continue
+
+        args = [value_of(name) for name in stage.inputs]
+        print(f"[{stage.name}] running...")
+        rows_in = sum(_row_count(a) or 0 for a in args) or None
+        with report.stage(stage.name, rows_in=rows_in) as record:
+            value = stage.func(*args)
+            record['rows_out'] = _row_count(value)
+            record['cached'] = False
+        cache.store(stage, keys[stage.name], value)
+        values[stage.name] = value
+        status[stage.name] = 'ran'
+
+    cache.prune(keys)
+    return status
@@ -0,0 +1,264 @@
+# src/prefetch.py
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from src.governor import MemoryGovernor, TIER_DERIVED
+from src.perf import frame_nbytes
+
+# Filters that are multiselects, in the order their toggles are precomputed
+TOGGLE_FILTERS = ['severity', 'gender', 'age_groups', 'road_conditions', 'weather_conditions', 'light_conditions']
+
+
+def filter_key(filters: Dict[str, Any]) -> Tuple:
+    """
+    Hashable key of a filter state.
+
+    Multiselect values are sorted, so the same selection made in a different
+    order maps to the same key.
+    """
+    items = []
+    for name in sorted(filters):
+        value = filters[name]
+        if isinstance(value, (list, set)):
+            value = tuple(sorted(value))
+        elif isinstance(value, tuple):
+            value = tuple(value)
+        items.append((name, value))
+    return tuple(items)
+
+
+def adjacent_filter_states(
+    filters: Dict[str, Any],
+    options: Dict[str, Sequence[Any]],
+    year_bounds: Optional[Tuple[int, int]] = None,
+    max_states: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Filter states one sidebar interaction away from the current one.
+
+    These are the year range with either end moved by one year, then the
+    current selection with one value of one multiselect toggled. States are
+    ordered from most to least likely next interaction.
+
+    Args:
+        filters: Current filters, as returned by create_sidebar_filters
+        options: All values of each multiselect filter, in display order
+        year_bounds: (min, max) of the year slider
+        max_states: Keep only the first states
+
+    Returns:
+        List of filter dicts
+    """
+    states = []
+    year_range = filters.get('year_range')
+    if year_range and year_bounds:
+        low, high = year_range
+        for new_low, new_high in ((low, high - 1), (low + 1, high), (low, high + 1), (low - 1, high)):
+            if year_bounds[0] <= new_low <= new_high <= year_bounds[1]:
+                states.append({**filters, 'year_range': (new_low, new_high)})
+
+    for name in TOGGLE_FILTERS:
+        selected = filters.get(name)
+        if selected is None or name not in options:
+            continue
+        for value in options[name]:
+            if value in selected:
+                toggled = [v for v in selected if v != value]
+            else:
+                toggled = [v for v in options[name] if v in selected or v == value]
+            states.append({**filters, name: toggled})
+
+    return states[:max_states] if max_states is not None else states
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of results keyed by filter state.
+
+    Shared by the rerun thread, which reads and fills it, and the prefetch
+    worker, which fills it ahead of time. With a governor, every entry is
+    accounted under name at sizeof(value) bytes with the time it took to
+    compute, and the governor may evict it before max_entries is reached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 64,
+        governor: Optional[MemoryGovernor] = None,
+        name: str = 'results',
+        sizeof: Callable[[Any], int] = frame_nbytes
+    ):
+        self.max_entries = max_entries
+        self.governor = governor
+        self.name = name
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached result, or None, counting a hit or miss."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        if self.governor is not None:
+            self.governor.touch(self.name, key)
+        return value
+
+    def put(self, key: Hashable, value: Any, prefetched: bool = False, cost_s: float = 0.0) -> None:
+        """Store a result, evicting the least recently used beyond max_entries."""
+        evicted = []
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if prefetched:
+                self.prefetched += 1
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+            stored = key in self._entries
+        # The governor is called outside the lock: it may evict from this cache
+        if self.governor is not None:
+            for old_key in evicted:
+                self.governor.release(self.name, old_key)
+            if stored:
+                self.governor.register(self.name, key, self.sizeof(value), tier=TIER_DERIVED, cost_s=cost_s,
+                                       evict=lambda: self.discard(key))
+
+    def discard(self, key: Hashable) -> None:
+        """Drop one result, e.g. when the governor evicts it."""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.governor is not None:
+            self.governor.release(self.name, key)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Return (result, hit), computing and storing the result on a miss.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        start = time.perf_counter()
+        value = compute()
+        self.put(key, value, cost_s=time.perf_counter() - start)
+        return value, False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'prefetched': self.prefetched}
+
+
+class Prefetcher:
+    """
+    Compute results for likely next states on a background thread.
+
+    Each owner (a dashboard session) has at most one batch of states in
+    flight. Scheduling a new batch cancels the owner's previous one: the
+    worker checks between states and drops a stale batch. A batch also stops
+    once the worker thread has used budget_s seconds of CPU time on it, so
+    prefetching cannot take more than a bounded share of the server.
+
+    Example:
+        prefetcher.schedule(session_id, [(key, lambda: compute(state)) ...], cache)
+    """
+
+    def __init__(self, max_workers: int = 1, budget_s: float = 1.0):
+        self.budget_s = budget_s
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        # Generation of each owner's batch in flight; an owner is dropped once
+        # its batch finishes or is cancelled, so this stays as small as the
+        # number of batches pending
+        self._generations: Dict[Hashable, int] = {}
+        self._generation_counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _is_current(self, owner: Hashable, generation: int) -> bool:
+        with self._lock:
+            return self._generations.get(owner) == generation
+
+    def _finish(self, owner: Hashable, generation: int) -> None:
+        with self._lock:
+            if self._generations.get(owner) == generation:
+                del self._generations[owner]
+
+    def cancel(self, owner: Hashable) -> None:
+        """Drop the owner's pending states; a state already computing finishes."""
+        with self._lock:
+            self._generations.pop(owner, None)
+
+    def schedule(
+        self,
+        owner: Hashable,
+        jobs: Iterable[Tuple[Hashable, Callable[[], Any]]],
+        cache: ResultCache
+    ) -> Optional[Future]:
+        """
+        Replace the owner's pending batch with jobs of (cache key, compute).
+
+        Keys already in the cache are skipped, and a state whose compute
+        raises is counted in failures and skipped. Returns the batch's
+        future, resolving to the number of states computed, or None if
+        prefetching is disabled (budget_s <= 0).
+        """
+        if self.budget_s <= 0:
+            self.cancel(owner)
+            return None
+        with self._lock:
+            generation = next(self._generation_counter)
+            self._generations[owner] = generation
+        jobs = list(jobs)
+
+        def run() -> int:
+            cpu_start = time.thread_time()
+            computed = 0
+            try:
+                for key, compute in jobs:
+                    if not self._is_current(owner, generation):
+                        break
+                    if time.thread_time() - cpu_start >= self.budget_s:
+                        break
+                    if key in cache:
+                        continue
+                    start = time.perf_counter()
+                    try:
+                        value = compute()
+                    except Exception as e:
+                        with self._lock:
+                            self.failures += 1
+                            self.last_error = repr(e)
+                        continue
+                    cache.put(key, value, prefetched=True, cost_s=time.perf_counter() - start)
+                    computed += 1
+            finally:
+                self._finish(owner, generation)
+            return computed
+
+        return self._executor.submit(run)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'pending': len(self._generations), 'failures': self.failures, 'last_error': self.last_error}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,36 +1,359 @@
 # src/preprocessing.py
+import hashlib
 import os
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
-def preprocess(df: pd.DataFrame) -> pd.DataFrame:
-    """Clean and create features for dashboard."""
-    df = df.copy()
-    
+STRING_COLUMNS = ['road_conditions', 'weather_conditions', 'road_type',
+                  'light_conditions', 'gender', 'severity', 'age_grp', 'day']
+SEVERITY_MAP = {'Slight': 1, 'Serious': 2, 'Fatal': 3}
+WEEKEND_DAYS = ('Saturday', 'Sunday')
+
+@dataclass(frozen=True)
+class BinScheme:
+    """
+    Bins of a numeric source, as pd.cut(source, edges, labels=labels, right=right, include_lowest=True).
+
+    source is a column name or 'hour_of_day' (the hour of the time column).
+    """
+    source: str
+    edges: Tuple[float, ...]
+    labels: Tuple[Any, ...]
+    right: bool = True
+
+# Binned dimensions preprocess() stores as columns, so dashboard helpers
+# group on their category codes instead of re-binning every rerun.
+# Add a scheme here to get a new column; values outside the edges are missing.
+BIN_SCHEMES = {
+    'speed_band': BinScheme(
+        'speed_limit', (0, 20, 30, 40, 50, 60, 70, 100),
+        ('≤20', '21-30', '31-40', '41-50', '51-60', '61-70', '>70')
+    ),
+    'speed_category': BinScheme(
+        'speed_limit', (0, 30, 50, 70, 100),
+        ('Low Speed (≤30)', 'Medium Speed (31-50)', 'High Speed (51-70)', 'Very High Speed (>70)')
+    ),
+    'hour': BinScheme('hour_of_day', tuple(range(25)), tuple(range(24)), right=False),
+}
+
+def _labels_are_strings(scheme: BinScheme) -> bool:
+    return all(isinstance(label, str) for label in scheme.labels)
+
+def _bin_arrow_type(scheme: BinScheme) -> pa.DataType:
+    # Parquet keeps string dictionaries only; numeric labels are stored as
+    # values, read back as nullable Int8 (see arrow_schema)
+    if _labels_are_strings(scheme):
+        return pa.dictionary(pa.int8(), pa.large_string(), ordered=True)
+    return pa.int8()
+
+# Arrow types of the processed columns, fixed up front so that every row group
+# of a chunked write shares one schema. Integer columns stay integers in
+# Parquet even when a batch has gaps; like a whole-frame write, the column
+# reads back as float only if some value is missing.
+PROCESSED_SCHEMA = {
+    'accident_index': pa.large_string(),
+    'number_of_vehicles': pa.int64(),
+    'number_of_casualties': pa.int64(),
+    'date': pa.timestamp('us'),
+    'time': pa.time64('us'),
+    'speed_limit': pa.float64(),
+    **{col: pa.large_string() for col in STRING_COLUMNS},
+    'year': pa.int32(),
+    'month': pa.int32(),
+    'day_of_week': pa.large_string(),
+    'is_weekend': pa.bool_(),
+    **{name: _bin_arrow_type(scheme) for name, scheme in BIN_SCHEMES.items()},
+    'severity_numeric': pa.int64(),
+    'accident_id': pa.int32(),
+}
+
+# Normalised storage: one row per accident, one row per cyclist, linked by an
+# integer surrogate key equal to the accident's row position in its table.
+# The Accident_Index strings live only in a side dictionary (row i holds the
+# index of accident_id i), decoded when rows are shown or exported.
+ACCIDENT_ID = 'accident_id'
+CYCLIST_COLUMNS = ['gender', 'severity', 'age_grp', 'severity_numeric']
+ACCIDENTS_FILE = "accidents.parquet"
+CYCLISTS_FILE = "cyclists.parquet"
+ACCIDENT_INDEX_FILE = "accident_index.parquet"
+
+def _bin_source(df: pd.DataFrame, source: str) -> Optional[pd.Series]:
+    """Values a BinScheme bins, or None if the frame lacks them."""
+    if source == 'hour_of_day':
+        if 'time' not in df.columns:
+            return None
+        hours = pc.hour(pa.array(df['time'], from_pandas=True))
+        return pd.Series(hours.to_pandas(), index=df.index, dtype=float)
+    return df[source] if source in df.columns else None
+
+def bin_column(df: pd.DataFrame, name: str) -> Optional[pd.Series]:
+    """
+    The BIN_SCHEMES column name of a frame as an ordered categorical: the
+    stored one (numeric labels are stored as plain values and re-wrapped
+    here), or binned now for frames processed before it existed. None if
+    its source is missing.
+    """
+    scheme = BIN_SCHEMES[name]
+    if name in df.columns:
+        stored = df[name]
+        if isinstance(stored.dtype, pd.CategoricalDtype):
+            return stored
+        return pd.Series(pd.Categorical(stored, categories=list(scheme.labels), ordered=True),
+                         index=df.index, name=name)
+    source = _bin_source(df, scheme.source)
+    if source is None:
+        return None
+    return pd.cut(source, bins=list(scheme.edges), labels=list(scheme.labels), right=scheme.right,
+                  include_lowest=True).rename(name)
+
+def _transform(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the cleaning and feature steps to a frame in place."""
     # Standardize column names
     df.columns = df.columns.str.lower()
-    
+
     # Strip strings
-    string_cols = ['road_conditions', 'weather_conditions', 'road_type', 
-                   'light_conditions', 'gender', 'severity', 'age_grp', 'day']
-    for col in string_cols:
+    for col in STRING_COLUMNS:
         if col in df.columns:
             df[col] = df[col].astype(str).str.strip().str.title()
-    
+
     # Convert dates
     df['date'] = pd.to_datetime(df['date'], errors='coerce')
     df['year'] = df['date'].dt.year
     df['month'] = df['date'].dt.month
     df['day_of_week'] = df['date'].dt.day_name()
-    
+
     # Convert time
     df['time'] = pd.to_datetime(df['time'], format='%H:%M', errors='coerce').dt.time
+
+    # Weekend flag and binned dimensions
+    df['is_weekend'] = df['day_of_week'].isin(WEEKEND_DAYS)
+    for name in BIN_SCHEMES:
+        binned = bin_column(df, name)
+        if binned is not None:
+            df[name] = binned if _labels_are_strings(BIN_SCHEMES[name]) else binned.astype('Int8')
     
     # Encode severity
-    severity_map = {'Slight': 1, 'Serious': 2, 'Fatal': 3}
-    df['severity_numeric'] = df['severity'].map(severity_map)
-    
+    df['severity_numeric'] = df['severity'].map(SEVERITY_MAP)
+
     return df
 
+def preprocess(df: pd.DataFrame) -> pd.DataFrame:
+    """Clean and create features for dashboard."""
+    return _transform(df.copy())
+
+def normalise(
+    df: pd.DataFrame,
+    id_offset: int = 0,
+    accident_index: Optional[pd.DataFrame] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Split a preprocessed one-row-per-cyclist frame into accident and cyclist tables.
+
+    Accident-level columns are kept once per accident instead of once per
+    cyclist. Accidents keep their first-appearance order and get
+    accident_id = id_offset + row position; each cyclist row carries the
+    accident_id of its accident.
+
+    Args:
+        df: Preprocessed frame, as returned by preprocess(), keyed either by
+            the accident_index strings or by interned accident_id codes
+        id_offset: First accident_id, for numbering successive batches
+        accident_index: Dictionary from src.etl.intern_accident_index,
+            required when df is keyed by accident_id
+
+    Returns:
+        Tuple of (accidents, cyclists, accident_index dictionary renumbered
+        to the new accident_id)
+    """
+    key = ACCIDENT_ID if ACCIDENT_ID in df.columns else 'accident_index'
+    codes, uniques = pd.factorize(df[key], use_na_sentinel=False)
+    if key == ACCIDENT_ID:
+        if accident_index is None:
+            raise ValueError("accident_index dictionary is required for a frame keyed by accident_id")
+        index_values = accident_index['accident_index'].take(np.asarray(uniques)).reset_index(drop=True)
+    else:
+        index_values = uniques
+    first_rows = np.unique(codes, return_index=True)[1]
+    cyclist_columns = [col for col in CYCLIST_COLUMNS if col in df.columns]
+
+    accidents = df.drop(columns=cyclist_columns + [key]).iloc[first_rows].reset_index(drop=True)
+    accidents.insert(0, ACCIDENT_ID, np.arange(id_offset, id_offset + len(accidents), dtype=np.int32))
+
+    cyclists = df[cyclist_columns].reset_index(drop=True)
+    cyclists.insert(0, ACCIDENT_ID, (codes + id_offset).astype(np.int32))
+    return accidents, cyclists, pd.DataFrame({'accident_index': index_values})
+
+def _parquet_options(columns: Sequence[str]) -> dict:
+    """Writer options: the sorted accident_id key is delta-encoded, other columns dictionary-encoded."""
+    if ACCIDENT_ID not in columns:
+        return {}
+    return {
+        'use_dictionary': [col for col in columns if col != ACCIDENT_ID],
+        'column_encoding': {ACCIDENT_ID: 'DELTA_BINARY_PACKED'}
+    }
+
+def table_paths(output_dir: str) -> List[str]:
+    """Paths of the accident table, cyclist table and accident_index dictionary."""
+    return [os.path.join(output_dir, name) for name in (ACCIDENTS_FILE, CYCLISTS_FILE, ACCIDENT_INDEX_FILE)]
+
+def table_fingerprint(paths: Sequence[str]) -> str:
+    """
+    Version of a set of table files from their sizes and modification times.
+
+    It changes whenever a file is rewritten, replaced or removed, and costs one
+    stat() per file, so it can be checked on every dashboard rerun. Use
+    pipeline.StageCache.file_hash() instead when only the content matters.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature = f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        except FileNotFoundError:
+            signature = f"{os.path.basename(path)}:missing"
+        digest.update(signature.encode())
+    return digest.hexdigest()[:16]
+
+def save_tables(
+    accidents: pd.DataFrame,
+    cyclists: pd.DataFrame,
+    accident_index: pd.DataFrame,
+    output_dir: str
+) -> List[str]:
+    """Save the tables returned by normalise() to output_dir, returning their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = table_paths(output_dir)
+    for frame, path in zip((accidents, cyclists, accident_index), paths):
+        frame.to_parquet(path, index=False, engine='pyarrow', **_parquet_options(frame.columns))
+    return paths
+
+def arrow_schema(batch: pd.DataFrame) -> pa.Schema:
+    """
+    Arrow schema for batched writes of processed columns: declared types,
+    inferred ones for any other column.
+
+    The batch's pandas metadata is kept, as a whole-frame to_parquet() keeps
+    it, so columns such as the nullable Int8 bins read back with the same
+    dtype from either path.
+    """
+    inferred = pa.Schema.from_pandas(batch, preserve_index=False)
+    return pa.schema([
+        pa.field(field.name, PROCESSED_SCHEMA.get(field.name, field.type)) for field in inferred
+    ], metadata=inferred.metadata)
+
+def _write_row_groups(tables: Iterable[Sequence[pd.DataFrame]], paths: Sequence[str], empty_columns: Sequence[List[str]]) -> int:
+    """
+    Write each tuple of frames as one row group per output file.
+
+    The schema of every file is fixed by its first batch. Returns the number
+    of rows written to the first file.
+    """
+    for path in paths:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    writers: List[pq.ParquetWriter] = []
+    rows = 0
+    try:
+        for frames in tables:
+            if not writers:
+                writers = [
+                    pq.ParquetWriter(path, arrow_schema(frame), **_parquet_options(frame.columns))
+                    for path, frame in zip(paths, frames)
+                ]
+            for writer, frame in zip(writers, frames):
+                writer.write_table(pa.Table.from_pandas(frame, schema=writer.schema, preserve_index=False))
+            rows += len(frames[0])
+    finally:
+        for writer in writers:
+            writer.close()
+    if not writers:
+        for path, columns in zip(paths, empty_columns):
+            pq.write_table(pa.schema({col: PROCESSED_SCHEMA[col] for col in columns}).empty_table(), path)
+    return rows
+
+def preprocess_to_parquet(batches: Iterable[pd.DataFrame], path: str) -> int:
+    """
+    Preprocess merged batches one at a time, writing each as a Parquet row group.
+
+    Only one batch is held in memory, so peak memory depends on the batch size
+    rather than the dataset size. The steps are those of preprocess(), and the
+    file reads back to the same frame as preprocess() followed by
+    save_parquet().
+
+    Args:
+        batches: Merged (raw column name) DataFrames, e.g. from
+            src.etl.iter_merged_batches
+        path: Output Parquet path
+
+    Returns:
+        Number of rows written
+    """
+    columns = [col for col in PROCESSED_SCHEMA if col != ACCIDENT_ID]
+    return _write_row_groups(((_transform(batch),) for batch in batches), [path], [columns])
+
+def preprocess_to_tables(batches: Iterable[pd.DataFrame], output_dir: str) -> int:
+    """
+    Chunked counterpart of preprocess() followed by normalise() and save_tables().
+
+    Batches are keyed by the Accident_Index strings and must hold whole
+    accidents (all of an accident's cyclists in the same batch), as batches
+    from src.etl.iter_merged_batches do; accident_id numbering then continues
+    across batches exactly as for the whole frame.
+
+    Args:
+        batches: Merged (raw column name) DataFrames
+        output_dir: Directory for the files of table_paths()
+
+    Returns:
+        Number of accidents written
+    """
+    def normalised() -> Iterator[Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+        offset = 0
+        for batch in batches:
+            tables = normalise(_transform(batch), id_offset=offset)
+            offset += len(tables[0])
+            yield tables
+
+    accident_columns = [ACCIDENT_ID] + [
+        col for col in PROCESSED_SCHEMA if col not in CYCLIST_COLUMNS + [ACCIDENT_ID, 'accident_index']
+    ]
+    empty_columns = [accident_columns, [ACCIDENT_ID] + CYCLIST_COLUMNS, ['accident_index']]
+    return _write_row_groups(normalised(), table_paths(output_dir), empty_columns)
+
+def compare_tables(expected_dir: str, actual_dir: str) -> List[str]:
+    """
+    Differences between two sets of processed tables, e.g. those written by
+    save_tables() and by preprocess_to_tables() from the same input.
+
+    Each file's Arrow schema and the frame it reads back as (values and
+    dtypes) are compared.
+
+    Returns:
+        One message per differing file; empty if the tables are identical
+    """
+    differences = []
+    for expected_path, actual_path in zip(table_paths(expected_dir), table_paths(actual_dir)):
+        name = os.path.basename(expected_path)
+        expected_schema = pq.read_schema(expected_path).remove_metadata()
+        actual_schema = pq.read_schema(actual_path).remove_metadata()
+        if not expected_schema.equals(actual_schema):
+            fields = [
+                f"{field.name}: {field.type} vs {actual_schema.field(field.name).type if field.name in actual_schema.names else 'missing'}"
+                for field in expected_schema
+                if field.name not in actual_schema.names or field.type != actual_schema.field(field.name).type
+            ]
+            differences.append(f"{name} schema differs ({', '.join(fields) or 'column order'})")
+        try:
+            pd.testing.assert_frame_equal(pd.read_parquet(expected_path), pd.read_parquet(actual_path))
+        except AssertionError as e:
+            differences.append(f"{name} reads back differently: {' '.join(str(e).split())}")
+    return differences
+
 def save_parquet(df: pd.DataFrame, path: str):
     """Save DataFrame as Parquet, creating directories if needed."""
     os.makedirs(os.path.dirname(path), exist_ok=True)  # <-- ensures folder exists
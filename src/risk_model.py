@@ -0,0 +1,433 @@
+# src/risk_model.py
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.preprocessing import (
+    ACCIDENT_ID, BIN_SCHEMES, CYCLIST_COLUMNS, SEVERITY_MAP, WEEKEND_DAYS, bin_column, table_fingerprint
+)
+
+RISK_MODEL_FILE = "risk_model.json"
+SEVERITY_CLASSES = list(SEVERITY_MAP)
+# Condition, demographic, speed and time features, all categorical
+RISK_FEATURES = ['road_conditions', 'weather_conditions', 'light_conditions', 'road_type',
+                 'age_grp', 'gender', 'speed_band', 'hour', 'is_weekend', 'month']
+# Levels of the features whose values are known up front
+_FIXED_LEVELS = {
+    **{name: list(scheme.labels) for name, scheme in BIN_SCHEMES.items()},
+    'is_weekend': [False, True],
+    'month': list(range(1, 13)),
+}
+
+# Training settings: Parquet is read READ_ROWS rows at a time and each read
+# is split into minibatches of BATCH_ROWS for Adam on the mean log loss plus
+# an L2 penalty
+READ_ROWS = 65_536
+BATCH_ROWS = 4_096
+EPOCHS = 5
+LEARNING_RATE = 0.02
+L2_PENALTY = 1e-4
+
+
+def feature_columns(df: pd.DataFrame, features: Sequence[str] = RISK_FEATURES) -> Dict[str, pd.Series]:
+    """
+    Values of each feature a frame can provide, by name.
+
+    Binned features come from bin_column() (stored or binned now) and
+    is_weekend falls back to day_of_week; features without a source are
+    left out.
+    """
+    columns = {}
+    for feature in features:
+        if feature in BIN_SCHEMES:
+            values = bin_column(df, feature)
+        elif feature == 'is_weekend' and feature not in df.columns and 'day_of_week' in df.columns:
+            values = df['day_of_week'].isin(WEEKEND_DAYS)
+        else:
+            values = df[feature] if feature in df.columns else None
+        if values is not None:
+            columns[feature] = values
+    return columns
+
+
+def _source_columns(names: Sequence[str], features: Sequence[str]) -> List[str]:
+    """Parquet columns to read for the features: the stored one, or what it is derived from."""
+    columns = []
+    for feature in features:
+        if feature in names:
+            columns.append(feature)
+        elif feature in BIN_SCHEMES:
+            source = BIN_SCHEMES[feature].source
+            columns.append('time' if source == 'hour_of_day' else source)
+        elif feature == 'is_weekend':
+            columns.append('day_of_week')
+    return [col for col in dict.fromkeys(columns) if col in names]
+
+
+@dataclass
+class RiskModel:
+    """
+    Multinomial logistic model of a cyclist's severity over one-hot features.
+
+    Every feature gets one column per level plus one for missing or unseen
+    values. A row is stored as its column numbers (codes + offsets) rather
+    than as a one-hot matrix, so its logits are a sum of gathered weight
+    rows and a gradient step is one bincount per class.
+
+    Example:
+        model = train_risk_model(accidents_path, cyclists_path)
+        proba = model.predict_proba(filtered_df)  # (rows, 3): Slight, Serious, Fatal
+    """
+    levels: Dict[str, List[Any]]
+    weights: np.ndarray = None
+    bias: np.ndarray = None
+    level_counts: Dict[str, List[int]] = field(default_factory=dict)
+    metrics: Dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.weights is None:
+            self.weights = np.zeros((self.n_columns, len(SEVERITY_CLASSES)))
+        if self.bias is None:
+            self.bias = np.zeros(len(SEVERITY_CLASSES))
+
+    @property
+    def features(self) -> List[str]:
+        return list(self.levels)
+
+    @property
+    def offsets(self) -> Dict[str, int]:
+        """First column of each feature."""
+        sizes = [len(levels) + 1 for levels in self.levels.values()]
+        return dict(zip(self.levels, np.cumsum([0] + sizes[:-1]).tolist()))
+
+    @property
+    def n_columns(self) -> int:
+        return sum(len(levels) + 1 for levels in self.levels.values())
+
+    @property
+    def code_dtype(self) -> type:
+        """Smallest integer type holding every column number."""
+        return np.int16 if self.n_columns <= np.iinfo(np.int16).max else np.int32
+
+    def encode(self, columns: Dict[str, pd.Series], features: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Column numbers of each row, shape (rows, features), for the given
+        features (default: all); a feature missing from columns counts as
+        missing for every row. Since the numbers are absolute, code
+        matrices of different features can be stacked in any order.
+        """
+        features = self.features if features is None else list(features)
+        n_rows = len(next(iter(columns.values()))) if columns else 0
+        codes = np.empty((n_rows, len(features)), dtype=self.code_dtype)
+        offsets = self.offsets
+        for position, feature in enumerate(features):
+            missing = len(self.levels[feature])
+            if feature in columns:
+                level_codes = pd.Categorical(columns[feature], categories=self.levels[feature]).codes.astype(np.int32)
+                level_codes[level_codes < 0] = missing
+            else:
+                level_codes = np.full(n_rows, missing, dtype=np.int32)
+            codes[:, position] = offsets[feature] + level_codes
+        return codes
+
+    def logits(self, codes: np.ndarray) -> np.ndarray:
+        scores = np.tile(self.bias, (len(codes), 1))
+        for position in range(codes.shape[1]):
+            scores += self.weights[codes[:, position]]
+        return scores
+
+    def predict_proba(self, df: pd.DataFrame) -> np.ndarray:
+        """Severity probabilities of every row of df, shape (rows, 3) in SEVERITY_CLASSES order."""
+        return _softmax(self.logits(self.encode(feature_columns(df, self.features))))
+
+    def save(self, path: str) -> str:
+        with open(path, 'w') as f:
+            json.dump({
+                'levels': self.levels,
+                'weights': self.weights.tolist(),
+                'bias': self.bias.tolist(),
+                'level_counts': self.level_counts,
+                'metrics': self.metrics
+            }, f)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'RiskModel':
+        with open(path) as f:
+            saved = json.load(f)
+        return cls(saved['levels'], np.asarray(saved['weights']), np.asarray(saved['bias']),
+                   saved['level_counts'], saved['metrics'])
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return scores / scores.sum(axis=1, keepdims=True)
+
+
+def _severity_codes(severity: pd.Series) -> np.ndarray:
+    return pd.Categorical(severity, categories=SEVERITY_CLASSES).codes.astype(np.int64)
+
+
+def _count_levels(tallies: Dict[str, pd.Series], columns: Dict[str, pd.Series]) -> None:
+    for feature, values in columns.items():
+        counts = pd.Series(values).value_counts()
+        tallies[feature] = counts if feature not in tallies else tallies[feature].add(counts, fill_value=0)
+
+
+def _natural_key(value: Any) -> List[Any]:
+    """Sort key putting '6 To 10' before '11 To 15'."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', str(value))]
+
+
+def _model_from_tallies(tallies: Dict[str, pd.Series], features: Sequence[str]) -> RiskModel:
+    """
+    Untrained model with the levels of each feature (fixed, or the observed
+    values sorted) and how often each occurred; the bias starts at the log
+    class frequencies when tallies holds 'severity'.
+    """
+    levels, level_counts = {}, {}
+    for feature in features:
+        counts = tallies.get(feature, pd.Series(dtype=np.int64))
+        observed = [value.item() if hasattr(value, 'item') else value for value in counts.index]
+        levels[feature] = list(_FIXED_LEVELS.get(feature, sorted(observed, key=_natural_key)))
+        level_counts[feature] = [int(counts.get(level, 0)) for level in levels[feature]]
+    model = RiskModel(levels, level_counts=level_counts)
+    if 'severity' in tallies:
+        classes = tallies['severity'].reindex(SEVERITY_CLASSES, fill_value=0).to_numpy(dtype=np.float64)
+        model.bias = np.log((classes + 1) / (classes.sum() + len(classes)))
+    return model
+
+
+def _minibatches(codes: np.ndarray, y: np.ndarray, batch_rows: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    for start in range(0, len(y), batch_rows):
+        yield codes[start:start + batch_rows], y[start:start + batch_rows]
+
+
+def fit(
+    model: RiskModel,
+    batches: Callable[[], Iterable[Tuple[np.ndarray, np.ndarray]]],
+    epochs: int = EPOCHS,
+    learning_rate: float = LEARNING_RATE,
+    l2: float = L2_PENALTY
+) -> RiskModel:
+    """
+    Train a model in place with Adam over minibatches of (column numbers, severity codes).
+
+    batches() is called once per epoch and may stream from disk, so only
+    one minibatch is in memory at a time. Records the last epoch's mean
+    log loss and that of the class frequencies alone in model.metrics.
+    """
+    n_classes = len(SEVERITY_CLASSES)
+    params = [model.weights, model.bias]
+    moments = [np.zeros_like(p) for p in params]
+    squares = [np.zeros_like(p) for p in params]
+    beta1, beta2, step = 0.9, 0.999, 0
+    for _ in range(epochs):
+        loss, rows, class_counts = 0.0, 0, np.zeros(n_classes)
+        for codes, y in batches():
+            keep = y >= 0
+            codes, y = codes[keep], y[keep]
+            if len(y) == 0:
+                continue
+            proba = _softmax(model.logits(codes))
+            loss += -np.log(np.maximum(proba[np.arange(len(y)), y], 1e-12)).sum()
+            rows += len(y)
+            class_counts += np.bincount(y, minlength=n_classes)
+
+            residual = proba
+            residual[np.arange(len(y)), y] -= 1
+            residual /= len(y)
+            flat = codes.ravel()
+            grad_weights = np.column_stack([
+                np.bincount(flat, weights=np.repeat(residual[:, k], codes.shape[1]), minlength=model.n_columns)
+                for k in range(n_classes)
+            ]) + l2 * model.weights
+            grads = [grad_weights, residual.sum(axis=0)]
+
+            step += 1
+            for param, grad, moment, square in zip(params, grads, moments, squares):
+                moment *= beta1
+                moment += (1 - beta1) * grad
+                square *= beta2
+                square += (1 - beta2) * grad * grad
+                param -= learning_rate * (moment / (1 - beta1 ** step)) / (np.sqrt(square / (1 - beta2 ** step)) + 1e-8)
+
+    prior = class_counts / max(rows, 1)
+    model.metrics.update({
+        'rows': int(rows),
+        'epochs': epochs,
+        'log_loss': float(loss / max(rows, 1)),
+        'baseline_log_loss': float(-(prior[prior > 0] * np.log(prior[prior > 0])).sum()),
+    })
+    return model
+
+
+def fit_frame(
+    df: pd.DataFrame,
+    features: Sequence[str] = RISK_FEATURES,
+    batch_rows: int = BATCH_ROWS,
+    epochs: int = EPOCHS
+) -> RiskModel:
+    """Train on an in-memory frame with one row per cyclist (e.g. from join_cyclists())."""
+    columns = feature_columns(df, features)
+    tallies: Dict[str, pd.Series] = {}
+    _count_levels(tallies, {**columns, 'severity': df['severity']})
+    model = _model_from_tallies(tallies, features)
+    codes, y = model.encode(columns), _severity_codes(df['severity'])
+    model = fit(model, lambda: _minibatches(codes, y, batch_rows), epochs=epochs)
+    model.metrics.update({'cyclists': len(df), 'features': list(features)})
+    return model
+
+
+def train_risk_model(
+    accidents_path: str,
+    cyclists_path: str,
+    features: Sequence[str] = RISK_FEATURES,
+    read_rows: int = READ_ROWS,
+    batch_rows: int = BATCH_ROWS,
+    epochs: int = EPOCHS
+) -> RiskModel:
+    """
+    Train the severity model from the processed Parquet tables, out of core.
+
+    The accident table is read twice in batches: once to find each
+    feature's levels, then to encode its features into a code matrix of
+    one small integer per accident and feature. Every epoch then streams
+    the cyclist table read_rows at a time. Each read gathers its
+    accidents' rows of the code matrix by accident_id, adds its own
+    cyclist features and is trained on in minibatches of batch_rows. Only
+    that code matrix and one read are in memory at a time, never the
+    tables.
+
+    The tables' table_fingerprint() and the features are recorded in
+    metrics, so a saved model can be checked against the data (is_current()).
+    """
+    fingerprint = table_fingerprint([accidents_path, cyclists_path])
+    accidents_file, cyclists_file = pq.ParquetFile(accidents_path), pq.ParquetFile(cyclists_path)
+    accident_features = [f for f in features if f not in CYCLIST_COLUMNS]
+    cyclist_features = [f for f in features if f in CYCLIST_COLUMNS]
+    accident_columns = _source_columns(accidents_file.schema_arrow.names, accident_features)
+    cyclist_columns = [col for col in cyclist_features if col in cyclists_file.schema_arrow.names]
+
+    def stream(parquet_file: pq.ParquetFile, columns: List[str]) -> Iterator[pd.DataFrame]:
+        for batch in parquet_file.iter_batches(batch_size=read_rows, columns=columns):
+            yield batch.to_pandas()
+
+    tallies: Dict[str, pd.Series] = {}
+    for batch in stream(accidents_file, accident_columns):
+        _count_levels(tallies, feature_columns(batch, accident_features))
+    for batch in stream(cyclists_file, ['severity'] + cyclist_columns):
+        _count_levels(tallies, {**feature_columns(batch, cyclist_features), 'severity': batch['severity']})
+    model = _model_from_tallies(tallies, features)
+
+    # Precomputed accident part of every row, indexed by accident_id
+    accident_codes = np.empty((accidents_file.metadata.num_rows, len(accident_features)), dtype=model.code_dtype)
+    position = 0
+    for batch in stream(accidents_file, accident_columns):
+        accident_codes[position:position + len(batch)] = model.encode(feature_columns(batch, accident_features),
+                                                                      accident_features)
+        position += len(batch)
+
+    def batches() -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        for batch in stream(cyclists_file, [ACCIDENT_ID, 'severity'] + cyclist_columns):
+            codes = np.hstack([
+                accident_codes[batch[ACCIDENT_ID].to_numpy()],
+                model.encode(feature_columns(batch, cyclist_features), cyclist_features)
+            ])
+            yield from _minibatches(codes, _severity_codes(batch['severity']), batch_rows)
+
+    model = fit(model, batches, epochs=epochs)
+    model.metrics.update({
+        'cyclists': cyclists_file.metadata.num_rows,
+        'features': list(features),
+        'data_fingerprint': fingerprint,
+    })
+    return model
+
+
+def is_current(model: RiskModel, accidents_path: str, cyclists_path: str,
+               features: Sequence[str] = RISK_FEATURES) -> bool:
+    """Whether a model was trained by train_risk_model() on these tables, unchanged since, with these features."""
+    return (
+        model.metrics.get('data_fingerprint') == table_fingerprint([accidents_path, cyclists_path])
+        and model.metrics.get('features') == list(features)
+    )
+
+
+def score_tables(model: RiskModel, accidents: pd.DataFrame, cyclists: pd.DataFrame) -> np.ndarray:
+    """
+    Severity probabilities of every cyclist, shape (cyclists, 3), from the
+    normalised tables.
+
+    As in training, accident features are encoded once per accident and
+    gathered onto cyclists by accident_id rather than joined first.
+    """
+    accident_features = [f for f in model.features if f not in CYCLIST_COLUMNS]
+    cyclist_features = [f for f in model.features if f in CYCLIST_COLUMNS]
+    accident_codes = model.encode(feature_columns(accidents, accident_features), accident_features)
+    codes = np.hstack([
+        accident_codes[cyclists[ACCIDENT_ID].to_numpy()],
+        model.encode(feature_columns(cyclists, cyclist_features), cyclist_features)
+    ])
+    return _softmax(model.logits(codes))
+
+
+def severity_calibration(df: pd.DataFrame, proba: np.ndarray, by: str) -> pd.DataFrame:
+    """
+    Observed against predicted severity shares of each segment of a selection.
+
+    Args:
+        df: Rows scored, with 'severity' and the segment column
+        proba: model.predict_proba(df)
+        by: Feature defining the segments (see feature_columns())
+
+    Returns:
+        DataFrame indexed by segment with 'rows' and, for each severity,
+        'observed_<severity>' and 'predicted_<severity>' in percent
+    """
+    segments = feature_columns(df, [by])[by]
+    codes, labels = pd.factorize(segments, sort=True)
+    keep = codes >= 0
+    codes, y, proba = codes[keep], _severity_codes(df['severity'])[keep], proba[keep]
+    rows = np.bincount(codes, minlength=len(labels))
+    result = pd.DataFrame({'rows': rows}, index=pd.Index(labels, name=by))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for k, severity in enumerate(SEVERITY_CLASSES):
+            result[f'observed_{severity}'] = np.bincount(codes[y == k], minlength=len(labels)) / rows * 100
+            result[f'predicted_{severity}'] = np.bincount(codes, weights=proba[:, k], minlength=len(labels)) / rows * 100
+    return result[result['rows'] > 0]
+
+
+def odds_ratios(model: RiskModel, severity: str = 'Fatal') -> pd.DataFrame:
+    """
+    Odds of a severity against Slight for each feature level, relative to
+    the feature's most common level, all else equal.
+
+    Returns:
+        DataFrame with feature, level, count (accidents, or cyclists for a
+        cyclist feature, at that level in training) and odds_ratio, one
+        row per level seen in training
+    """
+    k = SEVERITY_CLASSES.index(severity)
+    log_odds = model.weights[:, k] - model.weights[:, 0]
+    rows = []
+    for feature, start in model.offsets.items():
+        counts = np.asarray(model.level_counts.get(feature, []))
+        if counts.sum() == 0:
+            continue
+        feature_log_odds = log_odds[start:start + len(model.levels[feature])]
+        reference = feature_log_odds[np.argmax(counts)]
+        for level, count, value in zip(model.levels[feature], counts, feature_log_odds):
+            if count > 0:
+                rows.append((feature, level, int(count), float(np.exp(value - reference))))
+    return pd.DataFrame(rows, columns=['feature', 'level', 'count', 'odds_ratio'])
+
+
+def model_path(output_dir: str) -> str:
+    return os.path.join(output_dir, RISK_MODEL_FILE)
@@ -0,0 +1,235 @@
+# src/sampling.py
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.dashboard_utils import filter_dataframe, join_cyclists
+from src.intervals import Z_95
+from src.preprocessing import ACCIDENT_ID
+
+# Fractions of accidents kept in the approximate-mode samples
+SAMPLE_RATES = (0.01, 0.05, 0.2)
+# Accidents drawn from every stratum at least, so each has a variance estimate
+MIN_STRATUM_SAMPLE = 2
+# Filtered sample rows to aim for when picking a rate, and the filtered size
+# below which exact results are cheap enough to compute directly
+TARGET_SAMPLE_ROWS = 5_000
+EXACT_BELOW_ROWS = 50_000
+
+# calculate_kpis() counts that are estimated as stratified totals
+_TOTAL_KPIS = ['total_accidents', 'total_casualties', 'total_vehicles',
+               'fatal_accidents', 'serious_accidents', 'slight_accidents']
+
+
+def sample_paths(output_dir: str, rates: Sequence[float] = SAMPLE_RATES) -> List[str]:
+    """Paths of the sample files, one per rate."""
+    return [os.path.join(output_dir, f"sample_{rate:g}.parquet") for rate in rates]
+
+
+def stratified_sample(
+    accidents: pd.DataFrame,
+    cyclists: pd.DataFrame,
+    rate: float,
+    seed: int = 0
+) -> pd.DataFrame:
+    """
+    Draw a stratified sample of accidents with all of their cyclists.
+
+    Accidents are stratified by year and by the worst severity among their
+    cyclists, and ceil(rate * N_h) accidents (at least MIN_STRATUM_SAMPLE)
+    are drawn without replacement from each stratum of N_h accidents. Whole
+    accidents are kept, so accident- and cyclist-level totals can both be
+    estimated.
+
+    Args:
+        accidents: Unfiltered accident table
+        cyclists: Unfiltered cyclist table
+        rate: Fraction of accidents to draw
+        seed: Random seed
+
+    Returns:
+        One row per cyclist of a sampled accident, with the columns of
+        join_cyclists() plus 'stratum' (int) and 'weight'
+        (N_h / n_h, the number of accidents each sampled one stands for)
+    """
+    accident_ids = cyclists[ACCIDENT_ID].to_numpy()
+    worst = np.zeros(len(accidents), dtype=np.int64)
+    if 'severity_numeric' in cyclists.columns:
+        np.maximum.at(worst, accident_ids, cyclists['severity_numeric'].fillna(0).to_numpy(dtype=np.int64))
+    year = accidents['year'].fillna(-1).to_numpy(dtype=np.int64) if 'year' in accidents.columns else 0
+    strata, _ = pd.factorize(year * 10 + worst)
+
+    population = np.bincount(strata)
+    drawn = np.minimum(population, np.maximum(np.ceil(rate * population).astype(np.int64), MIN_STRATUM_SAMPLE))
+    keys = np.random.default_rng(seed).random(len(accidents))
+    order = np.lexsort((keys, strata))
+    rank = np.empty(len(accidents), dtype=np.int64)
+    rank[order] = np.arange(len(accidents)) - np.repeat(np.cumsum(population) - population, population)
+    selected = rank < drawn[strata]
+
+    sample = join_cyclists(accidents, cyclists[selected[accident_ids]]).reset_index(drop=True)
+    sample_ids = accident_ids[selected[accident_ids]]
+    sample['stratum'] = strata[sample_ids].astype(np.int32)
+    sample['weight'] = (population / drawn)[strata[sample_ids]]
+    return sample
+
+
+def save_samples(
+    accidents: pd.DataFrame,
+    cyclists: pd.DataFrame,
+    output_dir: str,
+    rates: Sequence[float] = SAMPLE_RATES,
+    seed: int = 0
+) -> List[str]:
+    """Draw a sample at each rate and save them to output_dir, returning their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = sample_paths(output_dir, rates)
+    for rate, path in zip(rates, paths):
+        stratified_sample(accidents, cyclists, rate, seed=seed).to_parquet(path, index=False, engine='pyarrow')
+    return paths
+
+
+def filter_mask(sample: pd.DataFrame, filters: Dict[str, Any]) -> np.ndarray:
+    """Boolean mask of the sample rows passing filter_dataframe() filters."""
+    mask = np.zeros(len(sample), dtype=bool)
+    mask[filter_dataframe(sample, **filters).index.to_numpy()] = True
+    return mask
+
+
+def estimate_rows(sample: pd.DataFrame, mask: np.ndarray) -> float:
+    """Estimated number of full-dataset rows (cyclists) among the sample rows in mask."""
+    return float(sample['weight'].to_numpy()[mask].sum())
+
+
+def choose_sample_rate(
+    estimated_rows: float,
+    rates: Sequence[float],
+    target_rows: int = TARGET_SAMPLE_ROWS,
+    exact_below: int = EXACT_BELOW_ROWS
+) -> Optional[float]:
+    """
+    Pick the smallest sampling rate expected to leave target_rows filtered rows.
+
+    Returns None when the filtered data is small enough to answer exactly,
+    and the largest rate when no rate reaches the target.
+    """
+    if estimated_rows < exact_below or not rates:
+        return None
+    for rate in sorted(rates):
+        if estimated_rows * rate >= target_rows:
+            return rate
+    return max(rates)
+
+
+def _accident_values(sample: pd.DataFrame, mask: np.ndarray) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Per sampled accident: the value each count KPI adds for the filtered domain.
+
+    An accident is in the domain when at least one of its rows passes the
+    filters, as in filter_tables(); out-of-domain accidents contribute 0.
+    """
+    codes, _ = pd.factorize(sample[ACCIDENT_ID])
+    first = np.unique(codes, return_index=True)[1]
+    n_accidents = len(first)
+
+    def any_row(row_mask: np.ndarray) -> np.ndarray:
+        return np.bincount(codes[row_mask], minlength=n_accidents) > 0
+
+    in_domain = any_row(mask)
+    severity = sample['severity'].to_numpy() if 'severity' in sample.columns else np.full(len(sample), None)
+    accident_rows = sample.iloc[first]
+    values = pd.DataFrame({
+        'total_accidents': in_domain.astype(float),
+        'total_casualties': in_domain * accident_rows['number_of_casualties'].fillna(0).to_numpy(dtype=float),
+        'total_vehicles': in_domain * accident_rows['number_of_vehicles'].fillna(0).to_numpy(dtype=float),
+        'fatal_accidents': any_row(mask & (severity == 'Fatal')).astype(float),
+        'serious_accidents': any_row(mask & (severity == 'Serious')).astype(float),
+        'slight_accidents': any_row(mask & (severity == 'Slight')).astype(float),
+    })
+    values['stratum'] = sample['stratum'].to_numpy()[first]
+    values['weight'] = sample['weight'].to_numpy()[first]
+    values['year'] = accident_rows['year'].to_numpy() if 'year' in sample.columns else np.nan
+    return values, in_domain
+
+
+def _stratum_totals(values: pd.DataFrame, columns: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Stratified estimates of the population total of each column, per stratum.
+
+    Returns (totals, variances) indexed by stratum: N_h * mean_h and
+    N_h^2 (1 - n_h/N_h) s_h^2 / n_h.
+    """
+    grouped = values.groupby('stratum')
+    drawn = grouped.size()
+    population = grouped['weight'].first() * drawn
+    means = grouped[columns].mean()
+    variances = grouped[columns].var(ddof=1).fillna(0)
+    totals = means.mul(population, axis=0)
+    finite = (1 - drawn / population).clip(lower=0)
+    total_variances = variances.mul(population ** 2 * finite / drawn, axis=0)
+    return totals, total_variances
+
+
+def estimate_kpis(sample: pd.DataFrame, mask: np.ndarray, z: float = Z_95) -> Dict[str, Any]:
+    """
+    Estimate calculate_kpis() for the filtered data from a stratified sample.
+
+    Count KPIs are stratified (Horvitz-Thompson) totals with a normal
+    confidence interval; the casualties-per-accident ratio uses a linearised
+    variance.
+
+    Args:
+        sample: A sample from stratified_sample()
+        mask: Sample rows passing the filters
+        z: Normal quantile of the interval (1.96 for 95%)
+
+    Returns:
+        The keys of calculate_kpis() holding point estimates, plus
+        'intervals' ({kpi: (low, high)}) and 'sample_rows'
+    """
+    values, in_domain = _accident_values(sample, mask)
+    totals, variances = _stratum_totals(values, _TOTAL_KPIS)
+    estimate = totals.sum()
+    spread = z * np.sqrt(variances.sum())
+
+    kpis: Dict[str, Any] = {key: float(estimate[key]) for key in _TOTAL_KPIS}
+    intervals = {key: (max(0.0, estimate[key] - spread[key]), estimate[key] + spread[key]) for key in _TOTAL_KPIS}
+
+    accidents = estimate['total_accidents']
+    ratio = estimate['total_casualties'] / accidents if accidents else 0.0
+    values['residual'] = values['total_casualties'] - ratio * values['total_accidents']
+    ratio_spread = z * np.sqrt(_stratum_totals(values, ['residual'])[1]['residual'].sum()) / accidents if accidents else 0.0
+    kpis['avg_casualties_per_accident'] = ratio
+    intervals['avg_casualties_per_accident'] = (max(0.0, ratio - ratio_spread), ratio + ratio_spread)
+
+    years = values['year'][in_domain]
+    kpis['year_range'] = f"{int(years.min())}-{int(years.max())}" if len(years) and years.notna().any() else "N/A"
+    kpis['intervals'] = intervals
+    kpis['sample_rows'] = int(mask.sum())
+    return kpis
+
+
+def estimate_yearly_counts(sample: pd.DataFrame, mask: np.ndarray, z: float = Z_95) -> pd.DataFrame:
+    """
+    Estimate prepare_time_series_data(filtered accidents, 'year') from a sample.
+
+    Year is a stratification variable, so each year's estimate and variance
+    are sums over that year's strata.
+
+    Returns:
+        DataFrame with columns year, count, low, high
+    """
+    values, _ = _accident_values(sample, mask)
+    totals, variances = _stratum_totals(values, ['total_accidents'])
+    year_of_stratum = values.groupby('stratum')['year'].first()
+    by_year = pd.DataFrame({
+        'count': totals['total_accidents'].groupby(year_of_stratum).sum(),
+        'variance': variances['total_accidents'].groupby(year_of_stratum).sum()
+    })
+    by_year = by_year[by_year['count'] > 0]
+    spread = z * np.sqrt(by_year.pop('variance'))
+    by_year['low'] = (by_year['count'] - spread).clip(lower=0)
+    by_year['high'] = by_year['count'] + spread
+    return by_year.rename_axis('year').reset_index()
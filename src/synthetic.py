@@ -0,0 +1,234 @@
+# src/synthetic.py
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+
+# Category distributions approximating the 1979-2018 Accidents/Bikers extracts.
+# Values keep the raw casing of the source CSVs; preprocess() title-cases them.
+ROAD_CONDITIONS = {
+    'Dry': 0.74, 'Wet': 0.225, 'Frost': 0.015, 'Snow': 0.004,
+    'Flood': 0.001, 'Missing Data': 0.015
+}
+WEATHER_CONDITIONS = {
+    'Clear': 0.80, 'Rain': 0.12, 'Unknown': 0.03, 'Other': 0.02,
+    'Rain and high winds': 0.01, 'Fog': 0.005, 'Snow': 0.005,
+    'High winds': 0.005, 'Clear and high winds': 0.004, 'Snow and high winds': 0.001
+}
+LIGHT_CONDITIONS = {
+    'Daylight': 0.80, 'Darkness lights lit': 0.15, 'Darkness no lights': 0.03,
+    'Darkness lighting unknown': 0.015, 'Darkness lights unlit': 0.005
+}
+ROAD_TYPES = {
+    'Single carriageway': 0.78, 'Roundabout': 0.08, 'Dual carriageway': 0.06,
+    'Unknown': 0.04, 'One way street': 0.03, 'Slip road': 0.01
+}
+SPEED_LIMITS = {30.0: 0.80, 40.0: 0.06, 60.0: 0.06, 20.0: 0.03, 70.0: 0.03, 50.0: 0.02}
+NUMBER_OF_VEHICLES = {2: 0.85, 1: 0.12, 3: 0.025, 4: 0.005}
+NUMBER_OF_CASUALTIES = {1: 0.95, 2: 0.04, 3: 0.01}
+GENDERS = {'Male': 0.80, 'Female': 0.19, 'Other': 0.01}
+AGE_GROUPS = {
+    '6 to 10': 0.03, '11 to 15': 0.10, '16 to 20': 0.12, '21 to 25': 0.11,
+    '26 to 35': 0.20, '36 to 45': 0.18, '46 to 55': 0.14, '56 to 65': 0.07,
+    '66 to 75': 0.04, '75 to 100': 0.01
+}
+SEVERITIES = ['Slight', 'Serious', 'Fatal']
+
+YEARS = np.arange(1979, 2019)
+# Cycling casualties fall roughly by a third over the four decades
+YEAR_WEIGHTS = np.linspace(1.4, 0.9, len(YEARS))
+# Summer peak, winter trough
+MONTH_WEIGHTS = np.array([0.6, 0.6, 0.75, 0.85, 1.05, 1.2, 1.3, 1.2, 1.15, 1.05, 0.85, 0.7])
+# Morning and evening commuting peaks
+HOUR_WEIGHTS = np.array([
+    0.3, 0.2, 0.15, 0.1, 0.1, 0.2, 0.6, 2.0, 3.6, 2.2, 1.6, 1.8,
+    2.0, 2.0, 2.1, 2.8, 3.6, 4.0, 3.2, 2.0, 1.4, 1.0, 0.7, 0.5
+])
+
+_BASE36 = np.frombuffer(b'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ', dtype=np.uint8)
+_DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def parse_scale(scale: str) -> int:
+    """
+    Parse a row-count label such as '100k', '1M' or '50m' into an integer.
+
+    Args:
+        scale: Row count with an optional k/m suffix
+
+    Returns:
+        Number of rows
+    """
+    text = str(scale).strip().lower().replace('_', '')
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    if text and text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+
+def _choice(rng: np.random.Generator, distribution: Dict, size: int):
+    """Draw values from a {value: probability} mapping.
+
+    Labels come back as a Categorical, which is far cheaper to build than
+    millions of Python strings and writes to CSV identically.
+    """
+    values = list(distribution.keys())
+    probs = np.array(list(distribution.values()), dtype=float)
+    codes = rng.choice(len(values), size=size, p=probs / probs.sum())
+    if isinstance(values[0], str):
+        return pd.Categorical.from_codes(codes, categories=values)
+    return np.array(values)[codes]
+
+
+def _accident_indices(years: np.ndarray, counters: np.ndarray) -> np.ndarray:
+    """Build unique 13-character indices shaped like '197901A1SEE71'."""
+    n = len(years)
+    chars = np.empty((n, 13), dtype=np.uint8)
+    year_digits = years.astype(np.int64)
+    for pos in range(4):
+        chars[:, 3 - pos] = ord('0') + (year_digits // 10 ** pos) % 10
+    chars[:, 4] = ord('0')
+    chars[:, 5] = ord('1')
+    # Multiplying by a constant coprime to 36 scatters the counter bijectively
+    remaining = (counters.astype(np.int64) * 2654435761) % 36 ** 7
+    for pos in range(7):
+        chars[:, 12 - pos] = _BASE36[remaining % 36]
+        remaining //= 36
+    return chars.view('S13').ravel().astype(str)
+
+
+def _clock_times(hours: np.ndarray, minutes: np.ndarray) -> np.ndarray:
+    """Format hour/minute arrays as 'HH:MM' strings."""
+    chars = np.empty((len(hours), 5), dtype=np.uint8)
+    chars[:, 0] = ord('0') + hours // 10
+    chars[:, 1] = ord('0') + hours % 10
+    chars[:, 2] = ord(':')
+    chars[:, 3] = ord('0') + minutes // 10
+    chars[:, 4] = ord('0') + minutes % 10
+    return chars.view('S5').ravel().astype(str)
+
+
+def _severity(rng: np.random.Generator, speed_limit: np.ndarray, years: np.ndarray) -> pd.Categorical:
+    """Draw severities that worsen with speed limit and drift over time."""
+    serious = 0.12 + 0.0015 * (years - YEARS[0]) + 0.002 * np.clip(speed_limit - 30, 0, None)
+    fatal = 0.006 + 0.0006 * np.clip(speed_limit - 30, 0, None)
+    draw = rng.random(len(speed_limit))
+    codes = np.where(draw < fatal, 2, np.where(draw < fatal + serious, 1, 0))
+    return pd.Categorical.from_codes(codes, categories=SEVERITIES)
+
+
+def generate_synthetic_frames(
+    n_rows: int,
+    seed: int = 0,
+    start_index: int = 0,
+    multi_cyclist_rate: float = 0.001
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Generate synthetic Accidents and Bikers frames with the raw CSV schema.
+
+    Args:
+        n_rows: Number of accidents to generate
+        seed: Random seed
+        start_index: Offset for the unique part of Accident_Index, so that
+            successive chunks never collide
+        multi_cyclist_rate: Share of accidents involving a second cyclist
+
+    Returns:
+        Tuple of (accidents, bikers) DataFrames
+    """
+    rng = np.random.default_rng([seed, start_index])
+
+    years = YEARS[rng.choice(len(YEARS), size=n_rows, p=YEAR_WEIGHTS / YEAR_WEIGHTS.sum())]
+    months = rng.choice(12, size=n_rows, p=MONTH_WEIGHTS / MONTH_WEIGHTS.sum())
+    month_start = (years - 1970) * 12 + months
+    first_day = month_start.astype('datetime64[M]').astype('datetime64[D]')
+    days_in_month = ((month_start + 1).astype('datetime64[M]').astype('datetime64[D]') - first_day).astype(np.int64)
+    dates = first_day + (rng.random(n_rows) * days_in_month).astype(np.int64)
+    weekday = (dates.astype(np.int64) + 3) % 7
+
+    hours = rng.choice(24, size=n_rows, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    minutes = rng.integers(0, 12, size=n_rows) * 5
+
+    speed_limit = _choice(rng, SPEED_LIMITS, n_rows)
+
+    accidents = pd.DataFrame({
+        'Accident_Index': _accident_indices(years, np.arange(start_index, start_index + n_rows)),
+        'Number_of_Vehicles': _choice(rng, NUMBER_OF_VEHICLES, n_rows),
+        'Number_of_Casualties': _choice(rng, NUMBER_OF_CASUALTIES, n_rows),
+        'Date': np.datetime_as_string(dates, unit='D'),
+        'Time': _clock_times(hours, minutes),
+        'Speed_limit': speed_limit,
+        'Road_conditions': _choice(rng, ROAD_CONDITIONS, n_rows),
+        'Weather_conditions': _choice(rng, WEATHER_CONDITIONS, n_rows),
+        'Day': pd.Categorical.from_codes(weekday, categories=_DAY_NAMES),
+        'Road_type': _choice(rng, ROAD_TYPES, n_rows),
+        'Light_conditions': _choice(rng, LIGHT_CONDITIONS, n_rows)
+    })
+
+    # Most accidents involve one cyclist; a few involve two
+    extra = np.flatnonzero(rng.random(n_rows) < multi_cyclist_rate)
+    rows = np.sort(np.concatenate([np.arange(n_rows), extra]))
+    n_bikers = len(rows)
+    bikers = pd.DataFrame({
+        'Accident_Index': accidents['Accident_Index'].to_numpy()[rows],
+        'Gender': _choice(rng, GENDERS, n_bikers),
+        'Severity': _severity(rng, speed_limit[rows], years[rows]),
+        'Age_Grp': _choice(rng, AGE_GROUPS, n_bikers)
+    })
+
+    return accidents, bikers
+
+
+def write_synthetic_csvs(
+    output_dir: str,
+    n_rows: int,
+    seed: int = 0,
+    chunk_size: int = 1_000_000,
+    multi_cyclist_rate: float = 0.001
+) -> Tuple[str, str]:
+    """
+    Write synthetic Accidents.csv and Bikers.csv in chunks, so that scales
+    larger than memory can be generated.
+
+    Args:
+        output_dir: Directory to write the CSV files into
+        n_rows: Number of accidents to generate
+        seed: Random seed
+        chunk_size: Accidents generated per chunk
+        multi_cyclist_rate: Share of accidents involving a second cyclist
+
+    Returns:
+        Tuple of (accidents_path, bikers_path)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    accidents_path = os.path.join(output_dir, "Accidents.csv")
+    bikers_path = os.path.join(output_dir, "Bikers.csv")
+
+    for start in range(0, max(n_rows, 1), chunk_size):
+        size = min(chunk_size, n_rows - start)
+        accidents, bikers = generate_synthetic_frames(size, seed, start, multi_cyclist_rate)
+        mode = 'w' if start == 0 else 'a'
+        accidents.to_csv(accidents_path, mode=mode, header=(start == 0), index=False)
+        bikers.to_csv(bikers_path, mode=mode, header=(start == 0), index=False)
+
+    return accidents_path, bikers_path
+
+
+def ensure_synthetic_csvs(base_dir: str, n_rows: int, seed: int = 0, **kwargs) -> Tuple[str, str]:
+    """
+    Return the CSV paths for a synthetic dataset, generating it on first use.
+
+    Args:
+        base_dir: Directory holding one sub-folder per generated scale
+        n_rows: Number of accidents
+        seed: Random seed
+        **kwargs: Passed to write_synthetic_csvs
+
+    Returns:
+        Tuple of (accidents_path, bikers_path)
+    """
+    output_dir = os.path.join(base_dir, f"rows{n_rows}_seed{seed}")
+    paths = (os.path.join(output_dir, "Accidents.csv"), os.path.join(output_dir, "Bikers.csv"))
+    if all(os.path.exists(p) for p in paths):
+        return paths
+    return write_synthetic_csvs(output_dir, n_rows, seed, **kwargs)
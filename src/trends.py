@@ -0,0 +1,213 @@
+# src/trends.py
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.intervals import Z_95
+from src.preprocessing import ACCIDENT_ID
+
+SEASON = 12
+FORECAST_HORIZON = 12
+# Slices with a monthly series of their own, besides all accidents
+SLICE_DIMENSIONS = ['severity', 'road_conditions', 'weather_conditions', 'light_conditions', 'age_grp', 'gender']
+
+# Damped additive Holt-Winters (ETS(A,Ad,A)) settings. Every series is run
+# with each level weight of LEVEL_GRID and keeps the one with the smallest
+# one-step-ahead squared error; the other weights are shared.
+LEVEL_GRID = (0.1, 0.2, 0.3, 0.5)
+TREND_SMOOTHING = 0.01
+SEASON_SMOOTHING = 0.05
+TREND_DAMPING = 0.9
+
+
+def monthly_matrix(
+    accidents: pd.DataFrame,
+    cyclists: Optional[pd.DataFrame] = None,
+    dimensions: Sequence[str] = SLICE_DIMENSIONS
+) -> Tuple[np.ndarray, pd.DataFrame, pd.DatetimeIndex]:
+    """
+    Monthly accident counts of every slice as one dense matrix.
+
+    Row 0 counts all accidents, followed by one row per value of each
+    dimension. A cyclist-level dimension counts the accidents with at least
+    one such cyclist. Months run without gaps from the first month with an
+    accident to the last, and empty months are 0. All rows come from a
+    single bincount.
+
+    Args:
+        accidents: Accident table with 'year' and 'month'
+        cyclists: Cyclist table keyed by accident_id (the row position in
+            accidents), or None when accidents already holds the cyclist
+            columns, in which case every row counts
+        dimensions: Columns to slice by; ones in neither table are skipped
+
+    Returns:
+        Tuple of (float64 counts of shape (series, months), series labels
+        with 'dimension', 'value' and 'total', first day of each month)
+    """
+    year = accidents['year'].to_numpy(dtype=np.float64)
+    month = accidents['month'].to_numpy(dtype=np.float64)
+    dated = np.isfinite(year) & np.isfinite(month)
+    if not dated.any():
+        return np.zeros((0, 0)), pd.DataFrame(columns=['dimension', 'value', 'total']), pd.DatetimeIndex([])
+    month_index = np.where(dated, year * 12 + month - 1, 0).astype(np.int64)
+    first = month_index[dated].min()
+    n_months = int(month_index[dated].max() - first + 1)
+    month_index -= first
+
+    labels: List[Tuple[str, Any]] = [('all', 'All accidents')]
+    flat = [month_index[dated]]
+    for dimension in dimensions:
+        source = cyclists if cyclists is not None and dimension in cyclists.columns else accidents
+        if dimension not in source.columns:
+            continue
+        codes, uniques = pd.factorize(source[dimension], sort=True)
+        offset = len(labels)
+        if source is accidents:
+            keep = dated & (codes >= 0)
+            flat.append((offset + codes[keep]) * n_months + month_index[keep])
+        else:
+            # One count per (accident, value), however many cyclists share it
+            accident_ids = source[ACCIDENT_ID].to_numpy().astype(np.int64)
+            keep = (codes >= 0) & dated[accident_ids]
+            pairs = np.unique(accident_ids[keep] * len(uniques) + codes[keep])
+            flat.append((offset + pairs % len(uniques)) * n_months + month_index[pairs // len(uniques)])
+        labels.extend((dimension, value) for value in uniques)
+
+    counts = np.bincount(np.concatenate(flat), minlength=len(labels) * n_months)
+    counts = counts.reshape(len(labels), n_months).astype(np.float64)
+    series = pd.DataFrame(labels, columns=['dimension', 'value'])
+    series['total'] = counts.sum(axis=1).astype(np.int64)
+    months = pd.date_range(pd.Timestamp(year=int(first // 12), month=int(first % 12) + 1, day=1),
+                           periods=n_months, freq='MS')
+    return counts, series, months
+
+
+def decompose(counts: np.ndarray, period: int = SEASON) -> Dict[str, np.ndarray]:
+    """
+    Classical additive decomposition of every row of counts at once.
+
+    The trend is the centred moving average over one period (2 x period
+    for an even period), undefined for the first and last period / 2
+    columns. The seasonal component is each season's mean deviation from
+    the trend, centred to sum to 0 over a period. The residual is what
+    remains.
+
+    Returns:
+        Dictionary of 'trend', 'seasonal' and 'resid', each shaped like counts
+    """
+    n_series, n = counts.shape
+    weights = np.r_[0.5, np.ones(period - 1), 0.5] / period if period % 2 == 0 else np.ones(period) / period
+    half = len(weights) // 2
+    trend = np.full(counts.shape, np.nan)
+    if n >= len(weights):
+        trend[:, half:n - half] = sum(
+            weight * counts[:, k:n - len(weights) + 1 + k] for k, weight in enumerate(weights)
+        )
+
+    # Mean deviation per season, over the cycles where the trend is defined
+    cycles = -(-n // period)
+    detrended = np.full((n_series, cycles * period), np.nan)
+    detrended[:, :n] = counts - trend
+    detrended = detrended.reshape(n_series, cycles, period)
+    defined = np.isfinite(detrended).sum(axis=1)
+    profile = np.nansum(detrended, axis=1) / np.maximum(defined, 1)
+    profile -= profile.mean(axis=1, keepdims=True)
+    seasonal = np.tile(profile, cycles)[:, :n]
+    return {'trend': trend, 'seasonal': seasonal, 'resid': counts - trend - seasonal}
+
+
+def holt_winters(
+    counts: np.ndarray,
+    horizon: int = FORECAST_HORIZON,
+    period: int = SEASON,
+    level_grid: Sequence[float] = LEVEL_GRID,
+    beta: float = TREND_SMOOTHING,
+    gamma: float = SEASON_SMOOTHING,
+    phi: float = TREND_DAMPING,
+    z: float = Z_95
+) -> Dict[str, np.ndarray]:
+    """
+    Damped additive Holt-Winters forecasts of every row of counts at once.
+
+    The rows are stacked once per level weight and filtered together, one
+    column at a time, so the Python loop runs over months, not series.
+    The states start from the first two periods. Prediction intervals
+    use the ETS(A,Ad,A) forecast variance, based on the one-step error of
+    each series. Series shorter than two periods get NaN.
+
+    Returns:
+        Dictionary of 'forecast', 'low' and 'high' of shape (series,
+        horizon), clipped at 0, plus 'alpha' (the chosen level weight) and
+        'sigma' (the one-step error's standard deviation) per series
+    """
+    n_series, n = counts.shape
+    if n < 2 * period:
+        empty = np.full((n_series, horizon), np.nan)
+        return {'forecast': empty, 'low': empty.copy(), 'high': empty.copy(),
+                'alpha': np.full(n_series, np.nan), 'sigma': np.full(n_series, np.nan)}
+
+    y = np.tile(counts, (len(level_grid), 1))
+    alpha = np.repeat(np.asarray(level_grid, dtype=np.float64), n_series)
+    level = y[:, :period].mean(axis=1)
+    trend = (y[:, period:2 * period].mean(axis=1) - level) / period
+    season = y[:, :period] - level[:, None]
+    level = level + (period - 1) / 2 * trend  # level at the end of the first period
+    sse = np.zeros(len(y))
+    for t in range(period, n):
+        error = y[:, t] - (level + phi * trend + season[:, t % period])
+        sse += error * error
+        level = level + phi * trend + alpha * error
+        trend = phi * trend + beta * error
+        season[:, t % period] += gamma * error
+
+    # Keep each series' best level weight
+    best = np.argmin(sse.reshape(len(level_grid), n_series), axis=0) * n_series + np.arange(n_series)
+    level, trend, season, alpha = level[best], trend[best], season[best], alpha[best]
+    sigma = np.sqrt(sse[best] / (n - period))
+
+    steps = np.arange(1, horizon + 1)
+    damped = np.cumsum(phi ** steps)
+    forecast = level[:, None] + damped[None, :] * trend[:, None] + season[:, (n + steps - 1) % period]
+    # Var(h) = sigma^2 (1 + sum_{j<h} c_j^2), c_j = alpha + beta phi_j + gamma [j % period == 0]
+    c = alpha[:, None] + beta * damped[None, :-1] + gamma * (steps[None, :-1] % period == 0)
+    variance = sigma[:, None] ** 2 * (1 + np.concatenate([np.zeros((n_series, 1)), np.cumsum(c * c, axis=1)], axis=1))
+    spread = z * np.sqrt(variance)
+    return {
+        'forecast': np.clip(forecast, 0, None),
+        'low': np.clip(forecast - spread, 0, None),
+        'high': np.clip(forecast + spread, 0, None),
+        'alpha': alpha,
+        'sigma': sigma
+    }
+
+
+def build_trend_forecasts(
+    accidents: pd.DataFrame,
+    cyclists: Optional[pd.DataFrame] = None,
+    dimensions: Sequence[str] = SLICE_DIMENSIONS,
+    horizon: int = FORECAST_HORIZON
+) -> Dict[str, Any]:
+    """
+    Decompose and forecast the monthly series of all accidents and of every slice.
+
+    Args:
+        accidents, cyclists, dimensions: As for monthly_matrix()
+        horizon: Months to forecast
+
+    Returns:
+        Dictionary with 'series' and 'months' from monthly_matrix(),
+        'counts', the arrays of decompose() and holt_winters(), and
+        'forecast_months' (the first day of each forecast month)
+    """
+    counts, series, months = monthly_matrix(accidents, cyclists, dimensions)
+    forecast_months = pd.date_range(months[-1], periods=horizon + 1, freq='MS')[1:] if len(months) else months
+    return {
+        'series': series,
+        'months': months,
+        'forecast_months': forecast_months,
+        'counts': counts,
+        **decompose(counts),
+        **holt_winters(counts, horizon)
+    }